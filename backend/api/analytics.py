@@ -8,9 +8,10 @@ from models.decision import Decision, Outcome
 from models.user import Farmer
 from models.crop import Crop
 from sqlalchemy import func, desc, case
-from utils.decorators import track_performance
+from utils.decorators import track_performance, cache_response
 from utils.errors import NotFoundError
 from services.regional_analytics import RegionalAnalyticsService
+from services.regional_snapshot import RegionalSnapshotService
 import logging
 
 analytics_bp = Blueprint('analytics', __name__)
@@ -19,6 +20,7 @@ logger = logging.getLogger(__name__)
 @analytics_bp.route('/regional-benchmark', methods=['GET'])
 @jwt_required()
 @track_performance
+@cache_response(timeout=300, tags=('farmer:{user_id}', 'regional'))
 def get_regional_benchmark():
     """
     Enhanced Regional Performance Benchmarking
@@ -47,6 +49,9 @@ def get_regional_benchmark():
             risk_adjusted_performance:
               type: object
               description: RRAP - Risk-Adjusted Regional Performance
+            snapshot_refreshed_at:
+              type: string
+              description: When the regional snapshot was last computed
       404:
         description: Farmer not found
     """
@@ -56,29 +61,32 @@ def get_regional_benchmark():
     if not farmer:
         return jsonify({'error': 'Farmer not found'}), 404
     
-    # Calculate GSI for farmer's governorate
-    gsi_data = RegionalAnalyticsService.calculate_gsi(farmer.governorate)
+    # Regional metrics are served from the periodically refreshed snapshot
+    snapshot = RegionalSnapshotService.get(farmer.governorate)
+    gsi_data = None
+    if snapshot['gsi'] is not None:
+        gsi_data = {
+            'gsi': snapshot['gsi'],
+            'farmer_count': snapshot['farmer_count'],
+            'governorate': farmer.governorate
+        }
     
-    # Calculate Personal Benchmark Deviation
+    # Personal Benchmark Deviation (only the farmer's own SR is computed live)
     pbd_data = RegionalAnalyticsService.calculate_pbd(user_id, farmer.governorate)
     
-    # Get top crops for region
-    top_crops = RegionalAnalyticsService.get_top_crops_for_region(farmer.governorate, limit=5)
-    
-    # Calculate Risk-Adjusted Performance
-    rrap_data = RegionalAnalyticsService.calculate_regional_risk_adjusted_performance(farmer.governorate)
-    
     return jsonify({
         'governorate': farmer.governorate,
         'gsi': gsi_data,
         'personal_benchmark': pbd_data,
-        'top_regional_crops': top_crops,
-        'risk_adjusted_performance': rrap_data
+        'top_regional_crops': snapshot['top_crops'],
+        'risk_adjusted_performance': snapshot['rrap'],
+        'snapshot_refreshed_at': snapshot['refreshed_at']
     }), 200
 
 
 @analytics_bp.route('/smart-summary', methods=['GET'])
 @jwt_required()
+@cache_response(timeout=300, tags=('farmer:{user_id}', 'regional'))
 def get_smart_summary():
     """
     Get a natural language interpretation of all analytics
@@ -130,6 +138,7 @@ def simulate_data():
 @analytics_bp.route('/personal-insights', methods=['GET'])
 @jwt_required()
 @track_performance
+@cache_response(timeout=300, tags=('farmer:{user_id}',))
 def get_personal_insights():
     """
     Get deep insights into user's success conditions with pattern analysis
@@ -309,6 +318,7 @@ def get_personal_insights():
 @analytics_bp.route('/advanced', methods=['GET'])
 @jwt_required()
 @track_performance
+@cache_response(timeout=300, tags=('farmer:{user_id}', 'regional'))
 def get_advanced_analytics():
     """
     Get all 6 advanced analytics metrics with statistical validation
@@ -377,6 +387,7 @@ def get_advanced_analytics():
 @analytics_bp.route('/tier-status', methods=['GET'])
 @jwt_required()
 @track_performance
+@cache_response(timeout=300, tags=('farmer:{user_id}',))
 def get_tier_status():
     """
     Get current user's farming intelligence tier and progress
@@ -399,6 +410,7 @@ def get_tier_status():
 @analytics_bp.route('/milestones', methods=['GET'])
 @jwt_required()
 @track_performance
+@cache_response(timeout=300, tags=('farmer:{user_id}',))
 def get_milestones():
     """
     Get unlock status of various analytical features
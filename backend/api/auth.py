@@ -8,6 +8,8 @@ from models.base import db
 from middleware.validators import validate_request, FarmerRegistrationSchema, LoginSchema
 from utils.errors import ValidationError, AuthenticationError, ConflictError
 from utils.decorators import track_performance
+from services.cache_service import invalidate_on_commit
+from services.deletion_service import DeletionService
 import logging
 
 logger = logging.getLogger(__name__)
@@ -291,6 +293,8 @@ def update_profile():
             return jsonify({'error': 'Phone number already in use'}), 409
         farmer.phone_number = new_phone
         
+    # Cached analytics depend on the profile (e.g. the governorate)
+    invalidate_on_commit(f'farmer:{farmer.id}')
     try:
         db.session.commit()
         return jsonify({
@@ -379,11 +383,11 @@ def delete_account():
         return jsonify({'error': 'User not found'}), 404
         
     try:
-        # Cascade delete is configured in models, but we can be explicit if needed
-        db.session.delete(farmer)
+        # Set-based deletes, child tables first, in one transaction
+        counts = DeletionService.delete_farmer(farmer.id)
         db.session.commit()
         
-        logger.info(f"Account deleted for user {current_user_id}")
+        logger.info(f"Account deleted for user {current_user_id}: {counts}")
         return jsonify({'message': 'Account deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
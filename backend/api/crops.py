@@ -1,11 +1,15 @@
 """
 Crop information endpoints
 """
-from flask import Blueprint, jsonify
+from datetime import date
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
 from models.crop import Crop, AgrarianPeriod
+from models.user import Farmer
 from models.base import db  # Added import for db
 from utils.errors import NotFoundError
 from utils.decorators import track_performance, cache_response
+from services.reference_catalog import get_reference_catalog
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,7 +19,7 @@ crops_bp = Blueprint('crops', __name__)
 
 @crops_bp.route('/', methods=['GET'])
 @track_performance
-@cache_response(timeout=3600)  # Cache for 1 hour
+@cache_response(timeout=3600, tags=('crops',), per_user=False)  # Cache for 1 hour
 def get_all_crops():
     """
     Get all available crops
@@ -51,7 +55,7 @@ def get_all_crops():
 
 @crops_bp.route('/<int:crop_id>', methods=['GET'])
 @track_performance
-@cache_response(timeout=3600)
+@cache_response(timeout=3600, tags=('crops',), per_user=False)
 def get_crop_details(crop_id):
     """
     Get detailed information about a specific crop
@@ -107,7 +111,7 @@ def get_crop_details(crop_id):
 
 @crops_bp.route('/categories', methods=['GET'])
 @track_performance
-@cache_response(timeout=3600)
+@cache_response(timeout=3600, tags=('crops',), per_user=False)
 def get_crop_categories():
     """
     Get all crop categories with counts
@@ -142,7 +146,7 @@ def get_crop_categories():
 
 @crops_bp.route('/periods', methods=['GET'])
 @track_performance
-@cache_response(timeout=3600)
+@cache_response(timeout=3600, tags=('crops',), per_user=False)
 def get_agrarian_periods():
     """
     Get all agrarian periods
@@ -153,17 +157,90 @@ def get_agrarian_periods():
       200:
         description: List of all Tunisian Agrarian Calendar periods
     """
-    periods = AgrarianPeriod.query.order_by(
-        AgrarianPeriod.start_month,
-        AgrarianPeriod.start_day
-    ).all()
+    catalog = get_reference_catalog()
+    return jsonify([catalog.period_dict(period) for period in catalog.periods_by_start]), 200
+
+
+@crops_bp.route('/periods/upcoming-transition', methods=['GET'])
+@jwt_required(optional=True)
+@track_performance
+@cache_response(timeout=3600, tags=('crops', 'farmer:{user_id}'), until_midnight=True)
+def get_upcoming_transition():
+    """
+    Next agrarian period change (feeds the PeriodTransitionAlert)
+    ---
+    tags:
+      - Crops
+    parameters:
+      - name: governorate
+        in: query
+        type: string
+        required: false
+        description: Defaults to the signed-in farmer's governorate
+    responses:
+      200:
+        description: Current and next period with the days remaining
+        schema:
+          type: object
+          properties:
+            currentPeriod:
+              type: object
+            nextPeriod:
+              type: object
+            daysRemaining:
+              type: integer
+              description: Null when the calendar has a single period
+    """
+    governorate = request.args.get('governorate')
+    if not governorate and get_jwt_identity():
+        farmer = Farmer.query.get(int(get_jwt_identity()))
+        governorate = farmer.governorate if farmer else None
+    
+    catalog = get_reference_catalog()
+    calendar = catalog.calendar_for(governorate)
+    today = date.today()
+    
+    current_index = calendar.period_index_on(today)
+    transition = calendar.next_transition(today)
     
-    return jsonify([period.to_dict() for period in periods]), 200
+    current_period = None
+    if current_index != calendar.other_index:
+        current_period = {'id': calendar.ids[current_index], 'name': calendar.names[current_index]}
+    
+    next_period = None
+    days_remaining = None
+    if transition:
+        next_index, days_remaining = transition
+        period = catalog.period(calendar.ids[next_index])
+        characteristics = []
+        if period:
+            if period.description:
+                characteristics.append(period.description)
+            if period.temperature_profile:
+                characteristics.append(f"Temperature: {period.temperature_profile}")
+            if period.rainfall_profile:
+                characteristics.append(f"Rainfall: {period.rainfall_profile}")
+            characteristics.append(f"Risk level: {period.risk_level}")
+        best_crops = catalog.crops_with_suitability(period.id, 'optimal') if period else []
+        next_period = {
+            'id': calendar.ids[next_index],
+            'name': calendar.names[next_index],
+            'characteristics': characteristics,
+            'bestCrops': [crop.name for crop in best_crops]
+        }
+    
+    return jsonify({
+        'governorate': governorate,
+        'currentPeriod': current_period,
+        'nextPeriod': next_period,
+        'daysRemaining': days_remaining,
+        'riskMultiplier': calendar.risk_multiplier_on(today)
+    }), 200
 
 
 @crops_bp.route('/periods/<period_id>', methods=['GET'])
 @track_performance
-@cache_response(timeout=3600)
+@cache_response(timeout=3600, tags=('crops',), per_user=False)
 def get_period_details(period_id):
     """
     Get detailed information about a specific period
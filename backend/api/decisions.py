@@ -1,20 +1,30 @@
 """
 Decision-making endpoints
 """
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from models.base import db
 from models.decision import Decision, Outcome
 from models.user import Farmer
 from models.crop import Crop
 from services.decision_engine import DecisionEngine
 from services.analytics_service import AnalyticsService
-from middleware.validators import validate_request, GetAdviceSchema, OutcomeSchema
-from utils.errors import ValidationError, NotFoundError
+from services.rollup_service import FarmerRollupService
+from services.reference_catalog import get_reference_catalog
+from services.decision_writer import wait_for_decision
+from services.cache_service import get_dashboard_cache
+from services.history_export import HistoryExportService, EXPORT_FORMATS
+from services.deletion_service import DeletionService
+from middleware.validators import validate_request, GetAdviceSchema, BatchAdviceSchema, OutcomeSchema
+from utils.errors import ValidationError, NotFoundError, AuthorizationError
 from utils.decorators import track_performance
+import base64
+import binascii
+import json
 import logging
 import os
 from datetime import datetime, timedelta
+from sqlalchemy import tuple_
 
 from middleware.performance import PerformanceMonitor
 from utils.logger import setup_logger
@@ -24,6 +34,15 @@ logger = setup_logger(__name__)
 engine = DecisionEngine()
 analytics_service = AnalyticsService()
 
+RECOMMENDATIONS = ('PLANT_NOW', 'WAIT', 'NOT_RECOMMENDED')
+
+SEASON_MONTHS = {
+    'winter': [12, 1, 2],
+    'spring': [3, 4, 5],
+    'summer': [6, 7, 8],
+    'autumn': [9, 10, 11]
+}
+
 
 @decisions_bp.route('/get-advice', methods=['POST'])
 @jwt_required()
@@ -87,7 +106,7 @@ def get_advice():
     input_quantity = data.get('input_quantity', 1.0) # Default to 1 unit if not specified
     
     # Validate crop exists
-    crop = Crop.query.get(crop_id)
+    crop = get_reference_catalog().crop(crop_id)
     if not crop:
         raise NotFoundError(f'Crop with ID {crop_id} not found')
     
@@ -107,6 +126,157 @@ def get_advice():
 
 
 
+@decisions_bp.route('/get-advice/batch', methods=['POST'])
+@jwt_required()
+@track_performance
+@validate_request(BatchAdviceSchema)
+def get_batch_advice():
+    """
+    Compare planting advice for several crops
+    ---
+    tags:
+      - Decisions
+    security:
+      - bearerAuth: []
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          required:
+            - crop_ids
+          properties:
+            crop_ids:
+              type: array
+              items:
+                type: integer
+              example: [1, 2, 5]
+            governorate:
+              type: string
+              example: "Tunis"
+            seedling_cost:
+              type: number
+            market_price:
+              type: number
+            input_quantity:
+              type: number
+    responses:
+      200:
+        description: Shared period and forecast with per-crop decisions, best option first
+      401:
+        description: Authentication required
+      404:
+        description: Farmer or one of the crops not found
+      422:
+        description: Validation error
+    """
+    user_id = int(get_jwt_identity())
+    farmer = Farmer.query.get(user_id)
+    
+    if not farmer:
+        raise NotFoundError('Farmer not found')
+    
+    data = request.validated_data
+    crop_ids = data['crop_ids']
+    governorate = data.get('governorate', farmer.governorate)
+    
+    # Validate crops exist
+    catalog = get_reference_catalog()
+    missing = [cid for cid in crop_ids if catalog.crop(cid) is None]
+    if missing:
+        raise NotFoundError(f"Crops not found: {', '.join(str(cid) for cid in missing)}")
+    
+    logger.info(f"Getting batch advice for farmer {user_id}, crops {crop_ids}, gov {governorate}")
+    
+    try:
+        result = engine.get_batch_advice(
+            user_id, crop_ids, governorate,
+            data.get('seedling_cost'), data.get('market_price'), data.get('input_quantity', 1.0)
+        )
+        
+        return jsonify({
+            'status': 'success',
+            'data': result
+        }), 200
+    
+    except Exception as e:
+        logger.error(f"Decision engine error: {e}", exc_info=True)
+        raise ValidationError('Failed to generate advice')
+
+
+def _encode_cursor(decision):
+    """Opaque keyset cursor pointing just past a decision: (timestamp, id)"""
+    raw = json.dumps([decision.timestamp.isoformat(), decision.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, decision_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), int(decision_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise ValidationError('Invalid history cursor')
+
+
+def _apply_history_filters(query, crop_id=None, period_type=None, period_value=None):
+    """Crop and month/period/season filters shared by the history endpoints"""
+    # Apply Crop Filter
+    if crop_id:
+        query = query.filter(Decision.crop_id == crop_id)
+        
+    # Apply Period Filter
+    if period_type and period_value:
+        from sqlalchemy import extract
+        if period_type == 'month':
+            # period_value is 1-12
+            query = query.filter(extract('month', Decision.timestamp) == int(period_value))
+        elif period_type == 'period':
+            # period_value is P1-P9
+            query = query.filter(Decision.period_id == period_value)
+        elif period_type == 'season':
+            # period_value is 'winter', 'spring', 'summer', 'autumn'
+            months = SEASON_MONTHS.get(period_value.lower())
+            if months:
+                query = query.filter(extract('month', Decision.timestamp).in_(months))
+    return query
+
+
+def _history_total(user_id, query, filters):
+    """Filtered history count, cached until the farmer's data version changes"""
+    cache = get_dashboard_cache()
+    key = ('history_total', user_id) + filters
+    version = FarmerRollupService.data_version(user_id)
+    total = cache.get(key, version)
+    if total is None:
+        total = query.order_by(None).count()
+        cache.set(key, version, total)
+    return total
+
+
+def _history_row(d, catalog):
+    crop = catalog.crop(d.crop_id)
+    period = catalog.period(d.period_id) if d.period_id else None
+    return {
+        'id': d.id,
+        'date': d.timestamp.isoformat() if d.timestamp else None,
+        'crop_name': crop.name if crop else None,
+        'crop_icon': crop.icon if crop else None,
+        'governorate': d.governorate,
+        'recommendation': d.recommendation,
+        'wait_days': d.wait_days,
+        'confidence': d.confidence,
+        'explanation': d.explanation,
+        'weather_temp': d.weather_temp_avg,
+        'period_name': period.name if period else None,
+        'actual_action': d.actual_action,
+        'advice_status': d.advice_status,
+        'seedling_cost_tnd': d.seedling_cost_tnd,
+        'market_price_tnd': d.market_price_tnd
+    }
+
+
 @decisions_bp.route('/history', methods=['GET'])
 @jwt_required()
 @track_performance
@@ -124,11 +294,20 @@ def get_history():
         type: integer
         default: 20
         description: Maximum number of records to return
+      - name: cursor
+        in: query
+        type: string
+        description: next_cursor of the previous page (keyset pagination, ignores offset)
       - name: offset
         in: query
         type: integer
         default: 0
-        description: Number of records to skip
+        description: Number of records to skip (when no cursor is given)
+      - name: include_total
+        in: query
+        type: boolean
+        default: true
+        description: Set to false to skip the total count
       - name: crop_id
         in: query
         type: integer
@@ -144,7 +323,7 @@ def get_history():
         description: Value for the period filter (e.g., '1' for Jan, 'P1', or 'winter')
     responses:
       200:
-        description: A paginated list of past decisions and total count
+        description: A page of past decisions, the cursor of the next page and the total count
     """
     user_id = int(get_jwt_identity())
     
@@ -157,67 +336,115 @@ def get_history():
     except (ValueError, TypeError) as e:
         logger.error(f"Invalid pagination parameters: {e}")
         raise ValidationError('Invalid pagination parameters. limit and offset must be integers')
+    cursor = request.args.get('cursor')
+    include_total = request.args.get('include_total', 'true').lower() != 'false'
     
-    query = Decision.query.filter_by(farmer_id=user_id)
+    # Undated rows have no place in the timeline (and no keyset cursor)
+    query = _apply_history_filters(
+        Decision.query.filter(Decision.farmer_id == user_id, Decision.timestamp.isnot(None)),
+        crop_id, period_type, period_value
+    )
     
-    # Apply Crop Filter
-    if crop_id:
-        query = query.filter(Decision.crop_id == crop_id)
-        
-    # Apply Period Filter
-    if period_type and period_value:
-        from sqlalchemy import extract
-        if period_type == 'month':
-            # period_value is 1-12
-            query = query.filter(extract('month', Decision.timestamp) == int(period_value))
-        elif period_type == 'period':
-            # period_value is P1-P9
-            query = query.filter(Decision.period_id == period_value)
-        elif period_type == 'season':
-            # period_value is 'winter', 'spring', 'summer', 'autumn'
-            season_months = {
-                'winter': [12, 1, 2],
-                'spring': [3, 4, 5],
-                'summer': [6, 7, 8],
-                'autumn': [9, 10, 11]
-            }
-            months = season_months.get(period_value.lower())
-            if months:
-                query = query.filter(extract('month', Decision.timestamp).in_(months))
-
-    decisions = query.order_by(Decision.timestamp.desc())\
-        .limit(limit)\
-        .offset(offset)\
-        .all()
+    # Newest first; id breaks timestamp ties so every row has a stable position
+    page_query = query.order_by(Decision.timestamp.desc(), Decision.id.desc())
+    if cursor:
+        # Keyset: one range scan of ix_decisions_farmer_timestamp_id at any depth
+        page_query = page_query.filter(tuple_(Decision.timestamp, Decision.id) < _decode_cursor(cursor))
+        offset = 0
+    elif offset:
+        page_query = page_query.offset(offset)
     
-    total = query.count()
+    # One extra row tells whether there is a next page
+    decisions = page_query.limit(limit + 1).all()
+    has_more = len(decisions) > limit
+    decisions = decisions[:limit]
     
-    history_data = [{
-        'id': d.id,
-        'date': d.timestamp.isoformat() if d.timestamp else None,
-        'crop_name': d.crop.name if d.crop else None,
-        'crop_icon': d.crop.icon if d.crop else None,
-        'governorate': d.governorate,
-        'recommendation': d.recommendation,
-        'wait_days': d.wait_days,
-        'confidence': d.confidence,
-        'explanation': d.explanation,
-        'weather_temp': d.weather_temp_avg,
-        'period_name': d.period.name if d.period else None,
-        'actual_action': d.actual_action,
-        'advice_status': d.advice_status,
-        'seedling_cost_tnd': d.seedling_cost_tnd,
-        'market_price_tnd': d.market_price_tnd
-    } for d in decisions]
+    catalog = get_reference_catalog()
+    total = None
+    if include_total:
+        total = _history_total(user_id, query, (crop_id, period_type, period_value))
     
     return jsonify({
-        'decisions': history_data,
+        'decisions': [_history_row(d, catalog) for d in decisions],
         'total': total,
         'limit': limit,
-        'offset': offset
+        'offset': offset,
+        'next_cursor': _encode_cursor(decisions[-1]) if has_more else None
     }), 200
 
 
+def _parse_date(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValidationError(f'{name} must be a date (YYYY-MM-DD)')
+
+
+@decisions_bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_history():
+    """
+    Stream the full decision and outcome history
+    ---
+    tags:
+      - Decisions
+    security:
+      - bearerAuth: []
+    parameters:
+      - name: format
+        in: query
+        type: string
+        enum: ['csv', 'ndjson']
+        default: csv
+      - name: start
+        in: query
+        type: string
+        description: First day to include (YYYY-MM-DD)
+      - name: end
+        in: query
+        type: string
+        description: Last day to include (YYYY-MM-DD)
+      - name: crop_id
+        in: query
+        type: integer
+        description: Filter by specific crop ID
+      - name: farmer_id
+        in: query
+        type: integer
+        description: Export another farmer's history (admins only)
+    responses:
+      200:
+        description: One row per decision/outcome pair, oldest first
+      403:
+        description: farmer_id given by a non-admin
+    """
+    user_id = int(get_jwt_identity())
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in EXPORT_FORMATS:
+        raise ValidationError(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    
+    farmer_id = request.args.get('farmer_id', type=int)
+    if farmer_id is not None and farmer_id != user_id and get_jwt().get('role') != 'admin':
+        raise AuthorizationError('Admin access required to export another farmer')
+    farmer_id = farmer_id or user_id
+    
+    chunks = HistoryExportService.stream(
+        farmer_id, export_format,
+        start=_parse_date('start'),
+        end=_parse_date('end'),
+        crop_id=request.args.get('crop_id', type=int)
+    )
+    filename = f"decision_history_{farmer_id}_{datetime.utcnow():%Y%m%d}.{export_format}"
+    return Response(
+        stream_with_context(chunks),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+
 @decisions_bp.route('/history/filters', methods=['GET'])
 @jwt_required()
 @track_performance
@@ -281,81 +508,61 @@ def get_history_filters():
                     type: integer
     """
     user_id = int(get_jwt_identity())
-    from sqlalchemy import func, extract
+    catalog = get_reference_catalog()
     
-    # 1. Crop counts (All crops in system)
-    all_crops = Crop.query.all()
-    crop_counts = db.session.query(
-        Decision.crop_id, 
-        func.count(Decision.id).label('count')
-    ).filter(Decision.farmer_id == user_id).group_by(Decision.crop_id).all()
-    
-    count_map = {c_id: count for c_id, count in crop_counts}
+    cache = get_dashboard_cache()
+    key = ('history_filters', user_id, catalog.version)
+    version = FarmerRollupService.data_version(user_id)
+    facets = cache.get(key, version)
+    if facets is None:
+        facets = _history_facets(user_id, catalog)
+        cache.set(key, version, facets)
+    return jsonify(facets), 200
+
+
+def _history_facets(user_id, catalog):
+    """Crop, month, period and season counts from one grouped aggregation"""
+    from sqlalchemy import func, extract
     
-    crops_result = [{
-        'id': crop.id,
-        'name': crop.name,
-        'count': count_map.get(crop.id, 0),
-        'icon': crop.icon
-    } for crop in all_crops]
+    month = extract('month', Decision.timestamp)
+    rows = db.session.query(
+        Decision.crop_id, Decision.period_id, month, func.count(Decision.id)
+    ).filter(Decision.farmer_id == user_id, Decision.timestamp.isnot(None))\
+     .group_by(Decision.crop_id, Decision.period_id, month).all()
     
-    # 2. Month counts
-    month_counts = db.session.query(
-        extract('month', Decision.timestamp).label('month'),
-        func.count(Decision.id).label('count')
-    ).filter(Decision.farmer_id == user_id).group_by('month').all()
+    crop_map, period_map, month_map = {}, {}, {}
+    for crop_id, period_id, month_value, count in rows:
+        crop_map[crop_id] = crop_map.get(crop_id, 0) + count
+        period_map[period_id] = period_map.get(period_id, 0) + count
+        month_map[int(month_value)] = month_map.get(int(month_value), 0) + count
     
-    month_map = {int(m): c for m, c in month_counts}
-    months_result = []
     month_names = ['January', 'February', 'March', 'April', 'May', 'June', 
                    'July', 'August', 'September', 'October', 'November', 'December']
-    for i, name in enumerate(month_names):
-        months_result.append({
+    return {
+        # All crops in the system, with the farmer's counts
+        'crops': [{
+            'id': crop.id,
+            'name': crop.name,
+            'count': crop_map.get(crop.id, 0),
+            'icon': crop.icon
+        } for crop in catalog.crops],
+        'months': [{
             'value': i + 1,
             'name': name,
             'count': month_map.get(i + 1, 0)
-        })
-        
-    # 3. Agrarian Period counts
-    from models.crop import AgrarianPeriod
-    all_periods = AgrarianPeriod.query.all()
-    period_counts = db.session.query(
-        Decision.period_id,
-        func.count(Decision.id).label('count')
-    ).filter(Decision.farmer_id == user_id).group_by(Decision.period_id).all()
-    
-    p_count_map = {p_id: count for p_id, count in period_counts}
-    periods_result = [{
-        'id': p.id,
-        'name': p.name,
-        'count': p_count_map.get(p.id, 0)
-    } for p in all_periods]
-    
-    # 4. Season counts
-    seasons = {
-        'winter': [12, 1, 2],
-        'spring': [3, 4, 5],
-        'summer': [6, 7, 8],
-        'autumn': [9, 10, 11]
-    }
-    seasons_result = []
-    for season_name, months in seasons.items():
-        count = db.session.query(func.count(Decision.id)).filter(
-            Decision.farmer_id == user_id,
-            extract('month', Decision.timestamp).in_(months)
-        ).scalar() or 0
-        seasons_result.append({
+        } for i, name in enumerate(month_names)],
+        'periods': [{
+            'id': p.id,
+            'name': p.name,
+            'count': period_map.get(p.id, 0)
+        } for p in catalog.periods],
+        # Seasons are sums of their months
+        'seasons': [{
             'value': season_name,
             'name': season_name.capitalize(),
-            'count': count
-        })
-        
-    return jsonify({
-        'crops': crops_result,
-        'months': months_result,
-        'periods': periods_result,
-        'seasons': seasons_result
-    }), 200
+            'count': sum(month_map.get(m, 0) for m in months)
+        } for season_name, months in SEASON_MONTHS.items()]
+    }
 
 
 @decisions_bp.route('/record-outcome', methods=['POST'])
@@ -400,6 +607,7 @@ def record_outcome():
     user_id = int(get_jwt_identity())
     data = request.validated_data
     
+    wait_for_decision(data['decision_id'])
     decision = Decision.query.filter_by(
         id=data['decision_id'],
         farmer_id=user_id
@@ -418,7 +626,8 @@ def record_outcome():
     )
     
     try:
-        db.session.add(outcome)
+        with FarmerRollupService.track(decision):
+            db.session.add(outcome)
         db.session.commit()
         logger.info(f"Outcome recorded for decision {decision.id}")
         
@@ -472,6 +681,7 @@ def update_outcome(decision_id):
     user_id = int(get_jwt_identity())
     data = request.get_json()
     
+    wait_for_decision(decision_id)
     decision = Decision.query.filter_by(
         id=decision_id,
         farmer_id=user_id
@@ -484,16 +694,16 @@ def update_outcome(decision_id):
     if not outcome:
         raise NotFoundError('Outcome not found for this decision')
         
-    if 'outcome' in data:
-        outcome.outcome = data['outcome']
-    if 'yield_kg' in data:
-        outcome.yield_kg = data['yield_kg']
-    if 'revenue_tnd' in data:
-        outcome.revenue_tnd = data['revenue_tnd']
-    if 'notes' in data:
-        outcome.notes = data['notes']
-        
     try:
+        with FarmerRollupService.track(decision):
+            if 'outcome' in data:
+                outcome.outcome = data['outcome']
+            if 'yield_kg' in data:
+                outcome.yield_kg = data['yield_kg']
+            if 'revenue_tnd' in data:
+                outcome.revenue_tnd = data['revenue_tnd']
+            if 'notes' in data:
+                outcome.notes = data['notes']
         db.session.commit()
         return jsonify({
             'message': 'Outcome updated successfully',
@@ -541,6 +751,7 @@ def delete_decision(decision_id):
     """
     user_id = int(get_jwt_identity())
     
+    wait_for_decision(decision_id)
     decision = Decision.query.filter_by(
         id=decision_id,
         farmer_id=user_id
@@ -550,9 +761,8 @@ def delete_decision(decision_id):
         raise NotFoundError('Decision not found')
         
     try:
-        db.session.delete(decision)
+        DeletionService.delete_decision(decision)
         db.session.commit()
-        # Outcomes are cascade deleted by model definition
         
         logger.info(f"Deleted decision {decision_id} for user {user_id}")
         return jsonify({'message': 'Decision deleted successfully'}), 200
@@ -578,6 +788,7 @@ def get_decision_details(decision_id):
     """
     user_id = int(get_jwt_identity())
     
+    wait_for_decision(decision_id)
     decision = Decision.query.filter_by(
         id=decision_id,
         farmer_id=user_id
@@ -595,6 +806,41 @@ def get_decision_details(decision_id):
     }), 200
 
 
+@decisions_bp.route('/<int:decision_id>/explanation', methods=['GET'])
+@jwt_required()
+@track_performance
+def get_decision_explanation(decision_id):
+    """
+    Get the explanation of a decision (poll while explanation_status is 'pending')
+
+    With ASYNC_EXPLANATIONS the advice response carries the template
+    explanation; the AI explanation replaces it here once generated.
+
+    Args:
+        decision_id: Decision ID
+
+    Returns:
+        200: {id, explanation, explanation_status}
+        404: Decision not found
+    """
+    user_id = int(get_jwt_identity())
+
+    wait_for_decision(decision_id)
+    row = db.session.query(Decision.explanation, Decision.explanation_status).filter_by(
+        id=decision_id,
+        farmer_id=user_id
+    ).first()
+
+    if not row:
+        raise NotFoundError('Decision not found')
+
+    return jsonify({
+        'id': decision_id,
+        'explanation': row.explanation,
+        'explanation_status': row.explanation_status
+    }), 200
+
+
 @decisions_bp.route('/stats', methods=['GET'])
 @jwt_required()
 @track_performance
@@ -607,20 +853,15 @@ def get_decision_stats():
     """
     user_id = int(get_jwt_identity())
     
-    from sqlalchemy import func, case
+    # Counters are maintained on every write
+    rollup = FarmerRollupService.get(user_id)
     
     # Total decisions made
-    total_decisions = Decision.query.filter_by(farmer_id=user_id).count()
+    total_decisions = rollup.total_decisions
     
     # Calculate success rate from outcomes
-    total_outcomes = db.session.query(func.count(Outcome.id)).join(Decision).filter(
-        Decision.farmer_id == user_id
-    ).scalar() or 0
-    
-    successful_outcomes = db.session.query(func.count(Outcome.id)).join(Decision).filter(
-        Decision.farmer_id == user_id,
-        Outcome.outcome == 'success'
-    ).scalar() or 0
+    total_outcomes = rollup.total_outcomes
+    successful_outcomes = rollup.success_count
     
     # Calculate success rate percentage
     if total_outcomes > 0:
@@ -628,59 +869,29 @@ def get_decision_stats():
     else:
         # If no outcomes yet, estimate based on decisions
         # Assume 70% success rate for PLANT_NOW, 50% for WAIT (conservative)
-        plant_now_count = Decision.query.filter_by(
-            farmer_id=user_id,
-            recommendation='PLANT_NOW'
-        ).count()
-        
-        wait_count = Decision.query.filter_by(
-            farmer_id=user_id,
-            recommendation='WAIT'
-        ).count()
-        
         if total_decisions > 0:
-            estimated_successes = (plant_now_count * 0.7) + (wait_count * 0.5)
+            estimated_successes = (rollup.plant_now_count * 0.7) + (rollup.wait_count * 0.5)
             success_rate = round((estimated_successes / total_decisions) * 100, 1)
         else:
             success_rate = 0
     
     # Count risks avoided (WAIT recommendations)
-    risk_avoided_count = Decision.query.filter_by(
-        farmer_id=user_id,
-        recommendation='WAIT'
-    ).count()
+    risk_avoided_count = rollup.wait_count
     
     # Calculate estimated savings
     # Formula: risks_avoided * avg_crop_value
     # Using 200 TND as default average crop loss prevention value
     estimated_savings = risk_avoided_count * 200
     
-    # Count by recommendation type
-    recommendation_stats = db.session.query(
-        Decision.recommendation,
-        func.count(Decision.id).label('count')
-    ).filter_by(farmer_id=user_id)\
-     .group_by(Decision.recommendation)\
-     .all()
-    
-    # Top crops
-    crop_stats = db.session.query(
-        Crop.name,
-        func.count(Decision.id).label('count')
-    ).join(Decision, Decision.crop_id == Crop.id)\
-     .filter(Decision.farmer_id == user_id)\
-     .group_by(Crop.name)\
-     .order_by(db.desc('count'))\
-     .limit(5)\
-     .all()
-    
-    # Recent decisions trend (last 7 days)
-    from datetime import datetime, timedelta
-    week_ago = datetime.utcnow() - timedelta(days=7)
-    recent_decisions = Decision.query.filter(
-        Decision.farmer_id == user_id,
-        Decision.timestamp >= week_ago
-    ).count()
+    # Windowed on the hour so a cached value stays exact for its key
+    week_ago = (datetime.utcnow() - timedelta(days=7)).replace(minute=0, second=0, microsecond=0)
+    catalog = get_reference_catalog()
+    cache = get_dashboard_cache()
+    key = ('decision_stats', user_id, week_ago, catalog.version)
+    breakdown = cache.get(key, rollup.data_version)
+    if breakdown is None:
+        breakdown = _decision_breakdown(user_id, week_ago, catalog)
+        cache.set(key, rollup.data_version, breakdown)
     
     return jsonify({
         'total_decisions': total_decisions,
@@ -689,12 +900,44 @@ def get_decision_stats():
         'estimated_savings': estimated_savings,
         'total_outcomes_recorded': total_outcomes,
         'successful_outcomes': successful_outcomes,
-        'recent_activity': recent_decisions,
-        'by_recommendation': {stat[0]: stat[1] for stat in recommendation_stats},
-        'top_crops': [{'name': name, 'count': count} for name, count in crop_stats]
+        **breakdown
     }), 200
 
 
+def _decision_breakdown(user_id, since, catalog):
+    """Recommendation counts and recent activity in one SUM(CASE) pass, plus top crops"""
+    from sqlalchemy import func, case
+    
+    def count_if(condition):
+        return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+    
+    counts = db.session.query(
+        count_if(Decision.timestamp >= since),
+        *[count_if(Decision.recommendation == r) for r in RECOMMENDATIONS]
+    ).filter(Decision.farmer_id == user_id).one()
+    
+    # Top crops
+    crop_stats = db.session.query(
+        Decision.crop_id,
+        func.count(Decision.id).label('count')
+    ).filter(Decision.farmer_id == user_id)\
+     .group_by(Decision.crop_id)\
+     .order_by(db.desc('count'), Decision.crop_id)\
+     .limit(5)\
+     .all()
+    
+    top_crops = []
+    for crop_id, count in crop_stats:
+        crop = catalog.crop(crop_id)
+        top_crops.append({'name': crop.name if crop else None, 'count': count})
+    
+    return {
+        'recent_activity': int(counts[0]),
+        'by_recommendation': {r: int(c) for r, c in zip(RECOMMENDATIONS, counts[1:]) if c},
+        'top_crops': top_crops
+    }
+
+
 @decisions_bp.route('/<int:decision_id>/record-action', methods=['POST'])
 @jwt_required()
 @track_performance
@@ -749,6 +992,7 @@ def record_action(decision_id):
             return jsonify({'error': f"Invalid action: {actual_action}. Must be one of [planted_now, waited, not_planted]"}), 400
         
         # Get decision
+        wait_for_decision(decision_id)
         decision = Decision.query.filter_by(
             id=decision_id,
             farmer_id=user_id
@@ -761,32 +1005,33 @@ def record_action(decision_id):
         # Calculate advice_status based on recommendation vs actual_action
         advice_status = _calculate_advice_status(decision.recommendation, actual_action)
         
-        # Update decision
-        decision.actual_action = actual_action
-        decision.advice_status = advice_status
-        decision.deviation_reason = data.get('deviation_reason')
-        decision.action_recorded_at = datetime.utcnow()
-        
-        # LINK TO ANALYTICS: Auto-generate outcome for immediate feedback (MVP/Demo Feature)
-        # This ensures the user sees the result of their decision in the dashboard immediately.
-        existing_outcome = Outcome.query.filter_by(decision_id=decision.id).first()
-        if not existing_outcome:
-            is_success = (advice_status == 'followed')
-            
-            # Estimate yield/revenue based on user settings or defaults
-            # In a full production app, this would be entered later by the user.
-            estimated_yield = 1000 if is_success else 400
-            estimated_revenue = (estimated_yield * 1.5) # 1.5 TND/kg
+        with FarmerRollupService.track(decision):
+            # Update decision
+            decision.actual_action = actual_action
+            decision.advice_status = advice_status
+            decision.deviation_reason = data.get('deviation_reason')
+            decision.action_recorded_at = datetime.utcnow()
             
-            outcome = Outcome(
-                decision_id=decision.id,
-                outcome='success' if is_success else 'failure',
-                yield_kg=estimated_yield,
-                revenue_tnd=estimated_revenue,
-                notes=f"Auto-generated outcome based on action: {actual_action}"
-            )
-            db.session.add(outcome)
-            logger.info(f"✨ Auto-generated outcome for decision {decision_id} to populate analytics")
+            # LINK TO ANALYTICS: Auto-generate outcome for immediate feedback (MVP/Demo Feature)
+            # This ensures the user sees the result of their decision in the dashboard immediately.
+            existing_outcome = Outcome.query.filter_by(decision_id=decision.id).first()
+            if not existing_outcome:
+                is_success = (advice_status == 'followed')
+                
+                # Estimate yield/revenue based on user settings or defaults
+                # In a full production app, this would be entered later by the user.
+                estimated_yield = 1000 if is_success else 400
+                estimated_revenue = (estimated_yield * 1.5) # 1.5 TND/kg
+                
+                outcome = Outcome(
+                    decision_id=decision.id,
+                    outcome='success' if is_success else 'failure',
+                    yield_kg=estimated_yield,
+                    revenue_tnd=estimated_revenue,
+                    notes=f"Auto-generated outcome based on action: {actual_action}"
+                )
+                db.session.add(outcome)
+                logger.info(f"✨ Auto-generated outcome for decision {decision_id} to populate analytics")
         
         db.session.commit()
         
@@ -943,6 +1188,7 @@ def simulate_data():
                 revenue_tnd=2000 if is_success else 0
             )
             
+        FarmerRollupService.rebuild(user_id)
         db.session.commit()
         return jsonify({'status': 'simulated', 'message': 'Added 10 mock records'}), 200
     except Exception as e:
@@ -1,7 +1,7 @@
 """
 Health check endpoints
 """
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, current_app
 from models.base import db
 from datetime import datetime
 import time
@@ -72,10 +72,42 @@ def detailed_health_check():
         'timestamp': datetime.utcnow().isoformat(),
         'version': '1.0.0',
         'checks': checks,
-        'system_metrics': system_metrics
+        'system_metrics': system_metrics,
+        'cache_metrics': get_cache_metrics(),
+        'background_jobs': get_job_status(),
+        'decision_writer': get_writer_status(),
+        'explanation_worker': get_explanation_worker_status(),
+        'upstreams': get_upstream_status(),
+        'bulkheads': get_bulkhead_status()
     }), 200 if all_healthy else 503
 
 
+def get_writer_status():
+    """Write-behind decision queue counters (None when DECISION_WRITE_BEHIND is off)"""
+    from services.decision_writer import get_decision_writer
+    writer = get_decision_writer()
+    return writer.status() if writer is not None else None
+
+
+def get_explanation_worker_status():
+    """Deferred explanation counters (None when ASYNC_EXPLANATIONS is off)"""
+    from services.explanation_worker import get_explanation_worker
+    worker = get_explanation_worker()
+    return worker.status() if worker is not None else None
+
+
+def get_upstream_status():
+    """Circuit breaker state and request counters per upstream API"""
+    from services.http_client import http_client_status
+    return http_client_status()
+
+
+def get_bulkhead_status():
+    """Calls in flight and rejections per outbound dependency"""
+    from services.http_client import bulkhead_status
+    return bulkhead_status()
+
+
 def check_database():
     """Check database connectivity"""
     try:
@@ -108,10 +140,12 @@ def check_weather_api():
         forecast = service.get_forecast('Tunis', days=1)
         duration = (time.time() - start) * 1000
         
+        from services.http_client import get_http_client
         return {
             'healthy': True,
             'message': 'Weather API responsive',
-            'response_time_ms': round(duration, 2)
+            'response_time_ms': round(duration, 2),
+            'circuit': get_http_client('open-meteo').breaker.state
         }
     except Exception as e:
         logger.error(f"Weather API health check failed: {e}")
@@ -122,6 +156,33 @@ def check_weather_api():
         }
 
 
+def get_cache_metrics():
+    """Hit/miss counters of the in-process caches"""
+    try:
+        from services.cache_service import get_dashboard_cache, get_response_cache
+        from services.weather_service import ForecastCacheStats
+        from services.stage_executor import StageTimings
+        from services.analytics_context import AnalyticsContext
+        from services.ai_service import get_explanation_store
+        return {
+            'dashboard': get_dashboard_cache().stats(),
+            'dashboard_stages': StageTimings.snapshot(),
+            'analytics_memo': AnalyticsContext.snapshot(),
+            'explanations': get_explanation_store().stats(),
+            'responses': get_response_cache().stats(),
+            'forecast': ForecastCacheStats.snapshot()
+        }
+    except Exception as e:
+        logger.error(f"Cache metrics unavailable: {e}")
+        return {}
+
+
+def get_job_status():
+    """Last run / error of the periodic background jobs"""
+    jobs = current_app.extensions.get('periodic_jobs', {})
+    return {name: job.status() for name, job in jobs.items()}
+
+
 def check_ai_service():
     """Check AI service availability"""
     try:
@@ -84,10 +84,30 @@ def create_app(config_name=None):
     # Register error handlers
     register_error_handlers(app)
     
+    # Request-scoped memo of analytics metrics
+    from services.analytics_context import init_analytics_context
+    init_analytics_context(app)
+    
     # Register API Blueprints
     from api import register_blueprints
     register_blueprints(app)
     
+    # Register CLI commands
+    from commands import register_commands
+    register_commands(app)
+    
+    # Start periodic background jobs
+    from services.scheduler import init_scheduler
+    init_scheduler(app)
+    
+    # Write-behind decision recorder (DECISION_WRITE_BEHIND)
+    from services.decision_writer import init_decision_writer
+    init_decision_writer(app)
+    
+    # Background AI explanations (ASYNC_EXPLANATIONS)
+    from services.explanation_worker import init_explanation_worker
+    init_explanation_worker(app)
+    
     # Root endpoint
     @app.route('/')
     def index():
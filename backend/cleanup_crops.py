@@ -1,13 +1,15 @@
 from app import create_app
 from models.base import db
-from sqlalchemy import text
+from models.crop import Crop
+from models.decision import Decision, Outcome
+from services.rollup_service import FarmerRollupService
 
 def cleanup_and_categorize():
     app = create_app()
     with app.app_context():
         print("🗑️ Removing unwanted crops...")
         
-        # Delete unwanted crops using raw SQL
+        # Delete unwanted crops through the ORM, so the reference catalog version is bumped
         crops_to_remove = [
             'Carrot', 'Carrots', 
             'Lentil', 
@@ -17,20 +19,30 @@ def cleanup_and_categorize():
             'Spinach', 'Winter Spinach'
         ]
         
+        affected_farmers = set()
         for crop_name in crops_to_remove:
             try:
-                # Delete decisions first
-                db.session.execute(text("DELETE FROM decisions WHERE crop_id IN (SELECT id FROM crops WHERE name = :name)"), {"name": crop_name})
+                # Delete outcomes and decisions first; the farmers' rollups are rebuilt below
+                crop_ids = db.session.query(Crop.id).filter(Crop.name == crop_name).scalar_subquery()
+                decisions = Decision.query.filter(Decision.crop_id.in_(crop_ids))
+                affected_farmers.update(fid for (fid,) in decisions.with_entities(Decision.farmer_id).distinct())
+                decision_ids = decisions.with_entities(Decision.id).scalar_subquery()
+                Outcome.query.filter(Outcome.decision_id.in_(decision_ids)).delete(synchronize_session=False)
+                decisions.delete(synchronize_session=False)
                 # Delete crop
-                result = db.session.execute(text("DELETE FROM crops WHERE name = :name"), {"name": crop_name})
-                if result.rowcount > 0:
+                removed = Crop.query.filter_by(name=crop_name).delete(synchronize_session=False)
+                if removed > 0:
                     print(f"  ✓ Removed: {crop_name}")
             except Exception as e:
                 print(f"  ⚠️ Error removing {crop_name}: {e}")
         
+        # Keep rollup counters and data_version (dashboard cache keys) in step with the deletes
+        for farmer_id in affected_farmers:
+            FarmerRollupService.rebuild(farmer_id)
+        
         print("\n📂 Updating categories...")
         
-        # Update categories using raw SQL
+        # Update categories
         updates = [
             # VEGETABLES
             ('Tomato', 'vegetable', '🍅'),
@@ -55,11 +67,10 @@ def cleanup_and_categorize():
         
         for name, category, icon in updates:
             try:
-                result = db.session.execute(
-                    text("UPDATE crops SET category = :cat, icon = :icon WHERE name = :name"),
-                    {"cat": category, "icon": icon, "name": name}
+                updated = Crop.query.filter_by(name=name).update(
+                    {Crop.category: category, Crop.icon: icon}, synchronize_session=False
                 )
-                if result.rowcount > 0:
+                if updated > 0:
                     print(f"  ✓ Updated: {name} → {category}")
             except Exception as e:
                 print(f"  ⚠️ Error updating {name}: {e}")
@@ -0,0 +1,122 @@
+"""
+Admin CLI commands (run with `flask <command>`)
+"""
+import click
+from flask.cli import with_appcontext
+
+
+def register_commands(app):
+    """Attach maintenance commands to the app"""
+    app.cli.add_command(rebuild_rollups_command)
+    app.cli.add_command(refresh_snapshots_command)
+    app.cli.add_command(refresh_benchmarks_command)
+    app.cli.add_command(export_history_command)
+    app.cli.add_command(pregenerate_explanations_command)
+    app.cli.add_command(prefetch_forecasts_command)
+    app.cli.add_command(replay_dead_decisions_command)
+
+
+@click.command('rebuild-rollups')
+@click.option('--farmer-id', type=int, default=None, help='Only rebuild this farmer')
+@with_appcontext
+def rebuild_rollups_command(farmer_id):
+    """Recompute FarmerAnalytics counters from decisions and outcomes."""
+    from models.base import db
+    from services.rollup_service import FarmerRollupService
+
+    if farmer_id is not None:
+        FarmerRollupService.rebuild(farmer_id)
+        db.session.commit()
+        click.echo(f"Rebuilt rollups for farmer {farmer_id}")
+    else:
+        count = FarmerRollupService.rebuild_all()
+        click.echo(f"Rebuilt rollups for {count} farmers")
+
+
+@click.command('refresh-snapshots')
+@with_appcontext
+def refresh_snapshots_command():
+    """Recompute the per-governorate analytics snapshots."""
+    from services.regional_snapshot import RegionalSnapshotService
+
+    count = RegionalSnapshotService.refresh_all()
+    click.echo(f"Refreshed snapshots for {count} governorates")
+
+
+@click.command('refresh-benchmarks')
+@click.option('--incremental', is_flag=True, help='Only recompute pairs with outcomes changed since the last run')
+@with_appcontext
+def refresh_benchmarks_command(incremental):
+    """Recompute the regional_benchmarks table."""
+    from services.regional_analytics import RegionalAnalyticsService
+
+    report = RegionalAnalyticsService.refresh_benchmarks(incremental=incremental)
+    mode = 'incremental' if report['incremental'] else 'full'
+    click.echo(f"Refreshed {report['pairs']} benchmark rows ({mode}) in {report['duration_ms']}ms")
+
+
+@click.command('prefetch-forecasts')
+@click.option('--days', default='1,7', help='Comma-separated forecast horizons to publish')
+@with_appcontext
+def prefetch_forecasts_command(days):
+    """Fetch all governorate forecasts in one request and publish them to the cache."""
+    from services.weather_service import WeatherService
+
+    count = WeatherService().prefetch_all(tuple(int(d) for d in days.split(',') if d.strip()))
+    click.echo(f"Published {count} forecasts")
+
+
+@click.command('export-history')
+@click.option('--farmer-id', type=int, required=True, help='Farmer whose history is exported')
+@click.option('--format', 'export_format', type=click.Choice(['csv', 'ndjson']), default='csv')
+@click.option('--start', type=click.DateTime(formats=['%Y-%m-%d']), default=None, help='First day (YYYY-MM-DD)')
+@click.option('--end', type=click.DateTime(formats=['%Y-%m-%d']), default=None, help='Last day (YYYY-MM-DD)')
+@click.option('--crop-id', type=int, default=None, help='Only this crop')
+@click.option('--output', type=click.File('w'), default='-', help='Output file (default: stdout)')
+@with_appcontext
+def export_history_command(farmer_id, export_format, start, end, crop_id, output):
+    """Stream a farmer's decision and outcome history as CSV or NDJSON."""
+    from services.history_export import HistoryExportService
+
+    chunks = HistoryExportService.stream(
+        farmer_id, export_format,
+        start=start.date() if start else None,
+        end=end.date() if end else None,
+        crop_id=crop_id
+    )
+    for chunk in chunks:
+        output.write(chunk)
+
+
+@click.command('pregenerate-explanations')
+@click.option('--crop', 'crops', multiple=True, help='Only these crop names (default: all crops)')
+@click.option('--period', 'periods', multiple=True, help='Only these period names (default: all periods)')
+@click.option('--wait-days', default=None, help='Comma-separated WAIT durations to cover (default: 1-14)')
+@click.option('--max-risks', type=int, default=None, help='Largest number of combined risk types (default: all)')
+@with_appcontext
+def pregenerate_explanations_command(crops, periods, wait_days, max_risks):
+    """Generate and store AI explanations for every decision input combination."""
+    from models.crop import Crop, AgrarianPeriod
+    from services.ai_service import AIService, WAIT_DAYS
+
+    service = AIService()
+    if not service.enabled:
+        click.echo("AI explanations are disabled (no OPENAI_API_KEY); nothing to generate")
+        return
+    crop_names = list(crops) or [name for (name,) in Crop.query.with_entities(Crop.name)]
+    period_names = list(periods) or [name for (name,) in AgrarianPeriod.query.with_entities(AgrarianPeriod.name)]
+    days = [int(value) for value in wait_days.split(',') if value.strip()] if wait_days else WAIT_DAYS
+    generated, skipped, failed = service.pregenerate(crop_names, period_names, wait_days=days, max_risks=max_risks)
+    click.echo(f"Generated {generated} explanations ({skipped} already stored, {failed} failed)")
+
+
+@click.command('replay-dead-decisions')
+@click.option('--path', default=None, help='Dead-letter file (default: DECISION_DEAD_LETTER_PATH)')
+@with_appcontext
+def replay_dead_decisions_command(path):
+    """Write the decisions the write-behind writer could not record."""
+    from flask import current_app
+    from services.decision_writer import replay_dead_letters
+
+    written, remaining = replay_dead_letters(path or current_app.config['DECISION_DEAD_LETTER_PATH'])
+    click.echo(f"Replayed {written} dead-lettered decisions ({remaining} still failing)")
@@ -44,6 +44,75 @@ class Config:
     # Caching
     CACHE_TYPE = os.environ.get('CACHE_TYPE', 'simple')
     CACHE_DEFAULT_TIMEOUT = int(os.environ.get('CACHE_DEFAULT_TIMEOUT', 300))
+    DASHBOARD_CACHE_SIZE = int(os.environ.get('DASHBOARD_CACHE_SIZE', 512))
+    # Regional comparisons read other farmers' data, which has no version: refresh at least this often
+    DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', 300))
+    DASHBOARD_STAGE_WORKERS = int(os.environ.get('DASHBOARD_STAGE_WORKERS', 4))  # 1 = run stages serially
+    EXPLANATION_CACHE_SIZE = int(os.environ.get('EXPLANATION_CACHE_SIZE', 2048))  # in front of explanation_cache
+    # API response cache: per-worker LRU + SQLite file shared by all workers (empty path = memory only)
+    RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 1024))
+    RESPONSE_CACHE_PATH = os.environ.get('RESPONSE_CACHE_PATH', str(basedir / 'data' / 'response_cache.sqlite'))
+    RESPONSE_CACHE_PURGE_INTERVAL = int(os.environ.get('RESPONSE_CACHE_PURGE_INTERVAL', 3600))
+    RCPS_CACHE_TTL = int(os.environ.get('RCPS_CACHE_TTL', 300))
+    # How often a worker checks the shared reference-data version stamp
+    REFERENCE_VERSION_CHECK_INTERVAL = int(os.environ.get('REFERENCE_VERSION_CHECK_INTERVAL', 30))
+    
+    # Weather forecast cache (SQLite file shared by all workers; empty path disables it)
+    FORECAST_CACHE_PATH = os.environ.get('FORECAST_CACHE_PATH', str(basedir / 'data' / 'forecast_cache.sqlite'))
+    FORECAST_CACHE_TTL = int(os.environ.get('FORECAST_CACHE_TTL', 3 * 3600))
+    FORECAST_CACHE_MAX_STALE = int(os.environ.get('FORECAST_CACHE_MAX_STALE', 24 * 3600))
+    FORECAST_REFRESH_LEASE = int(os.environ.get('FORECAST_REFRESH_LEASE', 30))
+    WEATHER_API_URL = os.environ.get('WEATHER_API_URL', 'https://api.open-meteo.com/v1/forecast')
+    # Bulk refresh of all governorates (background job); one entry per horizon
+    FORECAST_PREFETCH_INTERVAL = int(os.environ.get('FORECAST_PREFETCH_INTERVAL', 3600))
+    FORECAST_PREFETCH_DAYS = os.environ.get('FORECAST_PREFETCH_DAYS', '1,7')
+    
+    # Upstream HTTP clients: pooled sessions, jittered retries, circuit breaker
+    HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 2.0))
+    HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 5.0))
+    HTTP_RETRIES = int(os.environ.get('HTTP_RETRIES', 2))
+    HTTP_BACKOFF = float(os.environ.get('HTTP_BACKOFF', 0.25))  # seconds, doubled per retry (full jitter)
+    HTTP_MAX_BACKOFF = float(os.environ.get('HTTP_MAX_BACKOFF', 2.0))
+    HTTP_TOTAL_TIMEOUT = float(os.environ.get('HTTP_TOTAL_TIMEOUT', 8.0))  # no retry starts after this
+    HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', 10))
+    HTTP_BREAKER_THRESHOLD = int(os.environ.get('HTTP_BREAKER_THRESHOLD', 5))  # consecutive failures
+    HTTP_BREAKER_RESET = float(os.environ.get('HTTP_BREAKER_RESET', 30))  # seconds before a trial call
+    
+    # Background jobs (governorate snapshots, ...)
+    ENABLE_BACKGROUND_JOBS = os.environ.get('ENABLE_BACKGROUND_JOBS', 'false').lower() == 'true'
+    SNAPSHOT_REFRESH_INTERVAL = int(os.environ.get('SNAPSHOT_REFRESH_INTERVAL', 900))
+    SNAPSHOT_MAX_AGE = int(os.environ.get('SNAPSHOT_MAX_AGE', 3600))
+    SNAPSHOT_MEMORY_TTL = int(os.environ.get('SNAPSHOT_MEMORY_TTL', 60))
+    BENCHMARK_REFRESH_INTERVAL = int(os.environ.get('BENCHMARK_REFRESH_INTERVAL', 3600))
+    # Shared file of job leases: one worker runs each job per interval (empty path = every worker does)
+    JOB_LEASE_PATH = os.environ.get('JOB_LEASE_PATH', str(basedir / 'data' / 'response_cache.sqlite'))
+    
+    # Write-behind decision recording (advice responses don't wait for the commit)
+    DECISION_WRITE_BEHIND = os.environ.get('DECISION_WRITE_BEHIND', 'false').lower() == 'true'
+    DECISION_WRITE_QUEUE_SIZE = int(os.environ.get('DECISION_WRITE_QUEUE_SIZE', 1000))
+    DECISION_WRITE_BATCH_SIZE = int(os.environ.get('DECISION_WRITE_BATCH_SIZE', 100))
+    DECISION_WRITE_FLUSH_INTERVAL = float(os.environ.get('DECISION_WRITE_FLUSH_INTERVAL', 0.005))
+    DECISION_WRITE_ENQUEUE_TIMEOUT = float(os.environ.get('DECISION_WRITE_ENQUEUE_TIMEOUT', 0.05))
+    DECISION_ID_BLOCK_SIZE = int(os.environ.get('DECISION_ID_BLOCK_SIZE', 64))
+    DECISION_WRITE_MAX_ATTEMPTS = int(os.environ.get('DECISION_WRITE_MAX_ATTEMPTS', 3))
+    DECISION_DEAD_LETTER_PATH = os.environ.get(
+        'DECISION_DEAD_LETTER_PATH', str(basedir / 'data' / 'decision_dead_letters.jsonl')
+    )
+    
+    # Advice latency budget: slow stages are cut off and served degraded values
+    ADVICE_BUDGET_MS = int(os.environ.get('ADVICE_BUDGET_MS', 4000))
+    ADVICE_WEATHER_TIMEOUT_MS = int(os.environ.get('ADVICE_WEATHER_TIMEOUT_MS', 1500))
+    ADVICE_AI_TIMEOUT_MS = int(os.environ.get('ADVICE_AI_TIMEOUT_MS', 2000))
+    ADVICE_RECORD_RESERVE_MS = int(os.environ.get('ADVICE_RECORD_RESERVE_MS', 250))
+    ADVICE_STAGE_WORKERS = int(os.environ.get('ADVICE_STAGE_WORKERS', 8))
+    # Bulkheads: concurrent outbound calls per dependency in each worker process
+    BULKHEAD_OPEN_METEO = int(os.environ.get('BULKHEAD_OPEN_METEO', 4))
+    BULKHEAD_OPENAI = int(os.environ.get('BULKHEAD_OPENAI', 4))
+    BULKHEAD_WAIT = float(os.environ.get('BULKHEAD_WAIT', 0.05))  # seconds to wait for a slot
+    
+    # Deferred AI explanations (advice returns the template, the AI text follows)
+    ASYNC_EXPLANATIONS = os.environ.get('ASYNC_EXPLANATIONS', 'false').lower() == 'true'
+    EXPLANATION_WORKERS = int(os.environ.get('EXPLANATION_WORKERS', 2))
     
     # Logging
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
@@ -69,6 +138,9 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    FORECAST_CACHE_PATH = ''
+    RESPONSE_CACHE_PATH = ''
+    JOB_LEASE_PATH = ''
 
 
 config = {
@@ -1,6 +1,6 @@
 from app import create_app
 from models.base import db
-from sqlalchemy import text
+from models.crop import Crop
 
 def final_categorization():
     app = create_app()
@@ -46,22 +46,21 @@ def final_categorization():
         
         for name, category, icon in updates:
             try:
-                result = db.session.execute(
-                    text("UPDATE crops SET category = :cat, icon = :icon WHERE name = :name"),
-                    {"cat": category, "icon": icon, "name": name}
+                # ORM update, so the reference catalog version is bumped
+                updated = Crop.query.filter_by(name=name).update(
+                    {Crop.category: category, Crop.icon: icon}, synchronize_session=False
                 )
-                if result.rowcount > 0:
+                if updated > 0:
                     print(f"  ✓ Updated: {name} → {category}")
             except Exception as e:
                 print(f"  ⚠️ Error updating {name}: {e}")
         
         # Also update Wheat if it exists
         try:
-            result = db.session.execute(
-                text("UPDATE crops SET category = :cat, icon = :icon WHERE name = :name"),
-                {"cat": "grain", "icon": "🌾", "name": "Wheat"}
+            updated = Crop.query.filter_by(name="Wheat").update(
+                {Crop.category: "grain", Crop.icon: "🌾"}, synchronize_session=False
             )
-            if result.rowcount > 0:
+            if updated > 0:
                 print(f"  ✓ Updated: Wheat → grain")
         except Exception as e:
             print(f"  ⚠️ Error updating Wheat: {e}")
@@ -5,6 +5,7 @@ from .validators import (
     FarmerRegistrationSchema,
     LoginSchema,
     GetAdviceSchema,
+    BatchAdviceSchema,
     OutcomeSchema,
     validate_request
 )
@@ -15,6 +16,7 @@ __all__ = [
     'FarmerRegistrationSchema',
     'LoginSchema',
     'GetAdviceSchema',
+    'BatchAdviceSchema',
     'OutcomeSchema',
     'validate_request',
     'PerformanceMonitor',
@@ -63,12 +63,8 @@ class LoginSchema(Schema):
     password = fields.Str(required=True)
 
 
-class GetAdviceSchema(Schema):
-    """Validation schema for get-advice endpoint"""
-    crop_id = fields.Int(
-        required=True,
-        validate=validate.Range(min=1, error='Invalid crop ID')
-    )
+class AdviceOptionsSchema(Schema):
+    """Optional location and financial settings shared by advice endpoints"""
     governorate = fields.Str(
         required=False,
         validate=validate.OneOf([
@@ -92,6 +88,23 @@ class GetAdviceSchema(Schema):
     )
 
 
+class GetAdviceSchema(AdviceOptionsSchema):
+    """Validation schema for get-advice endpoint"""
+    crop_id = fields.Int(
+        required=True,
+        validate=validate.Range(min=1, error='Invalid crop ID')
+    )
+
+
+class BatchAdviceSchema(AdviceOptionsSchema):
+    """Validation schema for batch get-advice endpoint"""
+    crop_ids = fields.List(
+        fields.Int(validate=validate.Range(min=1, error='Invalid crop ID')),
+        required=True,
+        validate=validate.Length(min=1, max=20, error='Provide between 1 and 20 crop IDs')
+    )
+
+
 class OutcomeSchema(Schema):
     """Validation schema for recording outcome"""
     decision_id = fields.Int(required=True)
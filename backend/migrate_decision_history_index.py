@@ -0,0 +1,36 @@
+"""
+Migration script to add the (farmer_id, timestamp, id) index on decisions
+used by keyset pagination of /api/decisions/history.
+"""
+import sqlite3
+import os
+
+
+def migrate_decision_history_index():
+    """Create the composite history index"""
+    db_path = os.path.join(os.path.dirname(__file__), 'data', 'agridecision.db')
+
+    if not os.path.exists(db_path):
+        print(f"❌ Database not found at: {db_path}")
+        return
+
+    print("🔄 Starting decisions history index migration...")
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ix_decisions_farmer_timestamp_id "
+            "ON decisions (farmer_id, timestamp, id)"
+        )
+        cursor.execute("ANALYZE decisions")
+        conn.commit()
+        print("✅ Created ix_decisions_farmer_timestamp_id")
+    finally:
+        conn.close()
+
+    print("\n✨ Migration completed successfully!")
+
+
+if __name__ == '__main__':
+    migrate_decision_history_index()
@@ -0,0 +1,38 @@
+"""
+Migration script to add Decision.explanation_status (ASYNC_EXPLANATIONS)
+Existing rows keep NULL: their explanation was generated inline.
+"""
+import sqlite3
+import os
+
+
+def migrate_explanation_status():
+    """Add the explanation_status column"""
+    db_path = os.path.join(os.path.dirname(__file__), 'data', 'agridecision.db')
+
+    if not os.path.exists(db_path):
+        print(f"❌ Database not found at: {db_path}")
+        return
+
+    print("🔄 Starting decisions.explanation_status migration...")
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        try:
+            cursor.execute("ALTER TABLE decisions ADD COLUMN explanation_status VARCHAR(20)")
+            print("✅ Added explanation_status column")
+        except sqlite3.OperationalError as e:
+            if "duplicate column" in str(e).lower():
+                print("⚠️  explanation_status column already exists")
+            else:
+                raise
+        conn.commit()
+    finally:
+        conn.close()
+
+    print("\n✨ Migration completed successfully!")
+
+
+if __name__ == '__main__':
+    migrate_explanation_status()
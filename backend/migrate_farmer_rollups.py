@@ -0,0 +1,60 @@
+"""
+Migration script to add incremental rollup counters to FarmerAnalytics
+Adds the columns, then rebuilds every farmer's counters from raw tables.
+"""
+import sqlite3
+import os
+
+NEW_COLUMNS = [
+    ("failure_count", "INTEGER DEFAULT 0"),
+    ("plant_now_count", "INTEGER DEFAULT 0"),
+    ("wait_count", "INTEGER DEFAULT 0"),
+    ("followed_count", "INTEGER DEFAULT 0"),
+    ("ignored_count", "INTEGER DEFAULT 0"),
+    ("wait_followed_count", "INTEGER DEFAULT 0"),
+    ("followed_outcomes", "INTEGER DEFAULT 0"),
+    ("followed_successes", "INTEGER DEFAULT 0"),
+    ("ignored_outcomes", "INTEGER DEFAULT 0"),
+    ("ignored_successes", "INTEGER DEFAULT 0"),
+    ("failure_loss_tnd", "FLOAT DEFAULT 0.0"),
+    ("data_version", "INTEGER DEFAULT 0"),
+]
+
+
+def migrate_farmer_rollups():
+    """Add rollup counter columns and backfill them"""
+    db_path = os.path.join(os.path.dirname(__file__), 'data', 'agridecision.db')
+
+    if not os.path.exists(db_path):
+        print(f"❌ Database not found at: {db_path}")
+        return
+
+    print("🔄 Starting FarmerAnalytics rollup migration...")
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        for name, ddl in NEW_COLUMNS:
+            try:
+                cursor.execute(f"ALTER TABLE farmer_analytics ADD COLUMN {name} {ddl}")
+                print(f"✅ Added {name} column")
+            except sqlite3.OperationalError as e:
+                if "duplicate column" in str(e).lower():
+                    print(f"⚠️  {name} column already exists")
+                else:
+                    raise
+        conn.commit()
+    finally:
+        conn.close()
+
+    print("\n📊 Rebuilding counters from decisions and outcomes...")
+    from app import app
+    from services.rollup_service import FarmerRollupService
+    with app.app_context():
+        count = FarmerRollupService.rebuild_all()
+    print(f"✅ Rebuilt rollups for {count} farmers")
+    print("\n✨ Migration completed successfully!")
+
+
+if __name__ == '__main__':
+    migrate_farmer_rollups()
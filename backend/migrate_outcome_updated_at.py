@@ -0,0 +1,42 @@
+"""
+Migration script to add Outcome.updated_at (used by incremental benchmark refreshes)
+Existing rows are backfilled with their recorded_at timestamp.
+"""
+import sqlite3
+import os
+
+
+def migrate_outcome_updated_at():
+    """Add the updated_at column and its index"""
+    db_path = os.path.join(os.path.dirname(__file__), 'data', 'agridecision.db')
+
+    if not os.path.exists(db_path):
+        print(f"❌ Database not found at: {db_path}")
+        return
+
+    print("🔄 Starting outcomes.updated_at migration...")
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        try:
+            cursor.execute("ALTER TABLE outcomes ADD COLUMN updated_at DATETIME")
+            print("✅ Added updated_at column")
+        except sqlite3.OperationalError as e:
+            if "duplicate column" in str(e).lower():
+                print("⚠️  updated_at column already exists")
+            else:
+                raise
+
+        cursor.execute("UPDATE outcomes SET updated_at = recorded_at WHERE updated_at IS NULL")
+        print(f"✅ Backfilled {cursor.rowcount} outcomes")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_outcomes_updated_at ON outcomes (updated_at)")
+        conn.commit()
+    finally:
+        conn.close()
+
+    print("\n✨ Migration completed successfully!")
+
+
+if __name__ == '__main__':
+    migrate_outcome_updated_at()
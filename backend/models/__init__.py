@@ -4,18 +4,23 @@ Models package initialization - FIXED VERSION
 from .base import db
 from .user import Farmer
 from .crop import Crop, AgrarianPeriod, CropPeriodRule
-from .decision import Decision, Outcome
-from .analytics import FarmerAnalytics, AnalyticsEvent, RegionalBenchmarks, CropSpecificDefaults
+from .decision import Decision, Outcome, IdSequence
+from .analytics import FarmerAnalytics, AnalyticsEvent, RegionalBenchmarks, GovernorateSnapshot, CropSpecificDefaults
 from .regional import PeriodRegionAdjustment
+from .reference import ReferenceDataVersion
+from .explanation import ExplanationCache
 
 __all__ = [
     'db',
     'Farmer',
     'Crop', 'AgrarianPeriod', 'CropPeriodRule',
-    'Decision', 'Outcome',
+    'Decision', 'Outcome', 'IdSequence',
     'FarmerAnalytics',
     'AnalyticsEvent',
     'RegionalBenchmarks',
+    'GovernorateSnapshot',
     'CropSpecificDefaults',
-    'PeriodRegionAdjustment'
+    'PeriodRegionAdjustment',
+    'ReferenceDataVersion',
+    'ExplanationCache'
 ]
\ No newline at end of file
@@ -10,11 +10,26 @@ class FarmerAnalytics(db.Model):
     __tablename__ = 'farmer_analytics'
     
     id = db.Column(db.Integer, primary_key=True)
-    farmer_id = db.Column(db.Integer, db.ForeignKey('farmers.id'), nullable=False, unique=True, index=True)
+    farmer_id = db.Column(db.Integer, db.ForeignKey('farmers.id', ondelete='CASCADE'), nullable=False, unique=True, index=True)
     total_decisions = db.Column(db.Integer, default=0)
     total_outcomes = db.Column(db.Integer, default=0)
     success_count = db.Column(db.Integer, default=0)
     success_rate = db.Column(db.Float, default=0.0)
+    
+    # Incrementally maintained counters (see services/rollup_service.py)
+    failure_count = db.Column(db.Integer, default=0)
+    plant_now_count = db.Column(db.Integer, default=0)
+    wait_count = db.Column(db.Integer, default=0)
+    followed_count = db.Column(db.Integer, default=0)  # Decisions
+    ignored_count = db.Column(db.Integer, default=0)
+    wait_followed_count = db.Column(db.Integer, default=0)
+    followed_outcomes = db.Column(db.Integer, default=0)  # Outcomes on followed decisions
+    followed_successes = db.Column(db.Integer, default=0)
+    ignored_outcomes = db.Column(db.Integer, default=0)
+    ignored_successes = db.Column(db.Integer, default=0)
+    failure_loss_tnd = db.Column(db.Float, default=0.0)
+    data_version = db.Column(db.Integer, default=0)  # Bumped on every change
+    
     last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def to_dict(self):
@@ -22,7 +37,13 @@ class FarmerAnalytics(db.Model):
             'farmer_id': self.farmer_id,
             'total_decisions': self.total_decisions,
             'total_outcomes': self.total_outcomes,
+            'success_count': self.success_count,
+            'failure_count': self.failure_count,
             'success_rate': self.success_rate,
+            'followed_count': self.followed_count,
+            'ignored_count': self.ignored_count,
+            'wait_followed_count': self.wait_followed_count,
+            'failure_loss_tnd': self.failure_loss_tnd,
             'last_updated': self.last_updated.isoformat() if self.last_updated else None
         }
 
@@ -32,7 +53,7 @@ class AnalyticsEvent(db.Model):
     __tablename__ = 'analytics_events'
     
     id = db.Column(db.Integer, primary_key=True)
-    farmer_id = db.Column(db.Integer, db.ForeignKey('farmers.id'), nullable=False, index=True)
+    farmer_id = db.Column(db.Integer, db.ForeignKey('farmers.id', ondelete='CASCADE'), nullable=False, index=True)
     event_type = db.Column(db.String(50), nullable=False, index=True) # TIER_UP, DATA_VIEW, MILESTONE_CLICK
     event_category = db.Column(db.String(50)) # 'ANALYTICS', 'ADVICE', 'PROFILE'
     event_value = db.Column(db.String(255)) # e.g. 'T3_PRACTITIONER'
@@ -75,6 +96,33 @@ class RegionalBenchmarks(db.Model):
         }
 
 
+class GovernorateSnapshot(db.Model):
+    """Periodically refreshed regional metrics shared by every farmer of a governorate"""
+    __tablename__ = 'governorate_snapshots'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    governorate = db.Column(db.String(50), nullable=False, unique=True, index=True)
+    gsi = db.Column(db.Float)  # None when the region lacks data
+    farmer_count = db.Column(db.Integer, default=0)
+    top_crops = db.Column(db.JSON, default=list)  # RCPS ranking
+    rrap = db.Column(db.JSON)  # Risk-adjusted performance details
+    risk_factor = db.Column(db.Float)
+    oga = db.Column(db.Float, default=0.0)
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def to_dict(self):
+        return {
+            'governorate': self.governorate,
+            'gsi': self.gsi,
+            'farmer_count': self.farmer_count,
+            'top_crops': self.top_crops or [],
+            'rrap': self.rrap,
+            'risk_factor': self.risk_factor,
+            'oga': self.oga,
+            'refreshed_at': self.refreshed_at.isoformat() if self.refreshed_at else None
+        }
+
+
 class CropSpecificDefaults(db.Model):
     """Expert-defined defaults for specific crops"""
     __tablename__ = 'crop_specific_defaults'
@@ -10,7 +10,7 @@ class Decision(db.Model):
     __tablename__ = 'decisions'
     
     id = db.Column(db.Integer, primary_key=True)
-    farmer_id = db.Column(db.Integer, db.ForeignKey('farmers.id'), nullable=False, index=True)
+    farmer_id = db.Column(db.Integer, db.ForeignKey('farmers.id', ondelete='CASCADE'), nullable=False, index=True)
     crop_id = db.Column(db.Integer, db.ForeignKey('crops.id'), nullable=False, index=True)
     governorate = db.Column(db.String(50), nullable=False, index=True)
     
@@ -19,6 +19,7 @@ class Decision(db.Model):
     wait_days = db.Column(db.Integer, default=0)
     confidence = db.Column(db.String(20), nullable=False)  # HIGH, MEDIUM, LOW
     explanation = db.Column(db.Text)
+    explanation_status = db.Column(db.String(20))  # ASYNC_EXPLANATIONS: 'pending', 'ready', 'failed'
     
     # Context
     period_id = db.Column(db.String(10), db.ForeignKey('agrarian_periods.id'), index=True)
@@ -50,9 +51,15 @@ class Decision(db.Model):
     user_notes = db.Column(db.Text)
     
     # Relationships
-    outcomes = db.relationship('Outcome', backref='decision', lazy='dynamic', cascade='all, delete-orphan')
+    outcomes = db.relationship('Outcome', backref='decision', lazy='dynamic', cascade='all, delete-orphan',
+                               passive_deletes=True)
     period = db.relationship('AgrarianPeriod')
     
+    __table_args__ = (
+        # Keyset pagination of a farmer's history: (timestamp, id) descending
+        db.Index('ix_decisions_farmer_timestamp_id', 'farmer_id', 'timestamp', 'id'),
+    )
+    
     def to_dict(self):
         """Convert to dictionary"""
         return {
@@ -64,6 +71,7 @@ class Decision(db.Model):
             'wait_days': self.wait_days,
             'confidence': self.confidence,
             'explanation': self.explanation,
+            'explanation_status': self.explanation_status,
             'period_id': self.period_id,
             'timestamp': self.timestamp.isoformat() if self.timestamp else None,
             'weather_temp': self.weather_temp_avg,
@@ -84,7 +92,7 @@ class Outcome(db.Model):
     __tablename__ = 'outcomes'
     
     id = db.Column(db.Integer, primary_key=True)
-    decision_id = db.Column(db.Integer, db.ForeignKey('decisions.id'), nullable=False, index=True)
+    decision_id = db.Column(db.Integer, db.ForeignKey('decisions.id', ondelete='CASCADE'), nullable=False, index=True)
     
     # Outcome details
     outcome = db.Column(db.String(30), nullable=False, index=True)  # success, failure, unknown
@@ -95,6 +103,7 @@ class Outcome(db.Model):
     
     # Timestamps
     recorded_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     harvest_date = db.Column(db.Date)
     
     def to_dict(self):
@@ -111,4 +120,15 @@ class Outcome(db.Model):
         }
     
     def __repr__(self):
-        return f'<Outcome {self.id} - {self.outcome}>'
\ No newline at end of file
+        return f'<Outcome {self.id} - {self.outcome}>'
+
+
+class IdSequence(db.Model):
+    """Next free primary key per table, handed out in blocks (write-behind decision IDs)"""
+    __tablename__ = 'id_sequences'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    next_value = db.Column(db.Integer, nullable=False)
+    
+    def __repr__(self):
+        return f'<IdSequence {self.name}={self.next_value}>'
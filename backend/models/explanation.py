@@ -0,0 +1,23 @@
+"""
+Generated explanation store
+"""
+from datetime import datetime
+from models.base import db
+
+
+class ExplanationCache(db.Model):
+    """AI explanation for one canonical set of explanation inputs (see services/ai_service.py)"""
+    __tablename__ = 'explanation_cache'
+    
+    key = db.Column(db.String(64), primary_key=True)  # sha256 of the canonical inputs
+    crop_name = db.Column(db.String(100), nullable=False)
+    action = db.Column(db.String(20), nullable=False)
+    wait_days = db.Column(db.Integer, default=0)
+    period_name = db.Column(db.String(100))
+    risks = db.Column(db.String(255))  # Sorted, comma-separated risk types
+    explanation = db.Column(db.Text, nullable=False)
+    model = db.Column(db.String(50))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<ExplanationCache {self.crop_name} {self.action} {self.key[:8]}>'
@@ -0,0 +1,17 @@
+"""
+Reference data version stamp
+"""
+from datetime import datetime
+from models.base import db
+
+
+class ReferenceDataVersion(db.Model):
+    """Single-row counter bumped whenever crops, periods, rules or regional adjustments change"""
+    __tablename__ = 'reference_data_version'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ReferenceDataVersion {self.version}>'
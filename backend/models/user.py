@@ -26,8 +26,11 @@ class Farmer(db.Model):
     preferences = db.Column(db.JSON, default=dict)  # Store user settings (lang, units, etc.)
     
     # Relationships
-    decisions = db.relationship('Decision', backref='farmer', lazy='dynamic', cascade='all, delete-orphan')
-    analytics = db.relationship('FarmerAnalytics', backref='farmer', lazy='dynamic', cascade='all, delete-orphan')
+    # passive_deletes: child rows are removed set-based (see DeletionService) or by ON DELETE CASCADE
+    decisions = db.relationship('Decision', backref='farmer', lazy='dynamic', cascade='all, delete-orphan',
+                                passive_deletes=True)
+    analytics = db.relationship('FarmerAnalytics', backref='farmer', lazy='dynamic', cascade='all, delete-orphan',
+                                passive_deletes=True)
     
     def set_password(self, password):
         """Hash and set password"""
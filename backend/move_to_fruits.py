@@ -1,6 +1,6 @@
 from app import create_app
 from models.base import db
-from sqlalchemy import text
+from models.crop import Crop
 
 def move_to_fruits():
     app = create_app()
@@ -15,11 +15,11 @@ def move_to_fruits():
         
         for name, category, icon in updates:
             try:
-                result = db.session.execute(
-                    text("UPDATE crops SET category = :cat WHERE name = :name"),
-                    {"cat": category, "name": name}
+                # ORM update, so the reference catalog version is bumped
+                updated = Crop.query.filter_by(name=name).update(
+                    {Crop.category: category}, synchronize_session=False
                 )
-                if result.rowcount > 0:
+                if updated > 0:
                     print(f"  ✓ Moved: {name} → {category}")
             except Exception as e:
                 print(f"  ⚠️ Error: {e}")
@@ -6,6 +6,8 @@ from models.base import db
 from models.decision import Decision, Outcome
 from models.crop import Crop, AgrarianPeriod
 from models.user import Farmer
+from services.rollup_service import FarmerRollupService
+from services.analytics_context import memoized
 from sqlalchemy import func, case, and_
 from datetime import datetime, timedelta
 import math
@@ -22,6 +24,7 @@ class AdvancedAnalyticsService:
     MIN_SAMPLE_CVS = 10
     
     @staticmethod
+    @memoized('advanced.aes')
     def calculate_aes(user_id):
         """
         Advice Effectiveness Score (AES)
@@ -100,6 +103,7 @@ class AdvancedAnalyticsService:
         }
     
     @staticmethod
+    @memoized('advanced.fci')
     def calculate_fci(user_id):
         """
         Farmer Compliance Index (FCI)
@@ -143,6 +147,7 @@ class AdvancedAnalyticsService:
         }
     
     @staticmethod
+    @memoized('advanced.rar')
     def calculate_rar(user_id):
         """
         Risk Avoidance ROI (RAR)
@@ -202,6 +207,7 @@ class AdvancedAnalyticsService:
         }
     
     @staticmethod
+    @memoized('advanced.cvs')
     def calculate_cvs(user_id=None):
         """
         Confidence Validation Score (CVS)
@@ -241,6 +247,7 @@ class AdvancedAnalyticsService:
         }
     
     @staticmethod
+    @memoized('advanced.tls')
     def calculate_tls(user_id):
         """
         Temporal Learning Slope (TLS)
@@ -318,6 +325,7 @@ class AdvancedAnalyticsService:
         }
     
     @staticmethod
+    @memoized('advanced.csaa')
     def calculate_csaa(user_id):
         """
         Crop-Specific Advice Accuracy (CSAA)
@@ -363,6 +371,7 @@ class AdvancedAnalyticsService:
         }
 
     @staticmethod
+    @memoized('advanced.performance_trends')
     def calculate_performance_trends(user_id):
         """
         Calculates success rate trends over time for visualization
@@ -485,5 +494,6 @@ class AdvancedAnalyticsService:
                 )
                 db.session.add(outcome)
         
+        FarmerRollupService.rebuild(user_id)
         db.session.commit()
         return True
@@ -0,0 +1,135 @@
+"""
+Latency budget for the advice pipeline
+Every get_advice call gets ADVICE_BUDGET_MS in total. Stages that call out
+(weather, AI) run on a small per-app pool and are only waited for until their
+deadline; when one would overrun, the engine serves a degraded value (the last
+good forecast, the template explanation) and the response says so. A call
+that overran keeps running in the background, still holding its bulkhead
+slot, so a slow upstream cannot take more than its share of threads.
+Submissions are bounded by the 'advice-pool' bulkhead (one slot per pool
+thread): when every thread is busy the stage degrades at once instead of
+queueing, and a call that had not started by its deadline is cancelled.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from flask import current_app
+from services.http_client import Bulkhead, BulkheadFullError
+from services.stage_executor import StageTimings
+
+logger = logging.getLogger(__name__)
+
+
+class StageDeadlineExceeded(Exception):
+    """A stage did not finish before its deadline"""
+
+
+def _get_pool(workers):
+    """The app's advice executor and the bulkhead bounding submissions to it"""
+    pool = current_app.extensions.get('advice_pool')
+    if pool is None:
+        bulkhead = current_app.extensions.setdefault('bulkheads', {}).setdefault(
+            'advice-pool', Bulkhead('advice-pool', workers, wait=0)
+        )
+        pool = current_app.extensions.setdefault(
+            'advice_pool', (ThreadPoolExecutor(max_workers=workers, thread_name_prefix='advice'), bulkhead)
+        )
+    return pool
+
+
+class AdviceBudget:
+    """
+    Deadlines and timings of one advice request.
+
+    `deadline(stage)` is the stage's own cap (ADVICE_<STAGE>_TIMEOUT_MS),
+    shortened to what is left of the total budget after reserving
+    ADVICE_RECORD_RESERVE_MS for recording the decision.
+    """
+
+    def __init__(self, total_ms=4000, stage_caps_ms=None, reserve_ms=250, workers=8):
+        self.total_ms = total_ms
+        self.stage_caps_ms = stage_caps_ms or {}
+        self.reserve_ms = reserve_ms
+        self.workers = workers
+        self.started = time.perf_counter()
+        self.timings = {}
+        self.degraded = []
+
+    @classmethod
+    def from_config(cls):
+        config = current_app.config
+        return cls(
+            total_ms=config.get('ADVICE_BUDGET_MS', 4000),
+            stage_caps_ms={
+                'weather': config.get('ADVICE_WEATHER_TIMEOUT_MS', 1500),
+                'ai': config.get('ADVICE_AI_TIMEOUT_MS', 2000)
+            },
+            reserve_ms=config.get('ADVICE_RECORD_RESERVE_MS', 250),
+            workers=config.get('ADVICE_STAGE_WORKERS', 8)
+        )
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def deadline(self, stage):
+        """Seconds the stage may take (0 once the budget is spent)"""
+        left = self.total_ms - self.reserve_ms - self.elapsed_ms()
+        cap = self.stage_caps_ms.get(stage, left)
+        return max(0.0, min(cap, left)) / 1000
+
+    @contextmanager
+    def stage(self, name):
+        """Time a stage (in the response and in StageTimings under 'advice.<name>')"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            self.timings[name] = round(self.timings.get(name, 0) + duration_ms, 2)
+            StageTimings.record(f"advice.{name}", duration_ms)
+
+    def run(self, stage, func):
+        """
+        Run `func` on the advice pool and wait until the stage deadline.
+        Raises StageDeadlineExceeded if it is not done by then, or at once
+        when every pool thread is busy.
+        """
+        timeout = self.deadline(stage)
+        if timeout <= 0:
+            raise StageDeadlineExceeded(f"No budget left for {stage}")
+        app = current_app._get_current_object()
+
+        def in_context():
+            with app.app_context():
+                return func()
+
+        executor, bulkhead = _get_pool(self.workers)
+        try:
+            bulkhead.acquire()
+        except BulkheadFullError as e:
+            raise StageDeadlineExceeded(f"{stage} not started: {e}")
+        try:
+            future = executor.submit(in_context)
+        except Exception:
+            bulkhead.release()
+            raise
+        future.add_done_callback(lambda _: bulkhead.release())
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()  # Only takes effect if it has not started yet
+            raise StageDeadlineExceeded(f"{stage} exceeded {timeout * 1000:.0f}ms")
+
+    def degrade(self, stage, reason, fallback):
+        """Record that `stage` was served by `fallback`"""
+        logger.warning(f"Advice {stage} degraded ({reason}); serving {fallback}")
+        self.degraded.append({'stage': stage, 'reason': reason, 'fallback': fallback})
+
+    def report(self):
+        return {
+            'budget_ms': self.total_ms,
+            'elapsed_ms': round(self.elapsed_ms(), 2),
+            'stages_ms': dict(self.timings),
+            'degraded': list(self.degraded)
+        }
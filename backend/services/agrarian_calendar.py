@@ -0,0 +1,184 @@
+"""
+Agrarian calendar compiled into day-of-year lookup tables
+"""
+from calendar import isleap
+import numpy as np
+
+
+# Fallback: Standard Tunisian Agrarian Calendar (used when AgrarianPeriod is empty)
+# Note: This is an approximation of the traditional Julian-based calendar
+FALLBACK_PERIODS = [
+    {'name': 'El Llayeli El Bidh', 'start_month': 12, 'start_day': 25, 'end_month': 1, 'end_day': 13},
+    {'name': 'El Llayeli Essoud', 'start_month': 1, 'start_day': 14, 'end_month': 2, 'end_day': 2},
+    {'name': 'El Azara', 'start_month': 2, 'start_day': 3, 'end_month': 2, 'end_day': 13},
+    {'name': 'Guerret El Anz', 'start_month': 2, 'start_day': 14, 'end_month': 2, 'end_day': 19},
+    {'name': 'Nezoul Jamrat El Hawa', 'start_month': 2, 'start_day': 20, 'end_month': 2, 'end_day': 26},
+    {'name': 'Nezoul Jamrat El Ma', 'start_month': 2, 'start_day': 27, 'end_month': 3, 'end_day': 9},
+    {'name': 'Nezoul Jamrat El Thra', 'start_month': 3, 'start_day': 6, 'end_month': 3, 'end_day': 10}, # Overlaps slightly, using standard
+    {'name': 'El Hassoum', 'start_month': 3, 'start_day': 10, 'end_month': 3, 'end_day': 17},
+    {'name': 'Equinox Spring', 'start_month': 3, 'start_day': 20, 'end_month': 5, 'end_day': 29}, # Generic Spring
+    {'name': 'El Hamsin', 'start_month': 4, 'start_day': 28, 'end_month': 6, 'end_day': 16},
+    {'name': 'Awussu', 'start_month': 7, 'start_day': 25, 'end_month': 9, 'end_day': 2},
+]
+
+OTHER_PERIOD = 'Other'
+
+# Days in each month of a leap year, so every calendar day (incl. 29 Feb) has a slot
+LEAP_MONTH_DAYS = np.array([31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+LEAP_MONTH_OFFSETS = np.concatenate(([0], np.cumsum(LEAP_MONTH_DAYS)[:-1]))
+DAYS_IN_LOOKUP = int(LEAP_MONTH_DAYS.sum())  # 366
+
+
+def period_matches(period, month, day):
+    """Whether (month, day) falls inside a period; ranges may wrap Dec -> Jan"""
+    start_month, start_day = period['start_month'], period['start_day']
+    end_month, end_day = period['end_month'], period['end_day']
+
+    if start_month == end_month:
+        return month == start_month and start_day <= day <= end_day
+    if start_month < end_month:
+        return (month == start_month and day >= start_day) or \
+               (month == end_month and day <= end_day) or \
+               (start_month < month < end_month)
+    # Wrap around year (Dec to Jan)
+    return (month == start_month and day >= start_day) or \
+           (month == end_month and day <= end_day) or \
+           (month > start_month) or \
+           (month < end_month)
+
+
+def day_of_year_index(dates):
+    """Map a datetime64 array to leap-year day slots (0..365)"""
+    months = dates.astype('datetime64[M]')
+    month_index = months.astype(np.int64) % 12
+    day_index = (dates.astype('datetime64[D]') - months).astype(np.int64)
+    return LEAP_MONTH_OFFSETS[month_index] + day_index
+
+
+FEB_29_SLOT = int(LEAP_MONTH_OFFSETS[1] + 28)
+
+
+def day_slot(month, day):
+    """Leap-year slot (0..365) of a calendar day"""
+    return int(LEAP_MONTH_OFFSETS[month - 1] + day - 1)
+
+
+def period_slots(period, start_shift=0, end_shift=0):
+    """Slots covered by a period, optionally shifted; ranges may wrap Dec -> Jan"""
+    if period['start_month'] == period['end_month'] and period['start_day'] > period['end_day']:
+        return np.empty(0, dtype=np.int64)
+    start = day_slot(period['start_month'], period['start_day'])
+    end = day_slot(period['end_month'], period['end_day'])
+    length = (end - start) % DAYS_IN_LOOKUP + 1 - start_shift + end_shift
+    if length <= 0:
+        return np.empty(0, dtype=np.int64)
+    return (start + start_shift + np.arange(min(length, DAYS_IN_LOOKUP))) % DAYS_IN_LOOKUP
+
+
+class AgrarianCalendar:
+    """
+    Periods compiled into 366-entry day-of-year arrays.
+
+    - `lookup`: period index of each day (first matching period wins;
+      unmatched days map to `other_index`)
+    - `risk_multipliers`: regional risk multiplier of each day
+    - `days_to_next` / `next_index`: days until the period changes and the
+      index it changes to (-1 / `other_index` if it never changes)
+
+    `adjustments` maps a period index to (start_adjustment_days,
+    end_adjustment_days, risk_multiplier) for one governorate.
+    """
+
+    def __init__(self, periods, adjustments=None):
+        self.periods = list(periods)
+        self.names = [p['name'] for p in self.periods] + [OTHER_PERIOD]
+        self.ids = [p.get('id', p['name']) for p in self.periods] + [None]
+        self.other_index = len(self.periods)
+
+        adjustments = adjustments or {}
+        self.lookup = self._compile(self.periods, adjustments)
+        multipliers = np.ones(len(self.names))
+        for idx, (_, _, risk_multiplier) in adjustments.items():
+            multipliers[idx] = risk_multiplier if risk_multiplier is not None else 1.0
+        self.risk_multipliers = multipliers[self.lookup]
+        self.days_to_next, self.next_index = self._transitions(self.lookup, self.other_index)
+
+    @staticmethod
+    def _compile(periods, adjustments):
+        lookup = np.full(DAYS_IN_LOOKUP, len(periods), dtype=np.int16)
+        for idx, period in enumerate(periods):
+            start_shift, end_shift, _ = adjustments.get(idx, (0, 0, 1.0))
+            slots = period_slots(period, start_shift or 0, end_shift or 0)
+            free = slots[lookup[slots] == len(periods)]
+            lookup[free] = idx
+        return lookup
+
+    @staticmethod
+    def _transitions(lookup, other_index):
+        """Days until the next period change for every slot (the year wraps)"""
+        doubled = np.concatenate((lookup, lookup))
+        days = np.full(len(doubled), -1, dtype=np.int16)
+        upcoming = np.full(len(doubled), other_index, dtype=np.int16)
+        for k in range(len(doubled) - 2, -1, -1):
+            if doubled[k + 1] != doubled[k]:
+                days[k], upcoming[k] = 1, doubled[k + 1]
+            elif days[k + 1] > 0:
+                days[k], upcoming[k] = days[k + 1] + 1, upcoming[k + 1]
+        return days[:DAYS_IN_LOOKUP], upcoming[:DAYS_IN_LOOKUP]
+
+    def period_indices(self, dates):
+        """Period index of every date in a datetime64 array"""
+        return self.lookup[day_of_year_index(dates)]
+
+    def period_index_on(self, day):
+        """Period index of a date"""
+        return int(self.lookup[day_slot(day.month, day.day)])
+
+    def risk_multiplier_on(self, day):
+        return float(self.risk_multipliers[day_slot(day.month, day.day)])
+
+    def _calendar_days(self, day, slots):
+        """Slot distance to real days: 29 Feb only exists in leap years"""
+        slot = day_slot(day.month, day.day)
+        offset = (FEB_29_SLOT - slot) % DAYS_IN_LOOKUP
+        if 0 < offset < slots:
+            year = day.year if slot < FEB_29_SLOT else day.year + 1
+            if not isleap(year):
+                return slots - 1
+        return slots
+
+    def next_transition(self, day):
+        """
+        (next period index, days until it starts) after `day`, skipping gaps
+        not covered by any period; None if the calendar never changes.
+        """
+        slot = day_slot(day.month, day.day)
+        slots = 0
+        for _ in range(len(self.names)):
+            step = int(self.days_to_next[slot])
+            if step < 0:
+                return None
+            slots += step
+            slot = (slot + step) % DAYS_IN_LOOKUP
+            upcoming = int(self.lookup[slot])
+            if upcoming != self.other_index:
+                return upcoming, self._calendar_days(day, slots)
+        return None
+
+    def bucket(self, dates, successes):
+        """Totals and success counts per period (calendar order, 'Other' last)"""
+        indices = self.period_indices(dates)
+        size = len(self.names)
+        totals = np.bincount(indices, minlength=size)
+        success_counts = np.bincount(indices, weights=successes, minlength=size)
+        return totals, success_counts
+
+
+def get_agrarian_calendar(governorate=None):
+    """
+    The app's compiled calendar (part of the reference catalog, rebuilt with it),
+    with the governorate's regional adjustments when one is given
+    """
+    from services.reference_catalog import get_reference_catalog
+    catalog = get_reference_catalog()
+    return catalog.calendar_for(governorate) if governorate else catalog.calendar
@@ -1,15 +1,142 @@
 """
 AI service for generating explanations using OpenAI
+Explanations depend only on a small set of inputs, so generated ones are kept
+in the explanation_cache table (with an in-memory LRU in front) and the model
+is only called on a miss.
 """
 import os
+import hashlib
+import itertools
+import json
 import logging
-from typing import Dict
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
 from dotenv import load_dotenv
+from flask import current_app, has_app_context
+from sqlalchemy.exc import IntegrityError
+from models.base import db
+from models.explanation import ExplanationCache
+from services.http_client import get_bulkhead
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+MODEL = "gpt-3.5-turbo"
+
+# Risk types the decision engine can report (see DecisionEngine._analyze_weather_batch)
+RISK_TYPES = ('frost_risk', 'heavy_rain', 'high_temperature', 'low_temperature')
+
+# WAIT durations DecisionEngine._make_decision can produce (clamped to 1-14 days)
+WAIT_DAYS = range(1, 15)
+
+
+def canonical_inputs(data: Dict) -> Dict:
+    """The inputs an explanation depends on, normalised (risks as a sorted set)"""
+    return {
+        'crop_name': data.get('crop_name', 'the crop'),
+        'action': data.get('action', 'WAIT'),
+        'wait_days': int(data.get('wait_days') or 0),
+        'period_name': data.get('period_name', 'the current period'),
+        'risks': sorted(set(data.get('risks') or []))
+    }
+
+
+def explanation_inputs(crop_names, period_names, wait_days=WAIT_DAYS, max_risks=None):
+    """
+    Every explanation input the engine can produce for these crops and periods:
+    PLANT_NOW without risks, and WAIT (for each `wait_days`) or NOT_RECOMMENDED
+    with every set of up to `max_risks` risk types (default: all of them).
+    """
+    max_risks = len(RISK_TYPES) if max_risks is None else max_risks
+    risk_sets = [list(combo) for size in range(max_risks + 1)
+                 for combo in itertools.combinations(RISK_TYPES, size)]
+    for crop_name, period_name in itertools.product(crop_names, period_names):
+        base = {'crop_name': crop_name, 'period_name': period_name}
+        yield dict(base, action='PLANT_NOW', wait_days=0, risks=[])
+        for risks in risk_sets:
+            yield dict(base, action='NOT_RECOMMENDED', wait_days=0, risks=risks)
+            for days in wait_days:
+                yield dict(base, action='WAIT', wait_days=days, risks=risks)
+
+
+def explanation_key(data: Dict) -> str:
+    """sha256 of the canonical inputs"""
+    canonical = json.dumps(canonical_inputs(data), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ExplanationStore:
+    """
+    explanation_cache table with a thread-safe LRU in front.
+    Rows are written in their own short transaction, independent of the request's.
+    """
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    def _remember(self, key, explanation):
+        with self._lock:
+            self._entries[key] = explanation
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key) -> Optional[str]:
+        with self._lock:
+            explanation = self._entries.get(key)
+            if explanation is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return explanation
+        row = db.session.query(ExplanationCache.explanation).filter_by(key=key).first()
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.store_hits += 1
+        self._remember(key, row.explanation)
+        return row.explanation
+
+    def put(self, key, inputs: Dict, explanation: str, model: str = MODEL):
+        canonical = canonical_inputs(inputs)
+        values = dict(canonical, key=key, risks=','.join(canonical['risks']),
+                      explanation=explanation, model=model)
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(ExplanationCache.__table__.insert().values(**values))
+        except IntegrityError:
+            pass  # Another worker stored the same inputs first
+        self._remember(key, explanation)
+
+    def existing_keys(self):
+        return {key for (key,) in db.session.query(ExplanationCache.key)}
+
+    def stats(self):
+        return {
+            'size': len(self._entries),
+            'memory_hits': self.memory_hits,
+            'store_hits': self.store_hits,
+            'misses': self.misses
+        }
+
+
+def get_explanation_store() -> ExplanationStore:
+    """The app's explanation store (EXPLANATION_CACHE_SIZE entries in memory)"""
+    store = current_app.extensions.get('explanation_store')
+    if store is None:
+        store = current_app.extensions.setdefault(
+            'explanation_store', ExplanationStore(current_app.config.get('EXPLANATION_CACHE_SIZE', 2048))
+        )
+    return store
+
 
 class AIService:
     """Service for AI-powered explanation generation"""
@@ -45,28 +172,41 @@ class AIService:
             logger.info("Using template explanation (AI Disabled)")
             return self._generate_template_explanation(decision_data)
         
+        explanation = self.generate_ai_explanation(decision_data)
+        if explanation is None:
+            return self._generate_template_explanation(decision_data)
+        return explanation
+    
+    def cached_explanation(self, decision_data: Dict) -> Optional[str]:
+        """Stored AI explanation for these inputs, without calling the model"""
+        if not self.enabled or not has_app_context():
+            return None
+        return get_explanation_store().get(explanation_key(decision_data))
+    
+    def generate_ai_explanation(self, decision_data: Dict) -> Optional[str]:
+        """Stored or newly generated AI explanation; None when AI is disabled or the call fails"""
+        if not self.enabled:
+            return None
+        
+        store = get_explanation_store() if has_app_context() else None
+        key = explanation_key(decision_data)
+        if store is not None:
+            cached = store.get(key)
+            if cached is not None:
+                return cached
+        
+        explanation = self._generate_ai_explanation(decision_data)
+        if explanation is not None and store is not None:
+            store.put(key, decision_data, explanation)
+        return explanation
+    
+    def _generate_ai_explanation(self, decision_data: Dict) -> Optional[str]:
+        """Call the model; None when it fails (the caller falls back to the template)"""
         try:
             prompt = self._build_prompt(decision_data)
             
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "You are an agricultural advisor for Tunisian farmers. "
-                            "Explain planting decisions in simple, clear language. "
-                            "Use simple vocabulary (primary school level). "
-                            "Be specific about timeframes (days). "
-                            "Keep explanation to 2-3 sentences maximum. "
-                            "Be practical and encouraging."
-                        )
-                    },
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=120
-            )
+            with get_bulkhead('openai').slot():
+                response = self._complete(prompt)
             
             explanation = response.choices[0].message.content.strip()
             
@@ -77,15 +217,63 @@ class AIService:
         
         except Exception as e:
             logger.warning(f"AI Service Error: {e}. Falling back to template.")
-            return self._generate_template_explanation(decision_data)
+            return None
+    
+    def _complete(self, prompt: str):
+        """One chat completion for the explanation prompt"""
+        return self.client.chat.completions.create(
+            model=MODEL,
+            messages=[
+                {
+                    "role": "system",
+                    "content": (
+                        "You are an agricultural advisor for Tunisian farmers. "
+                        "Explain planting decisions in simple, clear language. "
+                        "Use simple vocabulary (primary school level). "
+                        "Be specific about timeframes (days). "
+                        "Keep explanation to 2-3 sentences maximum. "
+                        "Be practical and encouraging."
+                    )
+                },
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+            max_tokens=120
+        )
+    
+    def pregenerate(self, crop_names, period_names, wait_days=WAIT_DAYS, max_risks=None):
+        """
+        Generate and store explanations for every input combination the engine
+        can produce (see `explanation_inputs`; by default the whole input space).
+        Already stored combinations are skipped. Returns (generated, skipped, failed).
+        """
+        store = get_explanation_store()
+        existing = store.existing_keys()
+        
+        generated = skipped = failed = 0
+        for data in explanation_inputs(crop_names, period_names, wait_days, max_risks):
+            key = explanation_key(data)
+            if key in existing:
+                skipped += 1
+                continue
+            explanation = self._generate_ai_explanation(data)
+            if explanation is None:
+                failed += 1
+                continue
+            store.put(key, data, explanation)
+            existing.add(key)
+            generated += 1
+        logger.info(f"Pre-generated {generated} explanations ({skipped} already stored, {failed} failed)")
+        return generated, skipped, failed
     
     def _build_prompt(self, data: Dict) -> str:
         """Build prompt for AI"""
-        crop = data.get('crop_name', 'the crop')
-        action = data.get('action', 'WAIT')
-        wait_days = data.get('wait_days', 0)
-        period = data.get('period_name', 'the current period')
-        risks = data.get('risks', [])
+        canonical = canonical_inputs(data)
+        crop = canonical['crop_name']
+        action = canonical['action']
+        wait_days = canonical['wait_days']
+        period = canonical['period_name']
+        risks = canonical['risks']
         
         prompt = f"Explain this planting decision to a Tunisian farmer:\n"
         prompt += f"Crop: {crop}\n"
@@ -0,0 +1,126 @@
+"""
+Request-scoped memo of analytics results
+AnalyticsService, AdvancedAnalyticsService and RegionalAnalyticsService call
+each other's metrics several times per request (crop accuracy for the pillar
+and again for the strategy, top regional crops for both DOI and OGA, ...).
+Methods decorated with `memoized` compute each (metric, args) once per request.
+"""
+import functools
+import logging
+import threading
+from contextlib import contextmanager
+from flask import g, has_app_context
+
+logger = logging.getLogger(__name__)
+
+# Argument types that identify a metric call (self, FarmerHistory, ... are skipped)
+KEY_TYPES = (int, float, str, bool, type(None), tuple)
+
+
+class AnalyticsContext:
+    """
+    Memo of (metric, args) -> result for one request. Thread-safe, so dashboard
+    stages running on the stage pool share it. Results are shared and must be
+    treated as read-only.
+    """
+
+    # Totals over all requests of this worker (shown in /api/health/detailed)
+    totals = {'computed': 0, 'reused': 0}
+    _totals_lock = threading.Lock()
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+        self.computed = 0
+        self.reused = 0
+
+    def get_or_compute(self, key, func):
+        with self._lock:
+            if key in self._values:
+                self.reused += 1
+                return self._values[key]
+        value = func()
+        with self._lock:
+            # Two stages may have raced on the same key: keep the first result
+            value = self._values.setdefault(key, value)
+            self.computed += 1
+        return value
+
+    def stats(self):
+        return {'computed': self.computed, 'reused': self.reused}
+
+    def close(self):
+        """Fold this request's counters into the worker totals"""
+        if self.computed or self.reused:
+            logger.debug(f"Analytics memo: {self.computed} computed, {self.reused} reused")
+        with AnalyticsContext._totals_lock:
+            AnalyticsContext.totals['computed'] += self.computed
+            AnalyticsContext.totals['reused'] += self.reused
+
+    @classmethod
+    def snapshot(cls):
+        with cls._totals_lock:
+            return dict(cls.totals)
+
+
+def current_context():
+    """The active AnalyticsContext, or None outside a request / `analytics_context()` block"""
+    if not has_app_context():
+        return None
+    return g.get('analytics_context')
+
+
+def use_context(context):
+    """Attach an existing context to this thread's app context (stage pool threads)"""
+    if context is not None:
+        g.analytics_context = context
+
+
+@contextmanager
+def analytics_context():
+    """Memoise metrics for the duration of the block (reuses an active context)"""
+    context = current_context()
+    if context is not None:
+        yield context
+        return
+    context = AnalyticsContext()
+    g.analytics_context = context
+    try:
+        yield context
+    finally:
+        g.pop('analytics_context', None)
+        context.close()
+
+
+def memoized(metric):
+    """
+    Memoise a metric in the active AnalyticsContext, keyed by `metric` and the
+    call's plain arguments (ids, governorates, limits). Without an active
+    context the metric is simply computed.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            context = current_context()
+            if context is None:
+                return func(*args, **kwargs)
+            key = (metric,
+                   tuple(a for a in args if isinstance(a, KEY_TYPES)),
+                   tuple(sorted((k, v) for k, v in kwargs.items() if isinstance(v, KEY_TYPES))))
+            return context.get_or_compute(key, lambda: func(*args, **kwargs))
+        return wrapper
+    return decorator
+
+
+def init_analytics_context(app):
+    """Give every request its own AnalyticsContext"""
+
+    @app.before_request
+    def _open_analytics_context():
+        g.analytics_context = AnalyticsContext()
+
+    @app.teardown_request
+    def _close_analytics_context(exc):
+        context = g.pop('analytics_context', None)
+        if context is not None:
+            context.close()
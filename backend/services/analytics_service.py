@@ -5,17 +5,25 @@ import logging
 import numpy as np
 from datetime import datetime, timedelta
 import random       # Imported random
-from collections import defaultdict
+from collections import namedtuple
 from sqlalchemy import func, cast, Integer, case, desc, and_
 from models.base import db
 from models.decision import Decision, Outcome
 from models.user import Farmer
-from models.crop import Crop, AgrarianPeriod
+from models.crop import Crop
 from services.small_sample_analytics import SmallSampleAnalytics
 from services.regional_analytics import RegionalAnalyticsService
+from services.farmer_history import FarmerHistory, CONFIDENCE_PROBABILITIES
+from services.rollup_service import FarmerRollupService
+from services.cache_service import get_dashboard_cache
+from services.agrarian_calendar import get_agrarian_calendar
+from services.stage_executor import run_stages
+from services.analytics_context import memoized
 
 logger = logging.getLogger(__name__)
 
+FarmerProfile = namedtuple('FarmerProfile', ['id', 'governorate', 'farm_type', 'farm_size_ha'])
+
 class AnalyticsService:
     """
     Advanced Analytics Calculation Engine
@@ -25,7 +33,38 @@ class AnalyticsService:
     def __init__(self):
         self.ssa = SmallSampleAnalytics()
         self.regional = RegionalAnalyticsService()
+
+    @memoized('farmer_profile')
+    def _farmer_profile(self, farmer_id: int):
+        """Session-independent farmer fields (safe to share with stage threads)"""
+        farmer = Farmer.query.get(farmer_id)
+        if not farmer:
+            return None
+        return FarmerProfile(farmer.id, farmer.governorate, farmer.farm_type, farmer.farm_size_ha)
+
     def get_dashboard_data(self, farmer_id: int, timeframe: str = 'monthly'):
+        """
+        Dashboard results, cached until the farmer's data version or profile
+        (governorate, farm type and size) changes, and at most
+        DASHBOARD_CACHE_TTL seconds, since regional benchmarks move with other
+        farmers' outcomes. The returned dict is shared with later callers and
+        must not be mutated.
+        """
+        profile = self._farmer_profile(farmer_id)
+        if profile is None:
+            return self._build_dashboard_data(farmer_id, timeframe)
+        cache = get_dashboard_cache()
+        key = (farmer_id, timeframe, profile.governorate, profile.farm_type, profile.farm_size_ha)
+        version = FarmerRollupService.data_version(farmer_id)
+        
+        result = cache.get(key, version)
+        if result is None:
+            result = self._build_dashboard_data(farmer_id, timeframe)
+            if 'error' not in result:
+                cache.set(key, version, result)
+        return result
+
+    def _build_dashboard_data(self, farmer_id: int, timeframe: str = 'monthly'):
         """
         Refined Analytics Pipeline with Expert Logic:
         1. Multi-Tier Sufficiency Check
@@ -34,41 +73,49 @@ class AnalyticsService:
         4. Brier Score Calibration for Confidence
         """
         try:
-            farmer = Farmer.query.get(farmer_id)
+            farmer = self._farmer_profile(farmer_id)
             if not farmer: return {"error": "Farmer not found"}
             
-            # 1. Gather all raw data
-            personal_stats = self._get_personal_stats(farmer_id)
-            aes_raw = self._get_aes_raw_data(farmer_id)
-            rar_raw = self._get_rar_raw_data(farmer_id)
-            trends_raw = self.calculate_performance_trends(farmer_id, timeframe)
-            cvs_raw = self._get_cvs_raw_data(farmer_id)
-            
-            # 2. Get Regional Fallbacks (Improved hierarchy)
-            reg_sr = self.regional.get_regional_success_rate(farmer.governorate, None)
-            reg_aes = self.regional.get_regional_AES_avg(farmer.governorate, None)
-            reg_loss = self.regional.get_regional_avg_loss(farmer.governorate, None)
-            
-            # 3. Calculate metrics using unified SSA engine
-            aes_results = self.calculate_aes(farmer_id)
-            rar_results = self.calculate_rar(farmer_id)
-            cvs_results = self.ssa.calculate_cvs(cvs_raw['predictions'], cvs_raw['outcomes'])
+            # 1. Gather all raw data (single query, shared by every metric below)
+            history = FarmerHistory.load(farmer_id)
+            personal_stats = self._get_personal_stats(farmer_id, history)
+            aes_raw = self._get_aes_raw_data(farmer_id, history)
+            rar_raw = self._get_rar_raw_data(farmer_id, history)
+            trends_raw = self.calculate_performance_trends(farmer_id, timeframe, history)
+            cvs_raw = self._get_cvs_raw_data(farmer_id, history)
+            
+            # 2-4. Regional fallbacks (improved hierarchy), SSA metrics and derived
+            # insights only read `history`, so they run as concurrent stages
+            governorate = farmer.governorate
+            stages = run_stages({
+                'regional_success_rate': lambda: self.regional.get_regional_success_rate(governorate, None),
+                'regional_aes': lambda: self.regional.get_regional_AES_avg(governorate, None),
+                'regional_loss': lambda: self.regional.get_regional_avg_loss(governorate, None),
+                'aes': lambda: self.calculate_aes(farmer_id, history),
+                'rar': lambda: self.calculate_rar(farmer_id, history),
+                'cvs': lambda: self.ssa.calculate_cvs(cvs_raw['predictions'], cvs_raw['outcomes']),
+                'fci': lambda: self.calculate_fci(farmer_id, history),
+                'crop_accuracy': lambda: self.calculate_crop_accuracy(farmer_id, history),
+                'sweet_spot': lambda: self.calculate_environmental_sweet_spot(farmer_id, history),
+                'benchmarks': lambda: self.calculate_regional_benchmarks(farmer_id, history),
+            }, prefix='dashboard')
+            aes_results = stages['aes']
+            rar_results = stages['rar']
+            cvs_results = stages['cvs']
+            fci_full = stages['fci']
+            crop_acc = stages['crop_accuracy']
+            sweet_spot = stages['sweet_spot']
+            benchmarks = stages['benchmarks']
             
             drs = self.ssa.calculate_drs(
                 personal_stats['total_decisions'],
                 len(trends_raw['data']),
-                self._get_days_since_last_decision(farmer_id),
+                self._get_days_since_last_decision(farmer_id, history),
                 0.8 # Completeness
             )
             
-            # 4. Gather Derived Insights
-            fci_full = self.calculate_fci(farmer_id)
-            crop_acc = self.calculate_crop_accuracy(farmer_id)
-            sweet_spot = self.calculate_environmental_sweet_spot(farmer_id)
-            benchmarks = self.calculate_regional_benchmarks(farmer_id)
-            
             strategic_advice = self._generate_strategic_advice(
-                farmer_id, benchmarks, trends_raw, aes_results, rar_results, farmer.governorate
+                farmer_id, benchmarks, trends_raw, aes_results, rar_results, farmer.governorate, history
             )
             
             smart_summary = self._generate_smart_summary_v3(aes_results, drs, cvs_results)
@@ -129,173 +176,83 @@ class AnalyticsService:
                 "performance_trends": []
             }
 
-    def calculate_performance_trends(self, farmer_id: int, timeframe: str = 'monthly'):
+    def calculate_performance_trends(self, farmer_id: int, timeframe: str = 'monthly', history: FarmerHistory = None):
         """
         Calculate success rate trends over time with dynamic grouping
         """
+        history = history or FarmerHistory.load(farmer_id)
+        
         # Determine grouping format and window
         now = datetime.utcnow()
         if timeframe == 'daily':
-            date_format = '%Y-%m-%d'
             start_date = now - timedelta(days=30)
-            label_format = lambda d: d.strftime('%d %b') # 05 Jan
+            key_format = lambda d: d.strftime('%Y-%m-%d')
+            label_format = lambda key: datetime.strptime(key, '%Y-%m-%d').strftime('%d %b') # 05 Jan
         elif timeframe == 'weekly':
-            date_format = '%Y-%W'
             start_date = now - timedelta(weeks=12)
-            label_format = lambda d: f"W{d.strftime('%W')}" # W01
+            key_format = lambda d: d.strftime('%Y-%W')
+            label_format = lambda key: f"W{datetime.strptime(key + '-1', '%Y-%W-%w').strftime('%W')}" # W01
         elif timeframe == 'quarterly':
-            # SQLite doesn't have direct quarter function, use case/strftime mapping or simple grouping
-            date_format = 'Q' # Placeholder
             start_date = now - timedelta(days=365)
-            # Custom label logic below
+            key_format = lambda d: f"{d.year}-{(d.month + 2) // 3}"
+            label_format = lambda key: f"Q{key.split('-')[1]} {key.split('-')[0]}" # Q1 2026
         elif timeframe == 'agrarian':
-            date_format = 'P'
             start_date = now - timedelta(days=365)
             # Custom logic
         else: # monthly
-            date_format = '%Y-%m'
             start_date = now - timedelta(days=365)
-            label_format = lambda d: d.strftime('%b %Y') # Jan 2026
-            
-        # Specific query for quarterly if needed, or generic
-        if timeframe == 'quarterly':
-            # SQLite specific for Quarter: (strftime('%m', date) + 2) / 3
-            # Use DISTINCT to avoid duplicates if raw data has overlapping join results
-            results = db.session.query(
-                func.strftime('%Y', Outcome.recorded_at).label('year'),
-                ((func.cast(func.strftime('%m', Outcome.recorded_at), Integer) + 2) / 3).label('quarter'),
-                func.avg(cast(Outcome.outcome == 'success', Integer))
-            ).join(Decision).filter(
-                Decision.farmer_id == farmer_id,
-                Outcome.recorded_at >= start_date
-            ).group_by('year', 'quarter').order_by('year', 'quarter').all()
-            
+            key_format = lambda d: d.strftime('%Y-%m')
+            label_format = lambda key: datetime.strptime(key, '%Y-%m').strftime('%b %Y') # Jan 2026
+        
+        window = history.outcomes_since(start_date)
+        recorded_at = history.recorded_at[window]
+        successes = history.is_success[window]
+            
+        if timeframe == 'agrarian':
+            # Bucket outcome dates through the precompiled day-of-year table
+            # (per governorate, so regional period boundaries apply)
+            calendar = get_agrarian_calendar()
+            totals = np.zeros(len(calendar.names))
+            success_counts = np.zeros(len(calendar.names))
+            governorates = history.governorate[window]
+            for governorate in np.unique(governorates):
+                rows = governorates == governorate
+                gov_totals, gov_successes = get_agrarian_calendar(str(governorate) or None).bucket(
+                    recorded_at[rows], successes[rows])
+                totals += gov_totals
+                success_counts += gov_successes
+            
+            # Calendar order, 'Other' last
             data = []
-            seen_periods = set()
-            for r in results:
-                period_label = f"Q{int(r[1])} {r[0]}"
-                if period_label in seen_periods: continue
-                seen_periods.add(period_label)
-                
-                data.append({
-                    'period': period_label,
-                    'raw_date': f"{r[0]}-{r[1]}",
-                    'rate': round(r[2] * 100, 1)
-                })
-        elif timeframe == 'agrarian':
-            # Use Python-side bucketing for robust agrarian period mapping
-            # 1. Fetch all outcomes with dates
-            results = db.session.query(
-                Outcome.recorded_at,
-                cast(Outcome.outcome == 'success', Integer)
-            ).join(Decision).filter(
-                Decision.farmer_id == farmer_id,
-                Outcome.recorded_at >= start_date
-            ).all()
-
-            # 2. Define or Fetch Periods (Fallback included)
-            # Try to fetch from DB, fallback to hardcoded if empty
-            periods_db = AgrarianPeriod.query.all()
-            periods = []
-            if periods_db:
-                periods = [p.to_dict() for p in periods_db]
-            else:
-                # Fallback: Standard Tunisian Agrarian Calendar
-                # Note: This is an approximation of the traditional Julian-based calendar
-                periods = [
-                    {'name': 'El Llayeli El Bidh', 'start_month': 12, 'start_day': 25, 'end_month': 1, 'end_day': 13},
-                    {'name': 'El Llayeli Essoud', 'start_month': 1, 'start_day': 14, 'end_month': 2, 'end_day': 2},
-                    {'name': 'El Azara', 'start_month': 2, 'start_day': 3, 'end_month': 2, 'end_day': 13},
-                    {'name': 'Guerret El Anz', 'start_month': 2, 'start_day': 14, 'end_month': 2, 'end_day': 19},
-                    {'name': 'Nezoul Jamrat El Hawa', 'start_month': 2, 'start_day': 20, 'end_month': 2, 'end_day': 26},
-                    {'name': 'Nezoul Jamrat El Ma', 'start_month': 2, 'start_day': 27, 'end_month': 3, 'end_day': 9},
-                    {'name': 'Nezoul Jamrat El Thra', 'start_month': 3, 'start_day': 6, 'end_month': 3, 'end_day': 10}, # Overlaps slightly, using standard
-                    {'name': 'El Hassoum', 'start_month': 3, 'start_day': 10, 'end_month': 3, 'end_day': 17},
-                    {'name': 'Equinox Spring', 'start_month': 3, 'start_day': 20, 'end_month': 5, 'end_day': 29}, # Generic Spring
-                    {'name': 'El Hamsin', 'start_month': 4, 'start_day': 28, 'end_month': 6, 'end_day': 16},
-                    {'name': 'Awussu', 'start_month': 7, 'start_day': 25, 'end_month': 9, 'end_day': 2},
-                ]
-
-            # 3. Bucket Outcomes
-            period_stats = defaultdict(lambda: {'total': 0, 'success': 0, 'order': 999})
-            
-            for r in results:
-                date = r[0]
-                is_success = r[1]
-                month = date.month
-                day = date.day
-                
-                # Find matching period
-                matched_period = "Other"
-                order = 999
-                
-                for idx, p in enumerate(periods):
-                    # Check date range (handles year wrap roughly, but most are within-year or across Dec-Jan)
-                    # Simplified check:
-                    matches = False
-                    if p['start_month'] == p['end_month']:
-                        if month == p['start_month'] and p['start_day'] <= day <= p['end_day']: matches = True
-                    elif p['start_month'] < p['end_month']:
-                         if (month == p['start_month'] and day >= p['start_day']) or \
-                            (month == p['end_month'] and day <= p['end_day']) or \
-                            (p['start_month'] < month < p['end_month']): matches = True
-                    else: # Wrap around year (Dec to Jan)
-                         if (month == p['start_month'] and day >= p['start_day']) or \
-                            (month == p['end_month'] and day <= p['end_day']) or \
-                            (month > p['start_month']) or \
-                            (month < p['end_month']): matches = True
-                    
-                    if matches:
-                        matched_period = p['name']
-                        order = idx
-                        break
-                
-                period_stats[matched_period]['total'] += 1
-                period_stats[matched_period]['success'] += is_success
-                period_stats[matched_period]['order'] = min(period_stats[matched_period]['order'], order)
-
-            # 4. Format Output
-            # Sort by calendar order
-            sorted_stats = sorted(period_stats.items(), key=lambda x: x[1]['order'])
-            
-            data = []
-            for name, stats in sorted_stats:
-                if stats['total'] > 0:
-                    rate = (stats['success'] / stats['total']) * 100
+            for name, total, success_count in zip(calendar.names, totals, success_counts):
+                if total > 0:
+                    rate = (success_count / total) * 100
                     data.append({
                         'period': name,
                         'raw_date': name,
-                        'rate': round(rate, 1)
+                        'rate': round(float(rate), 1)
                     })
         else:
-            results = db.session.query(
-                func.strftime(date_format, Outcome.recorded_at).label('period'),
-                func.avg(cast(Outcome.outcome == 'success', Integer))
-            ).join(Decision).filter(
-                Decision.farmer_id == farmer_id,
-                Outcome.recorded_at >= start_date
-            ).group_by('period').order_by('period').all()
+            # Format each distinct day once, then aggregate rows per bucket key
+            days, day_index = np.unique(recorded_at.astype('datetime64[D]'), return_inverse=True)
+            day_keys = np.array([key_format(d) for d in days.astype(datetime)], dtype=str)
+            keys, key_index = np.unique(day_keys[day_index], return_inverse=True)
+            totals = np.bincount(key_index, minlength=len(keys))
+            success_counts = np.bincount(key_index, weights=successes, minlength=len(keys))
             
             data = []
-            for r in results:
+            for key, total, success_count in zip(keys, totals, success_counts):
+                key = str(key)
                 # Parse date for friendly label
                 try:
-                    if timeframe == 'daily':
-                        dt = datetime.strptime(r[0], '%Y-%m-%d')
-                        label = label_format(dt)
-                    elif timeframe == 'weekly':
-                        dt = datetime.strptime(r[0] + '-1', '%Y-%W-%w')
-                        label = label_format(dt)
-                    else:
-                        dt = datetime.strptime(r[0], '%Y-%m')
-                        label = label_format(dt)
+                    label = label_format(key)
                 except:
-                    label = r[0]
+                    label = key
                     
                 data.append({
                     'period': label, # For display
-                    'raw_date': r[0],
-                    'rate': round(r[1] * 100, 1)
+                    'raw_date': key,
+                    'rate': round(float(success_count / total) * 100, 1)
                 })
             
         # Slope Calculation
@@ -317,18 +274,13 @@ class AnalyticsService:
             
         return {'data': data, 'slope': round(slope, 2), 'interpretation': interpretation}
 
-    def _get_personal_stats(self, farmer_id):
-        decisions = Decision.query.filter_by(farmer_id=farmer_id).all()
-        total = len(decisions)
+    def _get_personal_stats(self, farmer_id, history: FarmerHistory = None):
+        history = history or FarmerHistory.load(farmer_id)
+        total = history.size
         if total == 0: return {'success_rate': 0, 'total_decisions': 0, 'outcome_count': 0}
         
-        success_count = 0
-        outcome_count = 0
-        for d in decisions:
-            o = d.outcomes.first()
-            if o:
-                outcome_count += 1
-                if o.outcome == 'success': success_count += 1
+        success_count = int(history.is_success.sum())
+        outcome_count = int(history.has_outcome.sum())
         
         # Apply Bayesian Dampening to avoid artificial 100% labels
         sr = self.ssa.calculate_dampened_sr(success_count, outcome_count) if outcome_count > 0 else 0
@@ -339,75 +291,50 @@ class AnalyticsService:
             'outcome_count': outcome_count
         }
 
-    def _get_days_since_last_decision(self, farmer_id):
-        last_decision = Decision.query.filter_by(farmer_id=farmer_id).order_by(Decision.timestamp.desc()).first()
-        if not last_decision: return 365 # Default to year if none
-        delta = datetime.utcnow() - last_decision.timestamp
+    def _get_days_since_last_decision(self, farmer_id, history: FarmerHistory = None):
+        history = history or FarmerHistory.load(farmer_id)
+        last_decision_at = history.last_decision_at()
+        if not last_decision_at: return 365 # Default to year if none
+        delta = datetime.utcnow() - last_decision_at
         return delta.days
 
-    def _get_aes_raw_data(self, farmer_id):
+    def _get_aes_raw_data(self, farmer_id, history: FarmerHistory = None):
         """Gather raw success/failure counts for followed vs ignored advice"""
-        decisions = Decision.query.filter_by(farmer_id=farmer_id).all()
-        data = {'n_followed': 0, 's_followed': 0, 'n_ignored': 0, 's_ignored': 0}
-        for d in decisions:
-            o = d.outcomes.first()
-            if not o: continue
-            is_success = 1 if o.outcome == 'success' else 0
-            if d.advice_status == 'followed':
-                data['n_followed'] += 1
-                data['s_followed'] += is_success
-            elif d.advice_status == 'ignored':
-                data['n_ignored'] += 1
-                data['s_ignored'] += is_success
-        return data
+        history = history or FarmerHistory.load(farmer_id)
+        followed = history.has_outcome & history.followed
+        ignored = history.has_outcome & history.ignored
+        return {
+            'n_followed': int(followed.sum()),
+            's_followed': int((followed & history.is_success).sum()),
+            'n_ignored': int(ignored.sum()),
+            's_ignored': int((ignored & history.is_success).sum())
+        }
 
-    def _get_rar_raw_data(self, farmer_id):
+    def _get_rar_raw_data(self, farmer_id, history: FarmerHistory = None):
         """Gather raw data for Risk Avoidance calculation"""
-        avoided = Decision.query.filter(
-            Decision.farmer_id == farmer_id,
-            Decision.advice_status == 'followed',
-            Decision.recommendation.in_(['WAIT', 'NOT_RECOMMENDED', 'AVOID'])
-        ).all()
+        history = history or FarmerHistory.load(farmer_id)
+        avoided = history.followed & history.avoidance
+        ignored = history.ignored & history.avoidance
+        ignored_failures = ignored & history.is_failure
         
-        ignored_failures = db.session.query(Outcome).join(Decision).filter(
-            Decision.farmer_id == farmer_id,
-            Decision.advice_status == 'ignored',
-            Decision.recommendation.in_(['WAIT', 'NOT_RECOMMENDED', 'AVOID']),
-            Outcome.outcome == 'failure'
-        ).all()
-        
-        ignored_count = Decision.query.filter(
-            Decision.farmer_id == farmer_id,
-            Decision.advice_status == 'ignored',
-            Decision.recommendation.in_(['WAIT', 'NOT_RECOMMENDED', 'AVOID'])
-        ).count()
-
-        loss_values = [abs(o.revenue_tnd) for o in ignored_failures if o.revenue_tnd is not None]
+        ignored_count = int(ignored.sum())
+        failure_revenue = history.revenue[ignored_failures]
+        loss_values = np.abs(failure_revenue[~np.isnan(failure_revenue)]).tolist()
         
         return {
-            'n_followed': len(avoided),
+            'n_followed': int(avoided.sum()),
             'n_ignored': ignored_count,
-            's_ignored': ignored_count - len(ignored_failures), # Succesfully ignored meant no failure?
+            's_ignored': ignored_count - int(ignored_failures.sum()), # Succesfully ignored meant no failure?
             'failure_losses_ignored': loss_values
         }
 
-    def _get_cvs_raw_data(self, farmer_id):
+    def _get_cvs_raw_data(self, farmer_id, history: FarmerHistory = None):
         """Gather confidence/outcome pairs for Brier Score"""
-        decisions = Decision.query.filter(
-            Decision.farmer_id == farmer_id,
-            Decision.advice_status == 'followed'
-        ).all()
-        
-        preds = []
-        outs = []
-        
-        conf_map = {'HIGH': 0.85, 'MEDIUM': 0.70, 'LOW': 0.50}
+        history = history or FarmerHistory.load(farmer_id)
+        mask = history.followed & history.has_outcome
         
-        for d in decisions:
-            o = d.outcomes.first()
-            if o:
-                preds.append(conf_map.get(d.confidence, 0.5))
-                outs.append(1 if o.outcome == 'success' else 0)
+        preds = [CONFIDENCE_PROBABILITIES.get(c, 0.5) for c in history.confidence[mask]]
+        outs = history.is_success[mask].astype(int).tolist()
                 
         return {'predictions': preds, 'outcomes': outs}
 
@@ -432,9 +359,9 @@ class AnalyticsService:
             
         return summary
 
-    def calculate_aes(self, farmer_id: int):
+    def calculate_aes(self, farmer_id: int, history: FarmerHistory = None):
         """Advice Effectiveness Score (Wrapper for SSA)"""
-        raw = self._get_aes_raw_data(farmer_id)
+        raw = self._get_aes_raw_data(farmer_id, history)
         reg_aes = self.regional.get_regional_AES_avg(None, None) # TODO: Use governorat from farmer
         results = self.ssa.calculate_aes(
             raw['n_followed'], raw['s_followed'],
@@ -455,10 +382,10 @@ class AnalyticsService:
         if is_provisional: interpretation += " (Provisional)"
         return interpretation
 
-    def calculate_rar(self, farmer_id: int):
+    def calculate_rar(self, farmer_id: int, history: FarmerHistory = None):
         """Risk Avoidance ROI (Wrapper for SSA)"""
-        raw = self._get_rar_raw_data(farmer_id)
-        farmer = Farmer.query.get(farmer_id)
+        raw = self._get_rar_raw_data(farmer_id, history)
+        farmer = self._farmer_profile(farmer_id)
         farm_size = getattr(farmer, 'farm_size', 1.0) or 1.0
         reg_loss = self.regional.get_regional_avg_loss(farmer.governorate, None)
         
@@ -467,35 +394,37 @@ class AnalyticsService:
             reg_loss, farm_size
         )
 
-    def calculate_crop_accuracy(self, farmer_id: int):
+    @memoized('crop_accuracy')
+    def calculate_crop_accuracy(self, farmer_id: int, history: FarmerHistory = None):
         """Crop-Specific Advice Accuracy (CSAA) with Bayesian Dampening"""
-        # Get crops with outcomes
-        results = db.session.query(
-            Crop.name,
-            func.count(Outcome.id).label('total'),
-            func.coalesce(func.sum(cast(Outcome.outcome == 'success', Integer)), 0).label('successes')
-        ).select_from(Crop).join(Decision, Decision.crop_id == Crop.id).join(Outcome, Outcome.decision_id == Decision.id).filter(
-            Decision.farmer_id == farmer_id
-        ).group_by(Crop.name).having(func.count(Outcome.id) >= 1).all()
+        history = history or FarmerHistory.load(farmer_id)
+        
+        # Group crops with outcomes
+        mask = history.has_outcome
+        names, crop_index = np.unique(history.crop_name[mask], return_inverse=True)
+        totals = np.bincount(crop_index, minlength=len(names))
+        successes = np.bincount(crop_index, weights=history.is_success[mask], minlength=len(names))
         
         chart_data = []
-        user = Farmer.query.get(farmer_id)
+        user = self._farmer_profile(farmer_id)
         governorate = user.governorate if user else "Tunis"
 
-        for r in results:
+        for name, total, success_count in zip(names, totals, successes):
+            name, total, success_count = str(name), int(total), int(success_count)
+            
             # Apply Bayesian Dampening (Laplace Smoothing)
-            sr = self.ssa.calculate_dampened_sr(r.successes, r.total)
+            sr = self.ssa.calculate_dampened_sr(success_count, total)
             
             # Regional Suitability Bonus
-            suitability_weight = self.regional.get_regional_weight(r.name, governorate)
+            suitability_weight = self.regional.get_regional_weight(name, governorate)
             
             # Reliability weight: Map 1 sample -> 10%, 10 samples -> 100%
-            reliability = min(r.total * 10, 100) 
+            reliability = min(total * 10, 100) 
             
             chart_data.append({
-                'crop': r.name,
+                'crop': name,
                 'success_rate': sr,
-                'raw_sr': round((r.successes / r.total) * 100, 1), # Keep raw for debugging/advanced views
+                'raw_sr': round((success_count / total) * 100, 1), # Keep raw for debugging/advanced views
                 'reliability': reliability,
                 'suitability_weight': suitability_weight,
                 'weighted_score': round(sr * suitability_weight, 1)
@@ -503,15 +432,12 @@ class AnalyticsService:
             
         return {'chart_data': chart_data}
 
-    def calculate_environmental_sweet_spot(self, farmer_id: int):
+    @memoized('sweet_spot')
+    def calculate_environmental_sweet_spot(self, farmer_id: int, history: FarmerHistory = None):
         """Identify optimal temperature for success"""
-        successes = db.session.query(Decision.weather_temp_avg).join(Outcome).filter(
-            Decision.farmer_id == farmer_id,
-            Outcome.outcome == 'success',
-            Decision.weather_temp_avg.isnot(None)
-        ).all()
-        
-        temps = [r[0] for r in successes]
+        history = history or FarmerHistory.load(farmer_id)
+        temps = history.weather_temp_avg[history.is_success]
+        temps = temps[~np.isnan(temps)].tolist()
         if len(temps) < 1: return None # Show even if just 1 point
         
         # Simple percentile-based sweet spot (IQR)
@@ -530,24 +456,17 @@ class AnalyticsService:
             }
         }
 
-    def calculate_fci(self, farmer_id: int):
+    def calculate_fci(self, farmer_id: int, history: FarmerHistory = None):
         """
         Farmer Compliance Index (FCI)
         Formula: (Completed Adherence / Total Valid Decisions) * 100
         Measures how often the farmer follows the system's advice.
         """
-        # Count decisions by status
-        stats = db.session.query(
-            Decision.advice_status,
-            func.count(Decision.id)
-        ).filter(
-            Decision.farmer_id == farmer_id,
-            Decision.advice_status.in_(['followed', 'ignored'])
-        ).group_by(Decision.advice_status).all()
+        history = history or FarmerHistory.load(farmer_id)
         
-        counts = {s[0]: s[1] for s in stats}
-        followed = counts.get('followed', 0)
-        ignored = counts.get('ignored', 0)
+        # Count decisions by status
+        followed = int(history.followed.sum())
+        ignored = int(history.ignored.sum())
         total = followed + ignored
         
         if total == 0:
@@ -570,41 +489,23 @@ class AnalyticsService:
             'followed_count': followed
         }
 
-    def calculate_rar(self, farmer_id: int):
+    def calculate_rar(self, farmer_id: int, history: FarmerHistory = None):
         """
         Risk Avoidance ROI (RAR)
         Formula: Sum of (Cost per Plant * Estimated Plants) for every avoided failure.
         """
-        # Decisions where user successfully avoided a risk
-        avoided_decisions = Decision.query.filter(
-            Decision.farmer_id == farmer_id,
-            Decision.advice_status == 'followed',
-            Decision.recommendation.in_(['WAIT', 'NOT_RECOMMENDED', 'AVOID'])
-        ).all()
-        
-        risk_avoidance_events = len(avoided_decisions)
+        history = history or FarmerHistory.load(farmer_id)
         
-        # Calculate dynamic saved value
-        # Assumption: Average small plot ~ 500 plants if not specified
-        PLANTS_PER_DECISION = 500
-        
-        total_saved_value = 0
-        breakdown = []
+        # Decisions where user successfully avoided a risk
+        avoided = history.followed & history.avoidance
+        risk_avoidance_events = int(avoided.sum())
         
-        for d in avoided_decisions:
-            # Use stored cost if available, else default to 2.5 TND
-            cost = d.seedling_cost_tnd if d.seedling_cost_tnd is not None else 2.5
-            qty = d.input_quantity if d.input_quantity is not None else 1.0
-            
-            # Value saved = Investment at risk
-            # If quantity is small (e.g. 1 packet), assume representative plot size? 
-            # No, explicit input is better. If they bought 1kg wheat, they saved price of 1kg wheat.
-            saved = cost * qty
-            
-            # Legacy fallback: If quantity is 1.0 (default) and cost is low, maybe apply a multiplier?
-            # For now, trust the input.
-            
-            total_saved_value += saved
+        # Value saved = Investment at risk
+        # Use stored cost if available, else default to 2.5 TND; explicit quantity else 1 unit.
+        # If they bought 1kg wheat, they saved price of 1kg wheat.
+        costs = np.nan_to_num(history.seedling_cost[avoided], nan=2.5)
+        quantities = np.nan_to_num(history.input_quantity[avoided], nan=1.0)
+        total_saved_value = float(np.sum(costs * quantities))
             
         # Interpretation
         if risk_avoidance_events > 5:
@@ -620,24 +521,25 @@ class AnalyticsService:
             'interpretation': interpretation
         }
 
-    def calculate_tls(self, farmer_id: int):
+    def calculate_tls(self, farmer_id: int, history: FarmerHistory = None):
         """
         Temporal Learning Slope (Legacy Wrapper).
         Returns monthly slope.
         """
-        return self.calculate_performance_trends(farmer_id, 'monthly')
+        return self.calculate_performance_trends(farmer_id, 'monthly', history)
 
-    def calculate_regional_benchmarks(self, farmer_id: int):
+    def calculate_regional_benchmarks(self, farmer_id: int, history: FarmerHistory = None):
         """
         Governorate Success Index (GSI) & Comparison
         """
-        farmer = Farmer.query.get(farmer_id)
+        farmer = self._farmer_profile(farmer_id)
         if not farmer: return {}
         
         gov = farmer.governorate
+        history = history or FarmerHistory.load(farmer_id)
         
         # Personal stats
-        personal_stats = self._get_personal_stats(farmer_id)
+        personal_stats = self._get_personal_stats(farmer_id, history)
         personal_sr = personal_stats['success_rate']
         
         # Regional average
@@ -656,10 +558,7 @@ class AnalyticsService:
         alpha = personal_sr - regional_sr
         
         # Get risk avoided count
-        risk_avoided = Decision.query.filter_by(
-            farmer_id=farmer_id,
-            recommendation='WAIT'
-        ).count()
+        risk_avoided = int((history.recommendation == 'WAIT').sum())
         
         # Interpretation
         if alpha > 10: interpretation = "Significantly outperforming regional peers."
@@ -676,18 +575,20 @@ class AnalyticsService:
             'total_decisions': personal_stats['total_decisions'],
             'success_rate': personal_sr,
             'risks_avoided': risk_avoided,
-            'top_regional_crops': self.analyze_opportunities(farmer_id)
+            'top_regional_crops': self.analyze_opportunities(farmer_id, history)
         }
 
-    def analyze_opportunities(self, farmer_id: int):
+    @memoized('opportunities')
+    def analyze_opportunities(self, farmer_id: int, history: FarmerHistory = None):
         """
         Identify top crops in region (by Weighted Score) that user isn't growing
         """
-        user = Farmer.query.get(farmer_id)
+        user = self._farmer_profile(farmer_id)
         if not user: return []
+        history = history or FarmerHistory.load(farmer_id)
         
         # User's crops
-        user_crop_ids = [r[0] for r in db.session.query(Decision.crop_id).filter_by(farmer_id=farmer_id).distinct().all()]
+        user_crop_ids = np.unique(history.crop_id).tolist()
         
         # Top regional crops (Larger sample to allow suitability sorting)
         top_crops_raw = db.session.query(
@@ -726,23 +627,21 @@ class AnalyticsService:
         results.sort(key=lambda x: x['rcps'], reverse=True)
         return results[:3]
 
-    def _calculate_diversification(self, farmer_id: int):
+    def _calculate_diversification(self, farmer_id: int, history: FarmerHistory = None):
         """
         Market Diversification Opportunity Index (DOI)
         Formula: 1 - Simpson's Index (Sum of squared crop shares)
         0 = Monoculture (High Risk), 1 = Infinite Diversity
         """
-        # Count decisions per crop
-        crop_counts = db.session.query(
-            Decision.crop_id, 
-            func.count(Decision.id)
-        ).filter_by(farmer_id=farmer_id).group_by(Decision.crop_id).all()
+        history = history or FarmerHistory.load(farmer_id)
         
-        total = sum(count for _, count in crop_counts)
+        # Count decisions per crop
+        total = history.size
         if total == 0: return 0.0
+        _, crop_counts = np.unique(history.crop_id, return_counts=True)
         
         # Sum of squared shares
-        sum_sq = sum((count/total)**2 for _, count in crop_counts)
+        sum_sq = float(np.sum((crop_counts / total) ** 2))
         
         doi = 1.0 - sum_sq
         return round(doi, 2)
@@ -797,13 +696,15 @@ class AnalyticsService:
         # Ultimate fallback for brand new users
         return "Welcome to your Intelligence Center! Start by getting planting advice and recording your decisions to unlock powerful analytics and insights tailored to your farm."
 
-    def _generate_strategic_advice(self, farmer_id, benchmarks, trends, aes, rar, governorate):
+    def _generate_strategic_advice(self, farmer_id, benchmarks, trends, aes, rar, governorate, history: FarmerHistory = None):
         """
         Generate detailed, actionable strategic advice using Expert Logic Rule Base.
         Returns advice structured in three key pillars: Financial, Production, Growth.
         """
+        history = history or FarmerHistory.load(farmer_id)
+        
         # --- NEW USER / NO DATA CASE ---
-        personal_stats = self._get_personal_stats(farmer_id)
+        personal_stats = self._get_personal_stats(farmer_id, history)
         if personal_stats['total_decisions'] == 0:
             return self._generate_new_user_advice(governorate)
 
@@ -815,8 +716,8 @@ class AnalyticsService:
         
         # 2. Generate Pillar Strategies
         advice['financial'] = self._generate_financial_strategy(rar, personal_stats)
-        advice['production'] = self._generate_production_strategy(farmer_id, personal_stats, benchmarks, governorate)
-        advice['strategy'] = self._generate_growth_strategy(aes, trends, personal_stats, farmer_id)
+        advice['production'] = self._generate_production_strategy(farmer_id, personal_stats, benchmarks, governorate, history)
+        advice['strategy'] = self._generate_growth_strategy(aes, trends, personal_stats, farmer_id, history)
         
         return advice
 
@@ -900,14 +801,14 @@ class AnalyticsService:
         
         return items
 
-    def _generate_production_strategy(self, farmer_id, stats, benchmarks, governorate):
+    def _generate_production_strategy(self, farmer_id, stats, benchmarks, governorate, history: FarmerHistory = None):
         """
         Logic: Weighted Crop Performance (SR * Suitability) vs Regional Benchmarks
         """
         items = []
         
         # Get Crop Performance
-        acc_result = self.calculate_crop_accuracy(farmer_id)
+        acc_result = self.calculate_crop_accuracy(farmer_id, history)
         chart_data = acc_result.get('chart_data', [])
         
         if not chart_data:
@@ -980,7 +881,7 @@ class AnalyticsService:
             
         return items
 
-    def _generate_growth_strategy(self, aes, trends, stats, farmer_id):
+    def _generate_growth_strategy(self, aes, trends, stats, farmer_id, history: FarmerHistory = None):
         """
         Logic: Uplift vs Trends vs Sweet Spot
         """
@@ -988,7 +889,7 @@ class AnalyticsService:
         
         uplift = aes.get('value', 0)
         slope = trends.get('slope', 0)
-        sweet_spot = self.calculate_environmental_sweet_spot(farmer_id)
+        sweet_spot = self.calculate_environmental_sweet_spot(farmer_id, history)
         
         # --- PROFILE ---
         if uplift > 40:
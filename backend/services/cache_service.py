@@ -1,9 +1,366 @@
 """
-Cache service - Disabled for basic functionality
+Cache service - In-process and cross-worker caches for expensive computations
+and API responses
 """
+import json
 import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from pathlib import Path
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 
 logger = logging.getLogger(__name__)
 
-# CacheService disabled - not needed for core functionality
-# Flask-Caching dependency removed to simplify deployment
\ No newline at end of file
+
+class VersionedCache:
+    """
+    Thread-safe LRU cache whose entries are tagged with a data version.
+
+    An entry is only returned when the caller's current version matches the
+    version it was stored under, so a bumped version invalidates it exactly.
+    With `ttl`, entries also expire that many seconds after they were stored
+    (for inputs that have no version). Cached values are shared between
+    callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries=512, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, version):
+        """Return the cached value for (key, version), or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version or (
+                    self.ttl is not None and time.time() - entry[2] >= self.ttl):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, version, value):
+        """Store a value, replacing any older version of the same key"""
+        with self._lock:
+            self._entries[key] = (version, value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups * 100, 1) if lookups else 0.0
+            }
+
+
+def get_dashboard_cache():
+    """Per-application cache of advanced-analytics dashboard results"""
+    cache = current_app.extensions.get('dashboard_cache')
+    if cache is None:
+        cache = current_app.extensions.setdefault('dashboard_cache', VersionedCache(
+            current_app.config.get('DASHBOARD_CACHE_SIZE', 512),
+            ttl=current_app.config.get('DASHBOARD_CACHE_TTL', 300)
+        ))
+    return cache
+
+
+class SharedStore:
+    """
+    Small key/value store in a local SQLite file, shared by every worker process.
+
+    Values are JSON. Each entry remembers when it was stored so callers can
+    apply their own freshness rules. Leases let one process claim a key for
+    refreshing while the others keep serving what is stored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS leases ('
+                'key TEXT PRIMARY KEY, holder TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+
+    def _connect(self):
+        # One short-lived connection per call keeps the store safe across threads and forks
+        return sqlite3.connect(self.path, timeout=5, isolation_level=None)
+
+    def get(self, key):
+        """Return (value, stored_at) or None"""
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT value, stored_at FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO entries (key, value, stored_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value), time.time())
+            )
+
+    def set_many(self, items):
+        """Store several {key: value} entries in one transaction"""
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany(
+                'INSERT OR REPLACE INTO entries (key, value, stored_at) VALUES (?, ?, ?)',
+                [(key, json.dumps(value), now) for key, value in items.items()]
+            )
+            conn.execute('COMMIT')
+
+    def get_many(self, keys):
+        """Return {key: (value, stored_at)} for the keys that exist"""
+        if not keys:
+            return {}
+        placeholders = ','.join('?' * len(keys))
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f'SELECT key, value, stored_at FROM entries WHERE key IN ({placeholders})', list(keys)
+            ).fetchall()
+        return {row[0]: (json.loads(row[1]), row[2]) for row in rows}
+
+    def delete(self, key):
+        with closing(self._connect()) as conn:
+            conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def incr(self, key):
+        """Atomically add 1 to an integer entry (created at 1) and return the new value"""
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+            value = (json.loads(row[0]) if row else 0) + 1
+            conn.execute(
+                'INSERT OR REPLACE INTO entries (key, value, stored_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value), time.time())
+            )
+            conn.execute('COMMIT')
+            return value
+
+    def purge(self, prefix, older_than):
+        """Delete entries under `prefix` stored before the `older_than` timestamp"""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                'DELETE FROM entries WHERE key LIKE ? AND stored_at < ?', (prefix + '%', older_than)
+            )
+            return cursor.rowcount
+
+    def acquire_lease(self, key, holder, duration):
+        """Claim `key` for `duration` seconds unless another holder has a live lease"""
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT holder, expires_at FROM leases WHERE key = ?', (key,)).fetchone()
+            if row is not None and row[1] > now and row[0] != holder:
+                conn.execute('ROLLBACK')
+                return False
+            conn.execute(
+                'INSERT OR REPLACE INTO leases (key, holder, expires_at) VALUES (?, ?, ?)',
+                (key, holder, now + duration)
+            )
+            conn.execute('COMMIT')
+            return True
+
+    def release_lease(self, key, holder):
+        with closing(self._connect()) as conn:
+            conn.execute('DELETE FROM leases WHERE key = ? AND holder = ?', (key, holder))
+
+
+_shared_stores = {}
+_shared_stores_lock = threading.Lock()
+
+
+def get_shared_store(path):
+    """One SharedStore per file path in this process"""
+    with _shared_stores_lock:
+        store = _shared_stores.get(path)
+        if store is None:
+            store = _shared_stores[path] = SharedStore(path)
+        return store
+
+
+class TieredCache:
+    """
+    Response cache with a per-process LRU tier in front of a SharedStore tier
+    that every worker sees (the shared tier is skipped when `store` is None).
+
+    Entries remember the versions of their tags (e.g. 'crops', 'farmer:42')
+    at the time the value was computed. `invalidate(tag)` bumps the tag's
+    version in the shared tier, so every entry carrying it becomes a miss in
+    all processes. Values must be JSON-serialisable and treated as read-only.
+    """
+
+    ENTRY_PREFIX = 'response:'
+    TAG_PREFIX = 'tag:'
+
+    def __init__(self, max_entries=1024, store=None):
+        self.max_entries = max_entries
+        self.store = store
+        self._entries = OrderedDict()
+        self._tag_versions = {}  # only used without a shared tier
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def tag_versions(self, tags):
+        """Current version of each tag (0 if never invalidated)"""
+        if not tags:
+            return {}
+        if self.store is None:
+            with self._lock:
+                return {tag: self._tag_versions.get(tag, 0) for tag in tags}
+        stored = self.store.get_many([self.TAG_PREFIX + tag for tag in tags])
+        return {tag: stored.get(self.TAG_PREFIX + tag, (0, None))[0] for tag in tags}
+
+    def get(self, key):
+        """Return the cached value, or None if missing, expired or invalidated"""
+        with self._lock:
+            entry = self._entries.get(key)
+        from_memory = entry is not None
+        if entry is None and self.store is not None:
+            stored = self.store.get(self.ENTRY_PREFIX + key)
+            entry = stored[0] if stored else None
+
+        if entry is None or entry['expires_at'] <= time.time() or \
+                self.tag_versions(list(entry['tags'])) != entry['tags']:
+            with self._lock:
+                self.misses += 1
+                if from_memory:
+                    self._entries.pop(key, None)
+            return None
+
+        with self._lock:
+            if from_memory:
+                self.memory_hits += 1
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+            else:
+                self.shared_hits += 1
+                self._remember(key, entry)
+        return entry['value']
+
+    def set(self, key, value, timeout, tag_versions=None):
+        """
+        Store a value for `timeout` seconds. Pass the `tag_versions()` read
+        before computing the value, so an invalidation that races the
+        computation is not lost.
+        """
+        entry = {'value': value, 'expires_at': time.time() + timeout, 'tags': tag_versions or {}}
+        with self._lock:
+            self._remember(key, entry)
+        if self.store is not None:
+            self.store.set(self.ENTRY_PREFIX + key, entry)
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, *tags):
+        """Drop every entry stored under any of the tags, in all workers"""
+        for tag in tags:
+            if self.store is not None:
+                self.store.incr(self.TAG_PREFIX + tag)
+            else:
+                with self._lock:
+                    self._tag_versions[tag] = self._tag_versions.get(tag, 0) + 1
+        with self._lock:
+            self.invalidations += len(tags)
+
+    def purge_expired(self, max_timeout):
+        """Remove shared entries older than the longest timeout in use"""
+        if self.store is None:
+            return 0
+        return self.store.purge(self.ENTRY_PREFIX, time.time() - max_timeout)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            hits = self.memory_hits + self.shared_hits
+            lookups = hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'shared_tier': self.store is not None,
+                'memory_hits': self.memory_hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': round(hits / lookups * 100, 1) if lookups else 0.0
+            }
+
+
+def get_response_cache():
+    """Per-application TieredCache for API responses (shared tier at RESPONSE_CACHE_PATH)"""
+    cache = current_app.extensions.get('response_cache')
+    if cache is None:
+        path = current_app.config.get('RESPONSE_CACHE_PATH')
+        cache = current_app.extensions.setdefault('response_cache', TieredCache(
+            current_app.config.get('RESPONSE_CACHE_SIZE', 1024),
+            get_shared_store(path) if path else None
+        ))
+    return cache
+
+
+def invalidate_on_commit(*tags, session=None):
+    """Invalidate response-cache tags once the current transaction commits"""
+    if session is None:
+        from models.base import db
+        session = db.session
+    session.info.setdefault('cache_tags', set()).update(tags)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_tags(session):
+    tags = session.info.pop('cache_tags', None)
+    if tags and has_app_context():
+        try:
+            get_response_cache().invalidate(*sorted(tags))
+        except Exception as e:
+            logger.error(f"Response cache invalidation failed for {sorted(tags)}: {e}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back_tags(session):
+    session.info.pop('cache_tags', None)
@@ -2,16 +2,25 @@
 Core decision engine - combines agrarian calendar, weather, and AI
 """
 import logging
+import numpy as np
 from datetime import datetime, date
 from typing import Dict, List, Tuple
 from models.base import db
-from models.crop import Crop, AgrarianPeriod, CropPeriodRule
 from models.decision import Decision
-from services.weather_service import WeatherService
+from services.weather_service import WeatherService, warm_forecast
 from services.ai_service import AIService
+from services.rollup_service import FarmerRollupService
+from services.reference_catalog import get_reference_catalog, CropRef, PeriodRef
+from services.decision_writer import get_decision_writer, decision_values
+from services.explanation_worker import get_explanation_worker, PENDING, READY, FAILED
+from services.advice_budget import AdviceBudget, StageDeadlineExceeded
 
 logger = logging.getLogger(__name__)
 
+# Batch results are ranked by action first, then confidence
+ACTION_RANK = {'PLANT_NOW': 0, 'WAIT': 1, 'NOT_RECOMMENDED': 2}
+CONFIDENCE_RANK = {'HIGH': 0, 'MEDIUM': 1, 'LOW': 2}
+
 
 class DecisionEngine:
     """Core decision-making engine"""
@@ -35,37 +44,39 @@ class DecisionEngine:
             input_quantity: Quantity of inputs bought (optional, default 1.0)
         
         Returns:
-            Complete advice dictionary
+            Complete advice dictionary (with the stage timings and any degraded
+            stages of the ADVICE_BUDGET_MS latency budget under 'budget')
         """
+        budget = AdviceBudget.from_config()
+        
+        # Reference data (crops, periods, rules) comes from the in-memory catalog
+        catalog = get_reference_catalog()
+        crop = catalog.crop(crop_id)
+        
         # Step 1: Determine current agrarian period
-        current_period = self._get_current_period()
+        with budget.stage('period'):
+            current_period = self._get_current_period(catalog, governorate)
         logger.info(f"Current period: {current_period.id} - {current_period.name}")
         
         # Step 2: Get crop-specific rules for this period
-        rule = CropPeriodRule.query.filter_by(
-            crop_id=crop_id,
-            period_id=current_period.id
-        ).first()
+        with budget.stage('rules'):
+            rule = catalog.rule(crop_id, current_period.id)
         
         if not rule:
             logger.warning(f"No rule found for crop {crop_id} in period {current_period.id}")
-            # Create default risky rule
-            rule = type('obj', (object,), {
-                'suitability': 'risky',
-                'reason': 'No specific guidance for this period'
-            })()
+            rule = self._default_rule()
         
         # Step 3: Get weather forecast
-        weather_forecast = self.weather_service.get_forecast(governorate, days=7)
+        with budget.stage('weather'):
+            weather_forecast = self._forecast_within(budget, governorate)
         
         # Step 4: Analyze weather against crop requirements
-        weather_analysis = self._analyze_weather(weather_forecast, crop_id)
-        
         # Step 5: Make decision based on rules + weather
-        decision = self._make_decision(rule, weather_analysis)
+        with budget.stage('decision'):
+            weather_analysis = self._analyze_weather_batch(weather_forecast, [crop])[0]
+            decision = self._make_decision(rule, weather_analysis)
         
         # Step 6: Generate AI explanation
-        crop = Crop.query.get(crop_id)
         ai_input = {
             'crop_name': crop.name,
             'action': decision['action'],
@@ -73,7 +84,8 @@ class DecisionEngine:
             'period_name': current_period.name,
             'risks': [r['type'] for r in weather_analysis['risks']]
         }
-        explanation = self.ai_service.generate_explanation(ai_input)
+        with budget.stage('ai'):
+            explanation, explanation_status = self._explain(ai_input, budget)
         
         # Step 7: Build response
         response = {
@@ -82,6 +94,7 @@ class DecisionEngine:
                 'id': current_period.id,
                 'name': current_period.name,
                 'risk': current_period.risk_level,
+                'risk_multiplier': catalog.calendar_for(governorate).risk_multiplier_on(date.today()),
                 'description': current_period.description
             },
             'weather_forecast': weather_forecast,
@@ -90,43 +103,180 @@ class DecisionEngine:
         }
         
         # Step 8: Record decision in database
-        decision_id = self._record_decision(
-            farmer_id, crop_id, governorate,
-            decision, explanation, current_period.id,
-            weather_analysis, seedling_cost, market_price, input_quantity
-        )
+        with budget.stage('record'):
+            decision_id = self._record_decision(
+                farmer_id, crop_id, governorate,
+                decision, explanation, current_period.id,
+                weather_analysis, seedling_cost, market_price, input_quantity,
+                explanation_status=explanation_status
+            )
         
         response['id'] = decision_id
+        response['explanation_status'] = self._defer_explanation(decision_id, farmer_id, ai_input, explanation_status)
+        response['degraded'] = bool(budget.degraded)
+        response['budget'] = budget.report()
         return response
     
-    def _get_current_period(self) -> AgrarianPeriod:
-        """Determine current agrarian period based on date"""
-        today = date.today()
-        periods = AgrarianPeriod.query.order_by(
-            AgrarianPeriod.start_month,
-            AgrarianPeriod.start_day
-        ).all()
-        
-        for period in periods:
-            # Handle period that crosses year boundary
-            if period.start_month > period.end_month:
-                # Period spans New Year (e.g., Dec-Jan)
-                if today.month >= period.start_month or today.month <= period.end_month:
-                    start_date = date(today.year if today.month >= period.start_month else today.year - 1,
-                                    period.start_month, period.start_day)
-                    end_date = date(today.year if today.month <= period.end_month else today.year + 1,
-                                  period.end_month, period.end_day)
-                    if start_date <= today or today <= end_date:
-                        return period
+    def get_batch_advice(self, farmer_id: int, crop_ids: List[int], governorate: str,
+                         seedling_cost: float = None, market_price: float = None,
+                         input_quantity: float = 1.0) -> Dict:
+        """
+        Compare planting advice for several crops at once
+        
+        The period, forecast, crops and rules are each resolved once, the
+        weather is analysed for all crops in one vectorized pass, and all
+        decisions are recorded in a single commit. Only the best-ranked crop
+        gets an AI explanation; the alternatives use templates.
+        
+        Args:
+            farmer_id: ID of the farmer
+            crop_ids: IDs of the crops to compare (must exist)
+            governorate: Tunisian governorate
+            seedling_cost, market_price, input_quantity: As in get_advice
+        
+        Returns:
+            Dictionary with the shared period/forecast and ranked per-crop results
+        """
+        crop_ids = list(dict.fromkeys(crop_ids))  # De-duplicate, keep order
+        budget = AdviceBudget.from_config()
+        
+        catalog = get_reference_catalog()
+        current_period = self._get_current_period(catalog, governorate)
+        crops = [catalog.crop(cid) for cid in crop_ids]
+        rules = catalog.rules_for_period(current_period.id, crop_ids)
+        
+        with budget.stage('weather'):
+            weather_forecast = self._forecast_within(budget, governorate)
+        analyses = self._analyze_weather_batch(weather_forecast, crops)
+        
+        results = []
+        for crop, analysis in zip(crops, analyses):
+            rule = rules.get(crop.id) or self._default_rule()
+            results.append({
+                'crop': {'id': crop.id, 'name': crop.name},
+                'decision': self._make_decision(rule, analysis),
+                'weather_analysis': analysis
+            })
+        
+        results.sort(key=lambda r: (
+            ACTION_RANK.get(r['decision']['action'], len(ACTION_RANK)),
+            CONFIDENCE_RANK.get(r['decision']['confidence'], len(CONFIDENCE_RANK)),
+            r['decision'].get('wait_days', 0),
+            r['weather_analysis']['risk_count']
+        ))
+        
+        for rank, result in enumerate(results, start=1):
+            result['rank'] = rank
+            ai_input = {
+                'crop_name': result['crop']['name'],
+                'action': result['decision']['action'],
+                'wait_days': result['decision'].get('wait_days', 0),
+                'period_name': current_period.name,
+                'risks': [r['type'] for r in result['weather_analysis']['risks']]
+            }
+            if rank == 1:
+                with budget.stage('ai'):
+                    result['explanation'], result['explanation_status'] = self._explain(ai_input, budget)
+                top_input = ai_input
             else:
-                # Normal period within same year
-                start_date = date(today.year, period.start_month, period.start_day)
-                end_date = date(today.year, period.end_month, period.end_day)
-                if start_date <= today <= end_date:
-                    return period
-        
-        # Fallback to first period
-        return periods[0] if periods else None
+                result['explanation'] = self.ai_service._generate_template_explanation(ai_input)
+                result['explanation_status'] = None
+        
+        decision_ids = self._record_decisions(
+            farmer_id, governorate, current_period.id, results,
+            seedling_cost, market_price, input_quantity
+        )
+        for result, decision_id in zip(results, decision_ids):
+            result['id'] = decision_id
+        if results:
+            results[0]['explanation_status'] = self._defer_explanation(
+                results[0]['id'], farmer_id, top_input, results[0]['explanation_status']
+            )
+        
+        return {
+            'period': {
+                'id': current_period.id,
+                'name': current_period.name,
+                'risk': current_period.risk_level,
+                'risk_multiplier': catalog.calendar_for(governorate).risk_multiplier_on(date.today()),
+                'description': current_period.description
+            },
+            'weather_forecast': weather_forecast,
+            'results': results,
+            'degraded': bool(budget.degraded),
+            'budget': budget.report()
+        }
+    
+    def _forecast_within(self, budget: AdviceBudget, governorate: str) -> List[Dict]:
+        """
+        7-day forecast, or the last good one (else mock data) if it would overrun
+        the budget. A warm cache entry is read here; only a fetch uses the pool.
+        """
+        forecast = warm_forecast(governorate, days=7)
+        if forecast is not None:
+            return forecast
+        try:
+            return budget.run('weather', lambda: self.weather_service.get_forecast(governorate, days=7))
+        except StageDeadlineExceeded as e:
+            forecast = self.weather_service.cached_forecast(governorate, days=7)
+            if forecast is not None:
+                budget.degrade('weather', str(e), 'cached_forecast')
+                return forecast
+            budget.degrade('weather', str(e), 'mock_forecast')
+            return self.weather_service._generate_mock_forecast(7)
+    
+    def _explain(self, ai_input: Dict, budget: AdviceBudget = None) -> Tuple[str, str]:
+        """
+        Explanation for a decision and its explanation_status.
+        
+        Inline mode (the default) waits for the AI, within the budget's AI
+        deadline, and has no status. With ASYNC_EXPLANATIONS a stored AI
+        explanation is used when there is one ('ready'); otherwise the
+        template is returned now and the AI explanation is generated after the
+        decision is recorded ('pending').
+        """
+        if not self.ai_service.enabled or (budget is None and get_explanation_worker() is None):
+            return self.ai_service.generate_explanation(ai_input), None
+        if get_explanation_worker() is not None:
+            cached = self.ai_service.cached_explanation(ai_input)
+            if cached is not None:
+                return cached, READY
+            return self.ai_service._generate_template_explanation(ai_input), PENDING
+        try:
+            return budget.run('ai', lambda: self.ai_service.generate_explanation(ai_input)), None
+        except StageDeadlineExceeded as e:
+            # The call finishes in the background and fills the explanation store
+            budget.degrade('ai', str(e), 'template_explanation')
+            return self.ai_service._generate_template_explanation(ai_input), None
+    
+    def _defer_explanation(self, decision_id, farmer_id: int, ai_input: Dict, explanation_status):
+        """Hand a pending explanation to the background worker; returns the status to report"""
+        if explanation_status != PENDING:
+            return explanation_status
+        if decision_id is None:
+            return FAILED  # Not recorded, so there is nothing to update later
+        get_explanation_worker().submit(decision_id, farmer_id, ai_input, self.ai_service)
+        return PENDING
+    
+    @staticmethod
+    def _default_rule():
+        """Rule used when a crop has no guidance for the current period"""
+        return type('obj', (object,), {
+            'suitability': 'risky',
+            'reason': 'No specific guidance for this period'
+        })()
+    
+    def _get_current_period(self, catalog=None, governorate: str = None) -> PeriodRef:
+        """Determine current agrarian period from the compiled (regional) calendar"""
+        catalog = catalog or get_reference_catalog()
+        if not catalog.periods:
+            return None
+        
+        index = catalog.calendar_for(governorate).period_index_on(date.today())
+        if index >= len(catalog.periods):
+            # Day not covered by any period: fall back to the first period
+            return catalog.periods_by_start[0]
+        return catalog.periods[index]
     
     def _analyze_weather(self, forecast: List[Dict], crop_id: int) -> Dict:
         """
@@ -139,67 +289,97 @@ class DecisionEngine:
         Returns:
             Dictionary with risks and metrics
         """
-        crop = Crop.query.get(crop_id)
-        risks = []
-        
-        for day in forecast:
-            # Check temperature risks
-            if day['temp_min'] < crop.min_temp:
-                severity = 'high' if day['temp_min'] < crop.min_temp - 3 else 'medium'
-                risks.append({
-                    'type': 'low_temperature',
-                    'severity': severity,
-                    'date': day['date'],
-                    'value': day['temp_min']
-                })
-            
-            if day['temp_max'] > crop.max_temp:
-                severity = 'high' if day['temp_max'] > crop.max_temp + 5 else 'medium'
-                risks.append({
-                    'type': 'high_temperature',
-                    'severity': severity,
-                    'date': day['date'],
-                    'value': day['temp_max']
-                })
-            
-            # Check frost risk (critical for all crops)
-            if day['temp_min'] < 2:
-                risks.append({
-                    'type': 'frost_risk',
-                    'severity': 'high',
-                    'date': day['date'],
-                    'value': day['temp_min']
-                })
-            
-            # Check heavy rain risk
-            if day['rainfall'] > 20:
-                risks.append({
-                    'type': 'heavy_rain',
-                    'severity': 'medium',
-                    'date': day['date'],
-                    'value': day['rainfall']
-                })
+        crop = get_reference_catalog().crop(crop_id)
+        return self._analyze_weather_batch(forecast, [crop])[0]
+    
+    def _analyze_weather_batch(self, forecast: List[Dict], crops: List[CropRef]) -> List[Dict]:
+        """
+        Analyze one forecast against several crops in a single array pass
+        
+        Args:
+            forecast: List of weather forecast days
+            crops: Crop records (catalog entries or models)
+        
+        Returns:
+            One analysis dictionary per crop, in the same order
+        """
+        temp_min = np.array([d['temp_min'] for d in forecast], dtype=float)
+        temp_max = np.array([d['temp_max'] for d in forecast], dtype=float)
+        rainfall = np.array([d['rainfall'] for d in forecast], dtype=float)
+        crop_min = np.array([c.min_temp for c in crops], dtype=float)[:, None]
+        crop_max = np.array([c.max_temp for c in crops], dtype=float)[:, None]
+        
+        # crops x days
+        low = temp_min < crop_min
+        low_high = temp_min < crop_min - 3
+        high = temp_max > crop_max
+        high_high = temp_max > crop_max + 5
+        # days only: critical for all crops
+        frost = temp_min < 2
+        heavy_rain = rainfall > 20
+        any_risk = low | high | frost | heavy_rain
         
+        # Forecast-wide metrics are the same for every crop
         avg_temp = sum(d['temp_avg'] for d in forecast) / len(forecast) if forecast else 0
         avg_humidity = sum(d.get('humidity', 60) for d in forecast) / len(forecast) if forecast else 60
         total_rainfall = sum(d.get('rainfall', 0) for d in forecast) if forecast else 0
+        temp_min_forecast = min([d['temp_min'] for d in forecast]) if forecast else None
+        temp_max_forecast = max([d['temp_max'] for d in forecast]) if forecast else None
         
-        return {
-            'risks': risks,
-            'avg_temp': round(avg_temp, 1),
-            'avg_humidity': round(avg_humidity, 1),
-            'total_rainfall': round(total_rainfall, 1),
-            'temp_min_forecast': min([d['temp_min'] for d in forecast]) if forecast else None,
-            'temp_max_forecast': max([d['temp_max'] for d in forecast]) if forecast else None,
-            'risk_count': len(risks)
-        }
+        analyses = []
+        for c in range(len(crops)):
+            risks = []
+            for i in np.flatnonzero(any_risk[c]):
+                day = forecast[i]
+                # Check temperature risks
+                if low[c, i]:
+                    risks.append({
+                        'type': 'low_temperature',
+                        'severity': 'high' if low_high[c, i] else 'medium',
+                        'date': day['date'],
+                        'value': day['temp_min']
+                    })
+                if high[c, i]:
+                    risks.append({
+                        'type': 'high_temperature',
+                        'severity': 'high' if high_high[c, i] else 'medium',
+                        'date': day['date'],
+                        'value': day['temp_max']
+                    })
+                # Check frost risk (critical for all crops)
+                if frost[i]:
+                    risks.append({
+                        'type': 'frost_risk',
+                        'severity': 'high',
+                        'date': day['date'],
+                        'value': day['temp_min']
+                    })
+                # Check heavy rain risk
+                if heavy_rain[i]:
+                    risks.append({
+                        'type': 'heavy_rain',
+                        'severity': 'medium',
+                        'date': day['date'],
+                        'value': day['rainfall']
+                    })
+            
+            analyses.append({
+                'risks': risks,
+                'avg_temp': round(avg_temp, 1),
+                'avg_humidity': round(avg_humidity, 1),
+                'total_rainfall': round(total_rainfall, 1),
+                'temp_min_forecast': temp_min_forecast,
+                'temp_max_forecast': temp_max_forecast,
+                'risk_count': len(risks)
+            })
+        return analyses
     
     def _make_decision(self, rule, weather_analysis: Dict) -> Dict:
         """
         Make final decision based on rules and weather
         
         Args:
-            rule: CropPeriodRule object
+            rule: Crop-period rule (catalog RuleRef or CropPeriodRule)
             weather_analysis: Weather analysis dictionary
         
         Returns:
@@ -256,36 +436,100 @@ class DecisionEngine:
             'wait_days': 0
         }
     
+    def _build_decision(self, farmer_id: int, crop_id: int, governorate: str,
+                        decision: Dict, explanation: str, period_id: str,
+                        weather_data: Dict, seedling_cost: float = None,
+                        market_price: float = None, input_quantity: float = 1.0,
+                        explanation_status: str = None) -> Decision:
+        """Create an unsaved Decision row"""
+        return Decision(
+            farmer_id=farmer_id,
+            crop_id=crop_id,
+            governorate=governorate,
+            recommendation=decision['action'],
+            wait_days=decision.get('wait_days', 0),
+            confidence=decision['confidence'],
+            explanation=explanation,
+            explanation_status=explanation_status,
+            period_id=period_id,
+            weather_temp_avg=weather_data.get('avg_temp'),
+            weather_temp_min=weather_data.get('temp_min_forecast'),
+            weather_temp_max=weather_data.get('temp_max_forecast'),
+            weather_humidity=weather_data.get('avg_humidity'),
+            weather_rainfall=weather_data.get('total_rainfall'),
+            weather_risks=str([r['type'] for r in weather_data.get('risks', [])]),
+            seedling_cost_tnd=seedling_cost,
+            market_price_tnd=market_price,
+            input_quantity=input_quantity
+        )
+    
     def _record_decision(self, farmer_id: int, crop_id: int, governorate: str,
                         decision: Dict, explanation: str, period_id: str,
                         weather_data: Dict, seedling_cost: float = None, 
-                        market_price: float = None, input_quantity: float = 1.0):
+                        market_price: float = None, input_quantity: float = 1.0,
+                        explanation_status: str = None):
         """Record decision in database for analytics"""
         try:
-            new_decision = Decision(
-                farmer_id=farmer_id,
-                crop_id=crop_id,
-                governorate=governorate,
-                recommendation=decision['action'],
-                wait_days=decision.get('wait_days', 0),
-                confidence=decision['confidence'],
-                explanation=explanation,
-                period_id=period_id,
-                weather_temp_avg=weather_data.get('avg_temp'),
-                weather_temp_min=weather_data.get('temp_min_forecast'),
-                weather_temp_max=weather_data.get('temp_max_forecast'),
-                weather_humidity=weather_data.get('avg_humidity'),
-                weather_rainfall=weather_data.get('total_rainfall'),
-                weather_risks=str([r['type'] for r in weather_data.get('risks', [])]),
-                seedling_cost_tnd=seedling_cost,
-                market_price_tnd=market_price,
-                input_quantity=input_quantity
+            new_decision = self._build_decision(
+                farmer_id, crop_id, governorate, decision, explanation, period_id,
+                weather_data, seedling_cost, market_price, input_quantity, explanation_status
             )
-            db.session.add(new_decision)
+            if self._queue_decisions([new_decision]):
+                return new_decision.id
+            with FarmerRollupService.track(new_decision):
+                db.session.add(new_decision)
             db.session.commit()
             logger.info(f"Decision recorded: ID={new_decision.id}, Qty={input_quantity}, Cost={seedling_cost}, MkPrice={market_price}")
             return new_decision.id
         except Exception as e:
             logger.error(f"Failed to record decision: {e}")
             db.session.rollback()
-            return None
\ No newline at end of file
+            return None
+    
+    @staticmethod
+    def _queue_decisions(new_decisions: List[Decision]) -> bool:
+        """
+        Hand decisions to the write-behind writer (DECISION_WRITE_BEHIND).
+        
+        Each gets a reserved ID first. Returns False when write-behind is off;
+        decisions the full queue rejects are left for the caller to write
+        synchronously (they keep their reserved IDs).
+        """
+        writer = get_decision_writer()
+        if writer is None:
+            return False
+        for new_decision in new_decisions:
+            new_decision.id = writer.next_id()
+        rejected = [d for d in new_decisions if not writer.submit(decision_values(d))]
+        if rejected:
+            new_decisions[:] = rejected
+            return False
+        logger.info(f"Queued {len(new_decisions)} decision(s) for write-behind: {[d.id for d in new_decisions]}")
+        return True
+    
+    def _record_decisions(self, farmer_id: int, governorate: str, period_id: str,
+                          results: List[Dict], seedling_cost: float = None,
+                          market_price: float = None, input_quantity: float = 1.0) -> List:
+        """Record a batch of decisions with one insert and one commit"""
+        try:
+            new_decisions = [
+                self._build_decision(
+                    farmer_id, r['crop']['id'], governorate, r['decision'], r['explanation'],
+                    period_id, r['weather_analysis'], seedling_cost, market_price, input_quantity,
+                    r.get('explanation_status')
+                )
+                for r in results
+            ]
+            to_write = list(new_decisions)
+            if self._queue_decisions(to_write):
+                return [d.id for d in new_decisions]
+            db.session.add_all(to_write)
+            db.session.flush()
+            FarmerRollupService.record_new_decisions(farmer_id, to_write)
+            db.session.commit()
+            logger.info(f"Batch recorded {len(new_decisions)} decisions for farmer {farmer_id}")
+            return [d.id for d in new_decisions]
+        except Exception as e:
+            logger.error(f"Failed to record decisions: {e}")
+            db.session.rollback()
+            return [None] * len(results)
@@ -0,0 +1,421 @@
+"""
+Write-behind recording of advice decisions
+With DECISION_WRITE_BEHIND enabled, the advice path hands finished decisions
+to a single writer thread per worker instead of committing on the request
+thread. Decision IDs are reserved up front in blocks from `id_sequences`, so
+the response can carry the ID before the row exists. Every other Decision
+insert (synchronous advice, CLI, seeds) takes its ID from the same sequence.
+
+A decision that still fails after DECISION_WRITE_MAX_ATTEMPTS writes is
+appended to the DECISION_DEAD_LETTER_PATH file (JSON lines) instead of being
+dropped; `flask replay-dead-decisions` writes it once the cause is fixed.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import date, datetime
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.exc import IntegrityError
+from flask import current_app, has_app_context
+from models.base import db
+from models.decision import Decision, IdSequence
+
+logger = logging.getLogger(__name__)
+
+
+class IdBlockAllocator:
+    """
+    Hands out IDs from blocks reserved in the `id_sequences` table.
+
+    Blocks are reserved in their own short transaction, so they never overlap
+    between workers even if the caller's transaction rolls back. When the
+    block runs out in the middle of a flush, a single ID is reserved on the
+    flush's own connection instead (a second connection would wait on the
+    flush's write lock).
+    """
+
+    def __init__(self, engine, name, block_size=64, seed=None):
+        self.engine = engine
+        self.name = name
+        self.block_size = block_size
+        self.seed = seed  # fn(connection) -> first ID when the sequence is created
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def next_id(self, connection=None):
+        with self._lock:
+            if self._next < self._end:
+                value = self._next
+                self._next += 1
+                return value
+            if connection is not None:
+                return self._reserve_on(connection, 1)[0]
+            self._next, self._end = self._reserve()
+            value = self._next
+            self._next += 1
+            return value
+
+    def _reserve(self):
+        for _ in range(2):
+            try:
+                with self.engine.begin() as conn:
+                    return self._reserve_on(conn, self.block_size)
+            except IntegrityError:
+                # Another worker created the sequence row first: reserve from it
+                continue
+        raise RuntimeError(f"Could not reserve an ID block for '{self.name}'")
+
+    def _reserve_on(self, conn, size):
+        """Reserve `size` IDs inside the connection's transaction -> (start, end)"""
+        table = IdSequence.__table__
+        updated = conn.execute(
+            table.update().where(table.c.name == self.name)
+            .values(next_value=table.c.next_value + size)
+        ).rowcount
+        if updated:
+            end = conn.execute(select(table.c.next_value).where(table.c.name == self.name)).scalar()
+            return end - size, end
+        start = self.seed(conn) if self.seed else 1
+        conn.execute(table.insert().values(name=self.name, next_value=start + size))
+        return start, start + size
+
+
+def _next_decision_id(conn):
+    return (conn.execute(select(func.max(Decision.__table__.c.id))).scalar() or 0) + 1
+
+
+class DecisionWriter:
+    """
+    Single background writer for Decision rows.
+
+    `submit` queues a column mapping (back-pressure: waits at most
+    `enqueue_timeout` seconds for room, then returns False so the caller
+    writes synchronously). The writer commits up to `batch_size` decisions
+    per transaction, waiting `flush_interval` seconds to gather a batch.
+    A decision whose write fails is requeued, up to `max_attempts` writes in
+    all, then appended to the `dead_letter_path` file.
+    Pending decisions are flushed on `stop()` and at interpreter exit.
+    """
+
+    def __init__(self, app, queue_size=1000, batch_size=100, flush_interval=0.005,
+                 enqueue_timeout=0.05, id_block_size=64, max_attempts=3, dead_letter_path=None):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.id_block_size = id_block_size
+        self.max_attempts = max_attempts
+        self.dead_letter_path = dead_letter_path or app.config.get('DECISION_DEAD_LETTER_PATH')
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pending = {}  # decision id -> Event set once committed (or dead-lettered)
+        self._pending_lock = threading.Lock()
+        self._attempts = {}  # decision id -> failed writes so far
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._stats_lock = threading.Lock()
+        self.stats = {'queued': 0, 'written': 0, 'batches': 0, 'rejected': 0, 'retried': 0,
+                      'failed': 0}
+        atexit.register(self.stop)
+
+    def next_id(self, connection=None):
+        """Reserve a decision ID (pass the flush connection when called mid-transaction)"""
+        allocator = get_decision_id_allocator(connection)
+        if allocator is None:
+            raise RuntimeError("Write-behind needs the id_sequences table (created by db.create_all)")
+        return allocator.next_id(connection)
+
+    def submit(self, values):
+        """Queue a decision mapping (with its reserved 'id'). False if the queue stays full or the writer stopped."""
+        if self._stopping.is_set():
+            self._count('rejected')
+            logger.warning(f"Decision writer stopped, writing decision {values['id']} synchronously")
+            return False
+        self._ensure_started()
+        event_ = threading.Event()
+        with self._pending_lock:
+            self._pending[values['id']] = event_
+        try:
+            self._queue.put(values, timeout=self.enqueue_timeout)
+        except queue.Full:
+            with self._pending_lock:
+                self._pending.pop(values['id'], None)
+            self._count('rejected')
+            logger.warning(f"Decision write queue full, writing decision {values['id']} synchronously")
+            return False
+        self._count('queued')
+        return True
+
+    def wait_for(self, decision_id, timeout=2.0):
+        """Block until a queued decision is committed. True if it is (or was never queued here)."""
+        with self._pending_lock:
+            event_ = self._pending.get(decision_id)
+        return event_ is None or event_.wait(timeout)
+
+    def flush(self, timeout=5.0):
+        """Wait until everything queued so far is written"""
+        deadline = time.time() + timeout
+        while (self._queue.unfinished_tasks or self._pending) and time.time() < deadline:
+            time.sleep(self.flush_interval)
+        return not self._pending
+
+    def status(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        return {**stats, 'queue_depth': self._queue.qsize(), 'pending': len(self._pending)}
+
+    def _count(self, stat, n=1):
+        with self._stats_lock:
+            self.stats[stat] += n
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                # Started lazily so forked gunicorn workers each get their own thread
+                self._thread = threading.Thread(target=self._loop, name='decision-writer', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Flush what is queued and stop the writer"""
+        if self._thread is None:
+            return
+        self.flush(timeout)
+        self._stopping.set()
+        self._thread.join(timeout)
+
+    def _loop(self):
+        # Keep draining after stop() until the queue is empty so nothing enqueued before it is lost
+        while not (self._stopping.is_set() and self._queue.empty()):
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch):
+        from services.rollup_service import FarmerRollupService
+
+        start = time.time()
+        with self.app.app_context():
+            try:
+                self._commit(batch, FarmerRollupService)
+                self._count('batches')
+                self._count('written', len(batch))
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Batched decision write failed ({e}); retrying one by one")
+                for values in list(batch):
+                    try:
+                        self._commit([values], FarmerRollupService)
+                        self._count('written')
+                    except Exception as e:
+                        db.session.rollback()
+                        if self._requeue(values, e):
+                            batch.remove(values)
+            finally:
+                for _ in range(len(batch)):
+                    self._queue.task_done()
+                with self._pending_lock:
+                    for values in batch:
+                        self._attempts.pop(values['id'], None)
+                        event_ = self._pending.pop(values['id'], None)
+                        if event_:
+                            event_.set()
+        logger.debug(f"Wrote {len(batch)} queued decisions in {(time.time() - start) * 1000:.1f}ms")
+
+    def _requeue(self, values, error):
+        """Queue a failed decision again; True if requeued, else it is dead-lettered"""
+        attempts = self._attempts.get(values['id'], 0) + 1
+        if attempts < self.max_attempts and not self._stopping.is_set():
+            try:
+                self._queue.put_nowait(values)
+            except queue.Full:
+                pass
+            else:
+                self._attempts[values['id']] = attempts
+                self._count('retried')
+                self._queue.task_done()  # the requeued copy is a new task
+                logger.warning(f"Failed to record decision {values['id']} ({error}); "
+                               f"requeued (attempt {attempts + 1} of {self.max_attempts})")
+                return True
+        self._count('failed')
+        write_dead_letter(self.dead_letter_path, values, error)
+        return False
+
+    @staticmethod
+    def _commit(batch, rollups):
+        decisions = [Decision(**values) for values in batch]
+        db.session.add_all(decisions)
+        db.session.flush()
+        by_farmer = {}
+        for decision in decisions:
+            by_farmer.setdefault(decision.farmer_id, []).append(decision)
+        for farmer_id, farmer_decisions in by_farmer.items():
+            rollups.record_new_decisions(farmer_id, farmer_decisions)
+        db.session.commit()
+
+
+def decision_values(decision):
+    """Column mapping of an unsaved Decision (what the writer thread re-creates)"""
+    return {
+        column.key: getattr(decision, column.key)
+        for column in Decision.__mapper__.column_attrs
+        if getattr(decision, column.key) is not None
+    }
+
+
+def _encode(values):
+    return {key: value.isoformat() if isinstance(value, (date, datetime)) else value
+            for key, value in values.items()}
+
+
+def _decode(values):
+    """Inverse of _encode, by column type"""
+    decoded = dict(values)
+    for column in Decision.__table__.columns:
+        value = decoded.get(column.key)
+        if isinstance(value, str) and column.type.python_type in (date, datetime):
+            decoded[column.key] = column.type.python_type.fromisoformat(value)
+    return decoded
+
+
+def write_dead_letter(path, values, error):
+    """Append a decision that could not be written, so it can be replayed"""
+    logger.error(f"Failed to record decision {values['id']}: {error}; dead-lettered to {path}")
+    record = json.dumps({'values': _encode(values), 'error': str(error), 'failed_at': time.time()})
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(record + '\n')
+    except OSError as e:
+        logger.critical(f"Could not dead-letter decision {values['id']} ({e}) -- {record}")
+
+
+def replay_dead_letters(path):
+    """
+    Write the dead-lettered decisions of `path` that are not in the database
+    yet. Those that fail again stay in the file. Returns (written, remaining).
+    """
+    from services.rollup_service import FarmerRollupService
+
+    if not os.path.exists(path):
+        return 0, 0
+    with open(path, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    written, remaining = 0, []
+    for record in records:
+        values = _decode(record['values'])
+        if db.session.get(Decision, values['id']) is not None:
+            continue
+        try:
+            DecisionWriter._commit([values], FarmerRollupService)
+            written += 1
+        except Exception as e:
+            db.session.rollback()
+            remaining.append(dict(record, error=str(e)))
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(json.dumps(record) + '\n' for record in remaining)
+    return written, len(remaining)
+
+
+def init_decision_writer(app):
+    """Create the app's writer when DECISION_WRITE_BEHIND is enabled"""
+    if not app.config.get('DECISION_WRITE_BEHIND'):
+        return None
+    writer = DecisionWriter(
+        app,
+        queue_size=app.config.get('DECISION_WRITE_QUEUE_SIZE', 1000),
+        batch_size=app.config.get('DECISION_WRITE_BATCH_SIZE', 100),
+        flush_interval=app.config.get('DECISION_WRITE_FLUSH_INTERVAL', 0.005),
+        enqueue_timeout=app.config.get('DECISION_WRITE_ENQUEUE_TIMEOUT', 0.05),
+        id_block_size=app.config.get('DECISION_ID_BLOCK_SIZE', 64),
+        max_attempts=app.config.get('DECISION_WRITE_MAX_ATTEMPTS', 3),
+        dead_letter_path=app.config.get('DECISION_DEAD_LETTER_PATH')
+    )
+    app.extensions['decision_writer'] = writer
+    return writer
+
+
+def get_decision_writer():
+    """The app's DecisionWriter, or None when write-behind is disabled"""
+    return current_app.extensions.get('decision_writer')
+
+
+def get_decision_id_allocator(connection=None):
+    """
+    The app's allocator of decision IDs from `id_sequences`, or None while that
+    table does not exist yet (databases that predate the migration).
+    """
+    allocator = current_app.extensions.get('decision_id_allocator')
+    if allocator is None:
+        if not inspect(connection if connection is not None else db.engine).has_table(IdSequence.__tablename__):
+            return None
+        allocator = current_app.extensions.setdefault('decision_id_allocator', IdBlockAllocator(
+            db.engine, 'decisions', current_app.config.get('DECISION_ID_BLOCK_SIZE', 64),
+            seed=_next_decision_id
+        ))
+    return allocator
+
+
+def _is_reserved(decision_id):
+    """Whether some worker has reserved `decision_id` (it may not be written yet)"""
+    table = IdSequence.__table__
+    next_value = db.session.execute(
+        select(table.c.next_value).where(table.c.name == 'decisions')
+    ).scalar()
+    return next_value is not None and decision_id < next_value
+
+
+def wait_for_decision(decision_id, timeout=2.0, poll_interval=0.02):
+    """
+    Make sure a queued decision is in the database before reading it.
+
+    A decision queued by this worker is waited for directly. One reserved by
+    another worker (gunicorn runs a writer per worker) is polled for until it
+    shows up or `timeout` passes; IDs nobody reserved return at once.
+    """
+    writer = get_decision_writer()
+    if writer is None:
+        return
+    writer.wait_for(decision_id, timeout)
+    if not isinstance(decision_id, int):
+        return
+    deadline = time.time() + timeout
+    while (db.session.query(Decision.id).filter_by(id=decision_id).first() is None
+           and _is_reserved(decision_id) and time.time() < deadline):
+        time.sleep(poll_interval)
+
+
+@event.listens_for(Decision, 'before_insert')
+def _assign_reserved_id(mapper, connection, target):
+    """
+    Every Decision insert takes its ID from the reserved blocks, with or
+    without write-behind, so no insert collides with a queued decision.
+    """
+    if target.id is None and has_app_context():
+        writer = get_decision_writer()
+        if writer is not None:
+            target.id = writer.next_id(connection)
+            return
+        allocator = get_decision_id_allocator(connection)
+        if allocator is not None:
+            target.id = allocator.next_id(connection)
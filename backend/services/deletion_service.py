@@ -0,0 +1,63 @@
+"""
+Deletion Service
+Removes accounts and decisions with set-based DELETE statements instead of
+loading every child object through the ORM cascade.
+"""
+import logging
+import time
+from models.base import db
+from models.user import Farmer
+from models.decision import Decision, Outcome
+from models.analytics import FarmerAnalytics, AnalyticsEvent
+from services.cache_service import invalidate_on_commit
+from services.decision_writer import get_decision_writer
+from services.rollup_service import FarmerRollupService
+
+logger = logging.getLogger(__name__)
+
+
+class DeletionService:
+    """
+    Deletes run child tables first, so they work whether or not the database
+    enforces the ON DELETE CASCADE foreign keys (SQLite only does with
+    PRAGMA foreign_keys=ON). Nothing is committed here.
+    """
+
+    @staticmethod
+    def delete_farmer(farmer_id):
+        """Delete a farmer and all of their data. Returns the row counts per table."""
+        start = time.time()
+        writer = get_decision_writer()
+        if writer is not None:
+            # Queued decisions would otherwise be inserted after the farmer is gone
+            writer.flush()
+
+        decision_ids = db.session.query(Decision.id).filter(Decision.farmer_id == farmer_id)
+        counts = {
+            'outcomes': Outcome.query.filter(Outcome.decision_id.in_(decision_ids.scalar_subquery()))
+                               .delete(synchronize_session=False),
+            'decisions': Decision.query.filter_by(farmer_id=farmer_id).delete(synchronize_session=False),
+            'farmer_analytics': FarmerAnalytics.query.filter_by(farmer_id=farmer_id)
+                                               .delete(synchronize_session=False),
+            'analytics_events': AnalyticsEvent.query.filter_by(farmer_id=farmer_id)
+                                              .delete(synchronize_session=False),
+            'farmers': Farmer.query.filter_by(id=farmer_id).delete(synchronize_session=False),
+        }
+        invalidate_on_commit(f'farmer:{farmer_id}')
+        # The bulk statements bypassed the identity map
+        db.session.expire_all()
+
+        logger.info(f"Deleted farmer {farmer_id} in {(time.time() - start) * 1000:.1f}ms: {counts}")
+        return counts
+
+    @staticmethod
+    def delete_decision(decision):
+        """Delete one decision and its outcomes, keeping the farmer's rollups in step"""
+        start = time.time()
+        with FarmerRollupService.track(decision):
+            outcomes = Outcome.query.filter_by(decision_id=decision.id).delete(synchronize_session=False)
+            db.session.delete(decision)
+
+        logger.info(f"Deleted decision {decision.id} and {outcomes} outcomes "
+                    f"in {(time.time() - start) * 1000:.1f}ms")
+        return {'outcomes': outcomes, 'decisions': 1}
@@ -0,0 +1,126 @@
+"""
+Deferred AI explanations
+With ASYNC_EXPLANATIONS enabled, advice is returned with the template
+explanation and `explanation_status: pending` as soon as the rules engine has
+decided. The AI explanation is generated on a small per-worker thread pool and
+written back to Decision.explanation, where
+GET /api/decisions/<id>/explanation picks it up.
+"""
+import atexit
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from flask import current_app
+from models.base import db
+from models.decision import Decision
+from services.cache_service import invalidate_on_commit
+from services.decision_writer import wait_for_decision
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+READY = 'ready'
+FAILED = 'failed'  # The template explanation stays
+
+
+class ExplanationWorker:
+    """
+    Generates AI explanations for recorded decisions in the background.
+
+    `submit` never blocks the request: the job waits for the decision row
+    (write-behind), asks the AI service (explanation store first, model on a
+    miss) and updates the row's explanation and explanation_status.
+    """
+
+    def __init__(self, app, workers=2):
+        self.app = app
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = {}  # decision id -> Future
+        self.stats = {'submitted': 0, 'ready': 0, 'failed': 0}
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # Created lazily so forked gunicorn workers each get their own threads
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='explanation')
+                atexit.register(self.stop)
+            return self._executor
+
+    def submit(self, decision_id, farmer_id, ai_input, ai_service):
+        """Queue the AI explanation of a recorded decision"""
+        executor = self._get_executor()
+        future = executor.submit(self._generate, decision_id, farmer_id, dict(ai_input), ai_service)
+        with self._lock:
+            self.stats['submitted'] += 1
+            self._pending[decision_id] = future
+        future.add_done_callback(lambda _: self._done(decision_id))
+
+    def _done(self, decision_id):
+        with self._lock:
+            self._pending.pop(decision_id, None)
+
+    def wait_for(self, decision_id, timeout=None):
+        """Block until a submitted explanation is written. True if it is (or was never submitted)."""
+        with self._lock:
+            future = self._pending.get(decision_id)
+        if future is None:
+            return True
+        return not wait([future], timeout).not_done
+
+    def flush(self, timeout=10.0):
+        """Wait until every submitted explanation is written"""
+        deadline = time.time() + timeout
+        while self._pending and time.time() < deadline:
+            with self._lock:
+                futures = list(self._pending.values())
+            wait(futures, max(deadline - time.time(), 0))
+        return not self._pending
+
+    def status(self):
+        with self._lock:
+            return {**self.stats, 'pending': len(self._pending)}
+
+    def stop(self, timeout=10.0):
+        """Finish submitted explanations and stop the pool"""
+        if self._executor is None:
+            return
+        self.flush(timeout)
+        self._executor.shutdown(wait=False)
+
+    def _generate(self, decision_id, farmer_id, ai_input, ai_service):
+        start = time.time()
+        with self.app.app_context():
+            try:
+                wait_for_decision(decision_id)
+                explanation = ai_service.generate_ai_explanation(ai_input)
+                values = {'explanation_status': READY if explanation else FAILED}
+                if explanation:
+                    values['explanation'] = explanation
+                Decision.query.filter_by(id=decision_id).update(values, synchronize_session=False)
+                invalidate_on_commit(f'farmer:{farmer_id}')
+                db.session.commit()
+                status = values['explanation_status']
+            except Exception as e:
+                db.session.rollback()
+                status = FAILED
+                logger.error(f"Deferred explanation for decision {decision_id} failed: {e}")
+        with self._lock:
+            self.stats[status] += 1
+        logger.debug(f"Explained decision {decision_id} in {(time.time() - start) * 1000:.1f}ms")
+
+
+def init_explanation_worker(app):
+    """Create the app's worker when ASYNC_EXPLANATIONS is enabled"""
+    if not app.config.get('ASYNC_EXPLANATIONS'):
+        return None
+    worker = ExplanationWorker(app, workers=app.config.get('EXPLANATION_WORKERS', 2))
+    app.extensions['explanation_worker'] = worker
+    return worker
+
+
+def get_explanation_worker():
+    """The app's ExplanationWorker, or None when explanations are generated inline"""
+    return current_app.extensions.get('explanation_worker')
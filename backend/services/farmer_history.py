@@ -0,0 +1,101 @@
+"""
+Columnar farmer decision history for analytics
+"""
+from datetime import datetime
+import numpy as np
+from sqlalchemy import func
+from models.base import db
+from models.decision import Decision, Outcome
+from models.crop import Crop
+
+
+# Probability implied by each confidence label (used for Brier calibration)
+CONFIDENCE_PROBABILITIES = {'HIGH': 0.85, 'MEDIUM': 0.70, 'LOW': 0.50}
+
+# Recommendations that ask the farmer to hold off planting
+AVOIDANCE_RECOMMENDATIONS = ('WAIT', 'NOT_RECOMMENDED', 'AVOID')
+
+
+class FarmerHistory:
+    """
+    A farmer's decisions joined to their first outcome, stored column-wise.
+
+    Every row is one decision. Outcome columns are empty ('' / NaN / NaT)
+    for decisions that have no outcome yet.
+    """
+
+    def __init__(self, farmer_id, rows):
+        self.farmer_id = farmer_id
+        self.size = len(rows)
+
+        self.decision_id = np.array([r.id for r in rows], dtype=np.int64)
+        self.crop_id = np.array([r.crop_id for r in rows], dtype=np.int64)
+        self.crop_name = np.array([r.crop_name or '' for r in rows], dtype=str)
+        self.governorate = np.array([r.governorate or '' for r in rows], dtype=str)
+        self.timestamp = np.array([r.timestamp for r in rows], dtype='datetime64[us]')
+        self.recommendation = np.array([r.recommendation or '' for r in rows], dtype=str)
+        self.advice_status = np.array([r.advice_status or '' for r in rows], dtype=str)
+        self.confidence = np.array([r.confidence or '' for r in rows], dtype=str)
+        self.weather_temp_avg = self._floats([r.weather_temp_avg for r in rows])
+        self.seedling_cost = self._floats([r.seedling_cost_tnd for r in rows])
+        self.input_quantity = self._floats([r.input_quantity for r in rows])
+
+        self.outcome = np.array([r.outcome or '' for r in rows], dtype=str)
+        self.revenue = self._floats([r.revenue_tnd for r in rows])
+        self.recorded_at = np.array([r.recorded_at for r in rows], dtype='datetime64[us]')
+
+        # Frequently used masks
+        self.has_outcome = self.outcome != ''
+        self.is_success = self.outcome == 'success'
+        self.is_failure = self.outcome == 'failure'
+        self.followed = self.advice_status == 'followed'
+        self.ignored = self.advice_status == 'ignored'
+        self.avoidance = np.isin(self.recommendation, AVOIDANCE_RECOMMENDATIONS)
+
+    @staticmethod
+    def _floats(values):
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+    @classmethod
+    def load(cls, farmer_id):
+        """Fetch all decisions of a farmer with their first outcome in one query"""
+        first_outcome = db.session.query(
+            Outcome.decision_id.label('decision_id'),
+            func.min(Outcome.id).label('outcome_id')
+        ).join(Decision, Decision.id == Outcome.decision_id).filter(
+            Decision.farmer_id == farmer_id
+        ).group_by(Outcome.decision_id).subquery()
+
+        rows = db.session.query(
+            Decision.id,
+            Decision.crop_id,
+            Crop.name.label('crop_name'),
+            Decision.governorate,
+            Decision.timestamp,
+            Decision.recommendation,
+            Decision.advice_status,
+            Decision.confidence,
+            Decision.weather_temp_avg,
+            Decision.seedling_cost_tnd,
+            Decision.input_quantity,
+            Outcome.outcome,
+            Outcome.revenue_tnd,
+            Outcome.recorded_at
+        ).outerjoin(Crop, Crop.id == Decision.crop_id)\
+         .outerjoin(first_outcome, first_outcome.c.decision_id == Decision.id)\
+         .outerjoin(Outcome, Outcome.id == first_outcome.c.outcome_id)\
+         .filter(Decision.farmer_id == farmer_id)\
+         .order_by(Decision.timestamp, Decision.id)\
+         .all()
+
+        return cls(farmer_id, rows)
+
+    def last_decision_at(self):
+        """Timestamp of the most recent decision, or None"""
+        if self.size == 0:
+            return None
+        return self.timestamp.max().astype(datetime)
+
+    def outcomes_since(self, since):
+        """Mask of rows whose outcome was recorded at or after `since`"""
+        return self.has_outcome & (self.recorded_at >= np.datetime64(since, 'us'))
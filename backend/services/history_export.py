@@ -0,0 +1,118 @@
+"""
+Streaming export of a farmer's decision and outcome history
+Rows are read through a server-side cursor (yield_per) and written out one at a
+time, so memory stays flat however many years of history are exported.
+"""
+import csv
+import io
+import json
+import logging
+from datetime import datetime, timedelta
+from models.base import db
+from models.decision import Decision, Outcome
+from services.reference_catalog import get_reference_catalog
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+
+DECISION_COLUMNS = (
+    Decision.id, Decision.timestamp, Decision.crop_id, Decision.period_id, Decision.governorate,
+    Decision.recommendation, Decision.wait_days, Decision.confidence,
+    Decision.weather_temp_avg, Decision.weather_rainfall, Decision.weather_risks,
+    Decision.advice_status, Decision.actual_action, Decision.input_quantity,
+    Decision.seedling_cost_tnd, Decision.market_price_tnd, Decision.cost_basis_tnd
+)
+OUTCOME_COLUMNS = (
+    Outcome.id, Outcome.outcome, Outcome.yield_kg, Outcome.revenue_tnd,
+    Outcome.net_profit_loss, Outcome.harvest_date, Outcome.recorded_at
+)
+
+FIELDS = (
+    ['decision_id', 'date', 'crop_id', 'period_id', 'governorate', 'recommendation', 'wait_days',
+     'confidence', 'weather_temp', 'weather_rainfall', 'weather_risks', 'advice_status',
+     'actual_action', 'input_quantity', 'seedling_cost_tnd', 'market_price_tnd', 'cost_basis_tnd'] +
+    ['outcome_id', 'outcome', 'yield_kg', 'revenue_tnd', 'net_profit_loss', 'harvest_date',
+     'outcome_recorded_at'] +
+    ['crop_name', 'period_name']
+)
+
+
+class HistoryExportService:
+    """Generators over one farmer's history (one row per decision/outcome pair)"""
+
+    BATCH_SIZE = 500  # rows fetched per cursor round trip
+    CHUNK_SIZE = 64 * 1024  # characters per response chunk
+
+    @staticmethod
+    def rows(farmer_id, start=None, end=None, crop_id=None, batch_size=None):
+        """
+        Yield export rows as dicts, oldest first. Decisions and outcomes come
+        from one outer join; `end` is inclusive (a date).
+        """
+        catalog = get_reference_catalog()
+        query = db.session.query(*DECISION_COLUMNS, *OUTCOME_COLUMNS)\
+            .outerjoin(Outcome, Outcome.decision_id == Decision.id)\
+            .filter(Decision.farmer_id == farmer_id)
+        if start is not None:
+            query = query.filter(Decision.timestamp >= datetime.combine(start, datetime.min.time()))
+        if end is not None:
+            query = query.filter(Decision.timestamp < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+        if crop_id is not None:
+            query = query.filter(Decision.crop_id == crop_id)
+        query = query.order_by(Decision.timestamp, Decision.id, Outcome.id)\
+            .yield_per(batch_size or HistoryExportService.BATCH_SIZE)
+
+        count = 0
+        for values in query:
+            row = dict(zip(FIELDS, values))
+            crop = catalog.crop(row['crop_id'])
+            period = catalog.period(row['period_id']) if row['period_id'] else None
+            row['crop_name'] = crop.name if crop else None
+            row['period_name'] = period.name if period else None
+            count += 1
+            yield row
+        logger.info(f"Exported {count} history rows for farmer {farmer_id}")
+
+    @staticmethod
+    def _value(value):
+        return value.isoformat() if hasattr(value, 'isoformat') else value
+
+    @staticmethod
+    def to_csv(rows):
+        """Header line, then CSV lines in chunks of about CHUNK_SIZE characters"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(FIELDS)
+        for row in rows:
+            writer.writerow([HistoryExportService._value(row[field]) for field in FIELDS])
+            if buffer.tell() >= HistoryExportService.CHUNK_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    @staticmethod
+    def to_ndjson(rows):
+        """One JSON object per line, in chunks of about CHUNK_SIZE characters"""
+        lines, size = [], 0
+        for row in rows:
+            line = json.dumps({key: HistoryExportService._value(value) for key, value in row.items()}) + '\n'
+            lines.append(line)
+            size += len(line)
+            if size >= HistoryExportService.CHUNK_SIZE:
+                yield ''.join(lines)
+                lines, size = [], 0
+        if lines:
+            yield ''.join(lines)
+
+    @staticmethod
+    def stream(farmer_id, export_format='csv', **filters):
+        """Chunks of the export in the requested format ('csv' or 'ndjson')"""
+        rows = HistoryExportService.rows(farmer_id, **filters)
+        if export_format == 'ndjson':
+            return HistoryExportService.to_ndjson(rows)
+        return HistoryExportService.to_csv(rows)
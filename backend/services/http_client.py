@@ -0,0 +1,281 @@
+"""
+Resilient HTTP client for upstream APIs (Open-Meteo, ...)
+Each client keeps a pooled keep-alive session, retries transient failures a
+bounded number of times with jittered exponential backoff, and sits behind a
+circuit breaker: after consecutive failures the upstream is skipped entirely
+for a cool-down, so callers fall back at once instead of waiting on timeouts.
+Calls to each dependency also go through a bulkhead that caps how many run at
+once in this process, so a slow upstream cannot hold every thread.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+import requests
+from requests.adapters import HTTPAdapter
+from flask import current_app, has_app_context
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """The upstream was not called because its circuit is open"""
+
+
+class BulkheadFullError(Exception):
+    """The dependency already has its maximum number of calls in flight"""
+
+
+class Bulkhead:
+    """
+    Caps concurrent calls to one dependency. A caller waits at most `wait`
+    seconds for a free slot, then gets BulkheadFullError (and falls back).
+    """
+
+    def __init__(self, name, limit=4, wait=0.05):
+        self.name = name
+        self.limit = limit
+        self.wait = wait
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.stats = {'calls': 0, 'rejected': 0, 'peak': 0}
+
+    def acquire(self):
+        """Take a slot or raise BulkheadFullError; every acquire() needs a release()"""
+        if not self._semaphore.acquire(timeout=self.wait):
+            with self._lock:
+                self.stats['rejected'] += 1
+            raise BulkheadFullError(f"Bulkhead '{self.name}' is full ({self.limit} calls in flight)")
+        with self._lock:
+            self.in_use += 1
+            self.stats['calls'] += 1
+            self.stats['peak'] = max(self.stats['peak'], self.in_use)
+
+    def release(self):
+        with self._lock:
+            self.in_use -= 1
+        self._semaphore.release()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def status(self):
+        with self._lock:
+            return {'limit': self.limit, 'in_use': self.in_use, **self.stats}
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures; open ->
+    half-open once `reset_timeout` seconds have passed, letting one trial call
+    through; the trial closes the circuit again or re-opens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self.stats = {'successes': 0, 'failures': 0, 'rejected': 0, 'trips': 0}
+
+    def allow(self):
+        """Whether a call may go upstream now"""
+        with self._lock:
+            if self.state == self.OPEN and time.time() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_running = False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.stats['rejected'] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit '{self.name}' closed")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._trial_running = False
+            self.stats['successes'] += 1
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.stats['failures'] += 1
+            self._trial_running = False
+            if self.state == self.HALF_OPEN or (
+                    self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self.opened_at = time.time()
+                self.stats['trips'] += 1
+                logger.warning(f"Circuit '{self.name}' opened after {self.consecutive_failures} "
+                               f"consecutive failures; skipping it for {self.reset_timeout}s")
+
+    def status(self):
+        with self._lock:
+            retry_in = None
+            if self.state == self.OPEN:
+                retry_in = round(max(0.0, self.reset_timeout - (time.time() - self.opened_at)), 1)
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'retry_in_seconds': retry_in,
+                **self.stats
+            }
+
+
+class ResilientHttpClient:
+    """JSON GETs over a pooled session with bounded, jittered retries and a circuit breaker"""
+
+    # Responses worth retrying; other 4xx are the caller's fault and fail at once
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+    def __init__(self, name, connect_timeout=2.0, read_timeout=5.0, retries=2, backoff=0.25,
+                 max_backoff=2.0, total_timeout=8.0, pool_size=10, failure_threshold=5,
+                 reset_timeout=30.0, bulkhead=None):
+        self.name = name
+        self.bulkhead = bulkhead or Bulkhead(name, pool_size)
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.total_timeout = total_timeout
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout)
+        self.session = requests.Session()
+        # Retries are done here (with jitter and the breaker), not by urllib3
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.stats = {'requests': 0, 'retries': 0}
+
+    @classmethod
+    def from_config(cls, name, config, bulkhead=None):
+        return cls(
+            name,
+            connect_timeout=float(config.get('HTTP_CONNECT_TIMEOUT', 2.0)),
+            read_timeout=float(config.get('HTTP_READ_TIMEOUT', 5.0)),
+            retries=int(config.get('HTTP_RETRIES', 2)),
+            backoff=float(config.get('HTTP_BACKOFF', 0.25)),
+            max_backoff=float(config.get('HTTP_MAX_BACKOFF', 2.0)),
+            total_timeout=float(config.get('HTTP_TOTAL_TIMEOUT', 8.0)),
+            pool_size=int(config.get('HTTP_POOL_SIZE', 10)),
+            failure_threshold=int(config.get('HTTP_BREAKER_THRESHOLD', 5)),
+            reset_timeout=float(config.get('HTTP_BREAKER_RESET', 30.0)),
+            bulkhead=bulkhead
+        )
+
+    def _delay(self, attempt):
+        """Full jitter: uniform between 0 and the capped exponential backoff"""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def get_json(self, url, params=None):
+        """
+        GET `url` and return the decoded JSON body.
+
+        Raises BulkheadFullError or CircuitOpenError without calling the
+        upstream when too many calls are in flight or the circuit is open, or
+        the last error once the retries or `total_timeout` run out.
+        """
+        with self.bulkhead.slot():
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"Circuit '{self.name}' is open")
+            return self._get_with_retries(url, params)
+
+    def _get_with_retries(self, url, params):
+        deadline = time.time() + self.total_timeout
+        attempt = 0
+        while True:
+            self.stats['requests'] += 1
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+                if response.status_code not in self.RETRY_STATUSES:
+                    response.raise_for_status()
+                    data = response.json()
+                    self.breaker.record_success()
+                    return data
+                error = requests.HTTPError(f"{response.status_code} from {self.name}", response=response)
+            except requests.HTTPError:
+                # Non-retryable status: the upstream is up, so the breaker is not charged
+                self.breaker.record_success()
+                raise
+            except (requests.ConnectionError, requests.Timeout, ValueError) as e:
+                error = e
+            delay = self._delay(attempt)
+            if attempt >= self.retries or time.time() + delay >= deadline:
+                self.breaker.record_failure()
+                raise error
+            attempt += 1
+            self.stats['retries'] += 1
+            logger.debug(f"{self.name} request failed ({error}); retry {attempt} in {delay:.2f}s")
+            time.sleep(delay)
+
+    def status(self):
+        return {**self.breaker.status(), **self.stats}
+
+
+_process_registries = {}
+_registry_lock = threading.RLock()  # client creation looks up its bulkhead
+
+
+def _get_or_create(kind, name, factory):
+    """Per-app registry entry (per process, configured from the environment, outside an app)"""
+    if has_app_context():
+        registry = current_app.extensions.setdefault(kind, {})
+        config = current_app.config
+    else:
+        registry = _process_registries.setdefault(kind, {})
+        config = os.environ
+    value = registry.get(name)
+    if value is None:
+        with _registry_lock:
+            value = registry.get(name)
+            if value is None:
+                value = registry[name] = factory(config)
+    return value
+
+
+def get_bulkhead(name):
+    """The bulkhead of dependency `name` (limit BULKHEAD_<NAME>, else BULKHEAD_DEFAULT)"""
+    def create(config):
+        limit = config.get(f"BULKHEAD_{name.upper().replace('-', '_')}", config.get('BULKHEAD_DEFAULT', 4))
+        return Bulkhead(name, int(limit), float(config.get('BULKHEAD_WAIT', 0.05)))
+    return _get_or_create('bulkheads', name, create)
+
+
+def get_http_client(name):
+    """The app's client for upstream `name`, configured from the HTTP_* settings"""
+    return _get_or_create(
+        'http_clients', name,
+        lambda config: ResilientHttpClient.from_config(name, config, bulkhead=get_bulkhead(name))
+    )
+
+
+def http_client_status():
+    """Breaker state and counters of the app's clients (shown in /api/health/detailed)"""
+    clients = current_app.extensions.get('http_clients', {})
+    return {name: client.status() for name, client in clients.items()}
+
+
+def bulkhead_status():
+    """Concurrency per dependency (shown in /api/health/detailed)"""
+    bulkheads = current_app.extensions.get('bulkheads', {})
+    return {name: bulkhead.status() for name, bulkhead in bulkheads.items()}
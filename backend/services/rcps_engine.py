@@ -0,0 +1,193 @@
+"""
+Set-based Regional Crop Performance Score (RCPS) engine
+Computes RCPS for every crop x governorate from a few grouped queries.
+"""
+import logging
+import math
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from flask import current_app
+from sqlalchemy import func, case
+from models.base import db
+from models.decision import Decision, Outcome
+from models.crop import Crop
+
+logger = logging.getLogger(__name__)
+
+
+class RCPSMatrix:
+    """
+    RCPS = w1×SR + w2×SC + w3×CR + w4×YR for all crops × governorates
+
+    Where:
+    - SR = success rate (last 2 years)
+    - SC = normalized success count: log10(success_count + 1)
+    - CR = consistency ratio: 1 - (std_dev_monthly / SR)
+    - YR = yield ratio: avg_yield / max_yield_national
+
+    `scores` is a (crops × governorates) array with NaN where the minimum
+    sample requirements are not met.
+    """
+
+    WEIGHTS = (0.4, 0.2, 0.2, 0.2)
+    MIN_SUCCESSES = 3
+    MIN_ATTEMPTS = 3
+    WINDOW_DAYS = 730
+
+    def __init__(self, crop_ids, crop_names, governorates, cells):
+        self.crop_ids = crop_ids
+        self.crop_names = crop_names
+        self.governorates = governorates
+        self.built_at = time.time()
+        self._crop_index = {cid: i for i, cid in enumerate(crop_ids)}
+        self._gov_index = {g: j for j, g in enumerate(governorates)}
+        self._cells = cells
+
+        self.scores = np.full((len(crop_ids), len(governorates)), np.nan)
+        for (crop_id, gov), cell in cells.items():
+            self.scores[self._crop_index[crop_id], self._gov_index[gov]] = cell['rcps']
+
+    @classmethod
+    def build(cls, governorate=None):
+        """Compute the matrix (optionally for one governorate) from raw outcomes"""
+        since = datetime.utcnow() - timedelta(days=cls.WINDOW_DAYS)
+        successes = func.coalesce(func.sum(case((Outcome.outcome == 'success', 1), else_=0)), 0)
+
+        def scoped(query):
+            query = query.filter(Decision.timestamp >= since)
+            if governorate is not None:
+                query = query.filter(Decision.governorate == governorate)
+            return query
+
+        # 1. Attempts, successes and average yield per (governorate, crop)
+        stats = scoped(db.session.query(
+            Decision.governorate,
+            Decision.crop_id,
+            func.count(Outcome.id),
+            successes,
+            func.avg(Outcome.yield_kg)
+        ).join(Outcome, Outcome.decision_id == Decision.id))\
+         .group_by(Decision.governorate, Decision.crop_id).all()
+
+        # 2. National max yield per crop (all time, all regions)
+        national_max = dict(db.session.query(
+            Decision.crop_id,
+            func.max(Outcome.yield_kg)
+        ).join(Outcome, Outcome.decision_id == Decision.id)
+         .filter(Outcome.yield_kg != None)
+         .group_by(Decision.crop_id).all())
+
+        # 3. Monthly success rates per (governorate, crop) for consistency
+        month = func.strftime('%Y-%m', Decision.timestamp)
+        monthly = scoped(db.session.query(
+            Decision.governorate,
+            Decision.crop_id,
+            func.count(Outcome.id),
+            successes
+        ).join(Outcome, Outcome.decision_id == Decision.id))\
+         .group_by(Decision.governorate, Decision.crop_id, month).all()
+
+        consistency_inputs = cls._monthly_std(monthly)
+
+        crops = db.session.query(Crop.id, Crop.name).order_by(Crop.id).all()
+        crop_ids = [c.id for c in crops]
+        crop_names = {c.id: c.name for c in crops}
+        governorates = sorted({row[0] for row in stats if row[0]} | ({governorate} if governorate else set()))
+
+        cells = {}
+        for gov, crop_id, total, success_count, avg_yield in stats:
+            if crop_id not in crop_names or not gov:
+                continue
+            success_count = int(success_count)
+            if success_count < cls.MIN_SUCCESSES or total < cls.MIN_ATTEMPTS:
+                continue
+            months, std_dev = consistency_inputs.get((gov, crop_id), (0, 0.0))
+            cells[(crop_id, gov)] = cls._score(
+                total, success_count, avg_yield or 0, months, std_dev, national_max.get(crop_id)
+            )
+
+        matrix = cls(crop_ids, crop_names, governorates, cells)
+        logger.info(f"Built RCPS matrix: {len(crop_ids)} crops x {len(governorates)} governorates, {len(cells)} scored cells")
+        return matrix
+
+    @staticmethod
+    def _monthly_std(monthly_rows):
+        """Population std-dev of monthly success rates per (governorate, crop) via NumPy"""
+        rows = [r for r in monthly_rows if r[2] > 0]
+        if not rows:
+            return {}
+        keys = [(r[0], r[1]) for r in rows]
+        rates = np.array([r[3] / r[2] for r in rows], dtype=float)
+
+        unique_keys = list(dict.fromkeys(keys))
+        position = {k: i for i, k in enumerate(unique_keys)}
+        group = np.array([position[k] for k in keys])
+
+        counts = np.bincount(group, minlength=len(unique_keys))
+        mean = np.bincount(group, weights=rates, minlength=len(unique_keys)) / counts
+        mean_sq = np.bincount(group, weights=rates ** 2, minlength=len(unique_keys)) / counts
+        std = np.sqrt(np.maximum(mean_sq - mean ** 2, 0.0))
+        return {k: (int(counts[i]), float(std[i])) for i, k in enumerate(unique_keys)}
+
+    @classmethod
+    def _score(cls, total, success_count, avg_yield, months, std_dev, national_max):
+        # 1. Success Rate (SR)
+        sr = success_count / total
+        # 2. Success Count normalized (SC)
+        sc = math.log10(success_count + 1)
+        # 3. Consistency Ratio (CR)
+        if months > 1:
+            cr = max(0, 1 - (std_dev / sr)) if sr > 0 else 0
+        else:
+            cr = 0.5  # Default if not enough monthly data
+        # 4. Yield Ratio (YR)
+        national_max_yield = float(national_max) if national_max else 1.0
+        yr = avg_yield / national_max_yield if national_max_yield > 0 else 0
+
+        w = cls.WEIGHTS
+        rcps = w[0]*sr + w[1]*sc + w[2]*cr + w[3]*yr
+        return {
+            'rcps': round(float(rcps), 3),
+            'success_rate': round(float(sr * 100), 1),
+            'sample_size': int(total),
+            'successes': int(success_count),
+            'consistency': round(float(cr), 2),
+            'avg_yield': round(float(avg_yield), 1) if avg_yield else None
+        }
+
+    def cell(self, crop_id, governorate):
+        """RCPS details for one crop in one governorate, or None"""
+        return self._cells.get((crop_id, governorate))
+
+    def top_crops(self, governorate, limit=5):
+        """Crops of a governorate sorted by RCPS (ties keep crop id order)"""
+        j = self._gov_index.get(governorate)
+        if j is None:
+            return []
+        column = self.scores[:, j]
+        scored = np.flatnonzero(~np.isnan(column))
+        order = scored[np.argsort(-column[scored], kind='stable')]
+
+        results = []
+        for i in order[:limit]:
+            crop_id = self.crop_ids[i]
+            cell = self._cells[(crop_id, governorate)]
+            results.append({
+                'crop_id': crop_id,
+                'crop_name': self.crop_names[crop_id],
+                'rcps': cell['rcps'],
+                'success_rate': cell['success_rate'],
+                'sample_size': cell['sample_size']
+            })
+        return results
+
+
+def get_rcps_matrix():
+    """The app's RCPS matrix for all governorates, rebuilt after RCPS_CACHE_TTL seconds"""
+    ttl = current_app.config.get('RCPS_CACHE_TTL', 300)
+    matrix = current_app.extensions.get('rcps_matrix')
+    if matrix is None or time.time() - matrix.built_at >= ttl:
+        matrix = RCPSMatrix.build()
+        current_app.extensions['rcps_matrix'] = matrix
+    return matrix
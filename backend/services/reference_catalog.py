@@ -0,0 +1,248 @@
+"""
+In-process catalog of reference data (crops, agrarian periods, crop-period
+rules and regional period adjustments).
+
+These tables are tiny and nearly static, so each worker loads them once into
+immutable records. Writes through the ORM bump a version stamp
+(ReferenceDataVersion); workers notice their own writes immediately and other
+workers' writes within REFERENCE_VERSION_CHECK_INTERVAL seconds.
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+import numpy as np
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models.base import db
+from models.crop import Crop, AgrarianPeriod, CropPeriodRule
+from models.regional import PeriodRegionAdjustment
+from models.reference import ReferenceDataVersion
+from services.agrarian_calendar import AgrarianCalendar, FALLBACK_PERIODS
+from services.cache_service import invalidate_on_commit
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_MODELS = (Crop, AgrarianPeriod, CropPeriodRule, PeriodRegionAdjustment)
+
+CropRef = namedtuple('CropRef', [c.name for c in Crop.__table__.columns])
+PeriodRef = namedtuple('PeriodRef', [c.name for c in AgrarianPeriod.__table__.columns])
+RuleRef = namedtuple('RuleRef', ['crop_id', 'period_id', 'suitability', 'reason', 'additional_conditions'])
+AdjustmentRef = namedtuple('AdjustmentRef', [c.name for c in PeriodRegionAdjustment.__table__.columns])
+
+# Integer codes of the rule matrix (NO_RULE where a crop has no rule for a period)
+SUITABILITY_CODES = {'optimal': 0, 'acceptable': 1, 'risky': 2, 'forbidden': 3}
+NO_RULE = -1
+
+
+def _row(ref_type, obj):
+    return ref_type(*(getattr(obj, field) for field in ref_type._fields))
+
+
+class ReferenceCatalog:
+    """
+    Immutable snapshot of the reference tables.
+
+    `rule_matrix` is a (crops × periods) int8 array of SUITABILITY_CODES,
+    addressed through `crop_index` / `period_index`.
+    """
+
+    def __init__(self, version, crops, periods, rules, adjustments):
+        self.version = version
+        self.crops = tuple(crops)
+        self.periods = tuple(periods)  # table order
+        self.periods_by_start = tuple(sorted(self.periods, key=lambda p: (p.start_month, p.start_day)))
+        self.adjustments = {(a.period_id, a.governorate): a for a in adjustments}
+
+        self.crop_index = {c.id: i for i, c in enumerate(self.crops)}
+        self.period_index = {p.id: j for j, p in enumerate(self.periods)}
+        self._crops_by_name = {c.name: c for c in self.crops}
+        self._rules = {}
+        self.rule_matrix = np.full((len(self.crops), len(self.periods)), NO_RULE, dtype=np.int8)
+        for rule in rules:
+            i = self.crop_index.get(rule.crop_id)
+            j = self.period_index.get(rule.period_id)
+            if i is None or j is None:
+                continue
+            self.rule_matrix[i, j] = SUITABILITY_CODES.get(rule.suitability, NO_RULE)
+            self._rules[(i, j)] = rule
+
+        self.calendar = AgrarianCalendar([self.period_dict(p) for p in self.periods] or FALLBACK_PERIODS)
+        self._regional_calendars = {}
+
+    @classmethod
+    def load(cls, version):
+        """Read every reference table once"""
+        return cls(
+            version,
+            [_row(CropRef, c) for c in Crop.query.order_by(Crop.id).all()],
+            [_row(PeriodRef, p) for p in AgrarianPeriod.query.all()],
+            [_row(RuleRef, r) for r in CropPeriodRule.query.all()],
+            [_row(AdjustmentRef, a) for a in PeriodRegionAdjustment.query.all()],
+        )
+
+    @staticmethod
+    def period_dict(period):
+        """Same shape as AgrarianPeriod.to_dict()"""
+        return {
+            'id': period.id,
+            'name': period.name,
+            'start_month': period.start_month,
+            'start_day': period.start_day,
+            'end_month': period.end_month,
+            'end_day': period.end_day,
+            'risk_level': period.risk_level,
+            'description': period.description
+        }
+
+    def crop(self, crop_id):
+        i = self.crop_index.get(crop_id)
+        return self.crops[i] if i is not None else None
+
+    def crop_by_name(self, name):
+        return self._crops_by_name.get(name)
+
+    def period(self, period_id):
+        j = self.period_index.get(period_id)
+        return self.periods[j] if j is not None else None
+
+    def rule(self, crop_id, period_id):
+        """The crop's rule for a period, or None"""
+        i = self.crop_index.get(crop_id)
+        j = self.period_index.get(period_id)
+        if i is None or j is None:
+            return None
+        return self._rules.get((i, j))
+
+    def rules_for_period(self, period_id, crop_ids):
+        """{crop_id: RuleRef} for the crops that have a rule in the period"""
+        j = self.period_index.get(period_id)
+        if j is None:
+            return {}
+        rows = [(cid, self.crop_index[cid]) for cid in crop_ids if cid in self.crop_index]
+        return {cid: self._rules[(i, j)] for cid, i in rows if self.rule_matrix[i, j] != NO_RULE}
+
+    def crops_with_suitability(self, period_id, suitability):
+        """Crops whose rule for the period has the given suitability (crop id order)"""
+        j = self.period_index.get(period_id)
+        if j is None:
+            return []
+        rows = np.flatnonzero(self.rule_matrix[:, j] == SUITABILITY_CODES[suitability])
+        return [self.crops[i] for i in rows]
+
+    def adjustment(self, period_id, governorate):
+        return self.adjustments.get((period_id, governorate))
+
+    def calendar_for(self, governorate):
+        """
+        The calendar with the governorate's PeriodRegionAdjustment rows applied
+        (compiled on first use; the national calendar if it has none).
+        """
+        calendar = self._regional_calendars.get(governorate)
+        if calendar is None:
+            adjustments = {
+                self.period_index[a.period_id]: (a.start_adjustment_days, a.end_adjustment_days, a.risk_multiplier)
+                for (period_id, gov), a in self.adjustments.items()
+                if gov == governorate and period_id in self.period_index
+            }
+            calendar = AgrarianCalendar(self.calendar.periods, adjustments) if adjustments else self.calendar
+            self._regional_calendars[governorate] = calendar
+        return calendar
+
+
+# Process-local generation: bumped after a commit that touched reference rows,
+# so this worker reloads at once without waiting for the version check
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def _bump_generation():
+    global _generation
+    with _generation_lock:
+        _generation += 1
+
+
+def _touches_reference(session):
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, REFERENCE_MODELS):
+            return True
+    return any(isinstance(obj, REFERENCE_MODELS) and session.is_modified(obj) for obj in session.dirty)
+
+
+def _bump_version(connection):
+    """Increment the shared version stamp inside the current transaction"""
+    table = ReferenceDataVersion.__table__
+    result = connection.execute(table.update().values(version=table.c.version + 1))
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(id=1, version=1))
+
+
+@event.listens_for(Session, 'before_flush')
+def _detect_reference_writes(session, flush_context, instances):
+    if _touches_reference(session):
+        session.info['reference_flush'] = True
+
+
+@event.listens_for(Session, 'after_flush')
+def _stamp_reference_writes(session, flush_context):
+    if session.info.pop('reference_flush', False):
+        session.info['reference_changed'] = True
+        invalidate_on_commit('crops', session=session)
+        _bump_version(session.connection())
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _stamp_bulk_reference_writes(orm_execute_state):
+    """Query.update()/delete() bypass the flush"""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in REFERENCE_MODELS:
+        orm_execute_state.session.info['reference_changed'] = True
+        invalidate_on_commit('crops', session=orm_execute_state.session)
+        _bump_version(orm_execute_state.session.connection())
+
+
+@event.listens_for(Session, 'after_commit')
+def _reference_committed(session):
+    if session.info.pop('reference_changed', False):
+        _bump_generation()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _reference_rolled_back(session):
+    session.info.pop('reference_flush', None)
+    session.info.pop('reference_changed', None)
+
+
+def _stored_version():
+    return db.session.query(ReferenceDataVersion.version).filter_by(id=1).scalar() or 0
+
+
+def get_reference_catalog():
+    """
+    The app's reference catalog.
+
+    Reloaded after this worker commits reference changes, or when the shared
+    version stamp (checked at most every REFERENCE_VERSION_CHECK_INTERVAL
+    seconds) moved because another process changed the tables.
+    """
+    holder = current_app.extensions.get('reference_catalog')
+    now = time.time()
+    if holder is not None and holder['generation'] == _generation:
+        if now - holder['checked_at'] < current_app.config.get('REFERENCE_VERSION_CHECK_INTERVAL', 30):
+            return holder['catalog']
+        version = _stored_version()
+        if version == holder['catalog'].version:
+            holder['checked_at'] = now
+            return holder['catalog']
+
+    generation = _generation
+    catalog = ReferenceCatalog.load(_stored_version())
+    current_app.extensions['reference_catalog'] = {
+        'catalog': catalog, 'generation': generation, 'checked_at': now
+    }
+    logger.info(f"Loaded reference catalog v{catalog.version}: {len(catalog.crops)} crops, "
+                f"{len(catalog.periods)} periods, {len(catalog._rules)} rules")
+    return catalog
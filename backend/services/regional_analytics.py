@@ -5,12 +5,17 @@ Implements GSI, PBD, RCPS, and related metrics with statistical validation
 from models.base import db
 from models.decision import Decision, Outcome
 from models.user import Farmer
-from models.crop import Crop
 from models.analytics import RegionalBenchmarks, CropSpecificDefaults
-from sqlalchemy import func, and_, or_, case, literal, Integer, cast
+from sqlalchemy import func, and_, or_, case, literal, Integer, cast, tuple_
 from datetime import datetime, timedelta
+import logging
 import math
-import numpy as np
+import time
+from services.rcps_engine import get_rcps_matrix
+from services.reference_catalog import get_reference_catalog
+from services.analytics_context import memoized
+
+logger = logging.getLogger(__name__)
 
 
 class RegionalAnalyticsService:
@@ -72,6 +77,9 @@ class RegionalAnalyticsService:
             return 1.0
             
         return RegionalAnalyticsService.SUITABILITY_WEIGHTS.get(target_zone, {}).get(crop_name, 1.0)
+
+    @staticmethod
+    @memoized('regional.gsi')
     def calculate_gsi(governorate):
         """
         Governorate Success Index (GSI)
@@ -128,6 +136,7 @@ class RegionalAnalyticsService:
         }
     
     @staticmethod
+    @memoized('regional.pbd')
     def calculate_pbd(user_id, governorate):
         """
         Personal Benchmark Deviation (PBD) with Confidence
@@ -170,8 +179,9 @@ class RegionalAnalyticsService:
         
         user_sr = (user_successes / n_user) * 100
         
-        # Get GSI for governorate
-        gsi_data = RegionalAnalyticsService.calculate_gsi(governorate)
+        # Regional side comes from the governorate snapshot; only SR_u is live
+        from services.regional_snapshot import RegionalSnapshotService
+        gsi_data = RegionalSnapshotService.get(governorate)
         
         if not gsi_data or gsi_data['gsi'] is None:
             return {
@@ -245,126 +255,23 @@ class RegionalAnalyticsService:
         - YR = yield ratio: avg_yield / max_yield_national
         - weights = [0.4, 0.2, 0.2, 0.2]
         
-        Minimum: 3 successes AND 5 attempts
+        Minimum: 3 successes AND 3 attempts
+        Read from the shared crop × governorate matrix (see services/rcps_engine.py).
         """
-        two_years_ago = datetime.utcnow() - timedelta(days=730)
-        
-        # Get crop data for region
-        crop_stats = db.session.query(
-            func.count(Outcome.id).label('total'),
-            func.coalesce(func.sum(cast(Outcome.outcome == 'success', Integer)), 0).label('successes'),
-            func.avg(Outcome.yield_kg).label('avg_yield')
-        ).join(Decision).join(Farmer).filter(
-            Decision.crop_id == crop_id,
-            Farmer.governorate == governorate,
-            Decision.timestamp >= two_years_ago
-        ).first()
-        
-        total_attempts = crop_stats.total or 0
-        success_count = crop_stats.successes or 0
-        avg_yield = crop_stats.avg_yield or 0
-        
-        # Check minimum requirements
-        if success_count < RegionalAnalyticsService.MIN_SUCCESSES_FOR_RCPS or \
-           total_attempts < RegionalAnalyticsService.MIN_ATTEMPTS_FOR_RCPS:
-            return None
-        
-        # 1. Success Rate (SR)
-        sr = success_count / total_attempts
-        
-        # 2. Success Count normalized (SC)
-        sc = math.log10(success_count + 1)
-        
-        # 3. Consistency Ratio (CR)
-        # Get monthly success rates
-        monthly_rates = RegionalAnalyticsService._get_monthly_success_rates(
-            crop_id, governorate, two_years_ago
-        )
-        
-        if len(monthly_rates) > 1:
-            std_dev = np.std(monthly_rates)
-            # Handle potential division by zero or NaN
-            if sr > 0 and not np.isnan(std_dev):
-                cr = max(0, 1 - (std_dev / sr))
-            else:
-                cr = 0
-        else:
-            cr = 0.5  # Default if not enough monthly data
-        
-        # 4. Yield Ratio (YR)
-        # Get national max yield for this crop
-        national_max = db.session.query(
-            func.max(Outcome.yield_kg)
-        ).join(Decision).filter(
-            Decision.crop_id == crop_id,
-            Outcome.yield_kg != None
-        ).scalar()
-        
-        national_max_yield = float(national_max) if national_max else 1.0
-        yr = avg_yield / national_max_yield if national_max_yield > 0 else 0
-        
-        # Calculate RCPS with weights
-        weights = [0.4, 0.2, 0.2, 0.2]
-        rcps = weights[0]*sr + weights[1]*sc + weights[2]*cr + weights[3]*yr
-        
-        # Ensure result is JSON serializable (not a numpy type)
-        return {
-            'rcps': round(float(rcps), 3),
-            'success_rate': round(float(sr * 100), 1),
-            'sample_size': int(total_attempts),
-            'successes': int(success_count),
-            'consistency': round(float(cr), 2),
-            'avg_yield': round(float(avg_yield), 1) if avg_yield else None
-        }
-    
-    @staticmethod
-    def _get_monthly_success_rates(crop_id, governorate, since_date):
-        """Helper: Get monthly success rates for consistency calculation"""
-        monthly_data = db.session.query(
-            func.strftime('%Y-%m', Decision.timestamp).label('month'),
-            func.count(Outcome.id).label('total'),
-            func.coalesce(func.sum(cast(Outcome.outcome == 'success', Integer)), 0).label('successes')
-        ).join(Outcome).join(Farmer).filter(
-            Decision.crop_id == crop_id,
-            Farmer.governorate == governorate,
-            Decision.timestamp >= since_date
-        ).group_by('month').all()
-        
-        rates = []
-        for month, total, successes in monthly_data:
-            if total > 0:
-                rates.append(successes / total)
-        
-        return rates
+        return get_rcps_matrix().cell(crop_id, governorate)
     
     @staticmethod
+    @memoized('regional.top_crops')
     def get_top_crops_for_region(governorate, limit=5):
         """
         Get top performing crops in a region based on RCPS
         
         Returns list of crops sorted by RCPS score
         """
-        crops = Crop.query.all()
-        crop_scores = []
-        
-        for crop in crops:
-            rcps_data = RegionalAnalyticsService.calculate_rcps(crop.id, governorate)
-            
-            if rcps_data:
-                crop_scores.append({
-                    'crop_id': crop.id,
-                    'crop_name': crop.name,
-                    'rcps': rcps_data['rcps'],
-                    'success_rate': rcps_data['success_rate'],
-                    'sample_size': rcps_data['sample_size']
-                })
-        
-        # Sort by RCPS score
-        crop_scores.sort(key=lambda x: x['rcps'], reverse=True)
-        
-        return crop_scores[:limit]
+        return get_rcps_matrix().top_crops(governorate, limit)
     
     @staticmethod
+    @memoized('regional.rrap')
     def calculate_regional_risk_adjusted_performance(governorate):
         """
         Regional Risk-Adjusted Performance (RRAP)
@@ -466,7 +373,7 @@ class RegionalAnalyticsService:
         }
         
         if crop_id:
-            crop = Crop.query.get(crop_id)
+            crop = get_reference_catalog().crop(crop_id)
             if crop and crop.name in baselines:
                 return baselines[crop.name]
         
@@ -484,7 +391,7 @@ class RegionalAnalyticsService:
         cat_map = {'Artichoke': 'high', 'Tomato': 'medium', 'Olive': 'low'}
         
         if crop_id:
-            crop = Crop.query.get(crop_id)
+            crop = get_reference_catalog().crop(crop_id)
             if crop:
                 cat = cat_map.get(crop.name, 'medium')
                 return risk_defaults[cat]
@@ -515,42 +422,96 @@ class RegionalAnalyticsService:
             return -0.05 if crop_name == 'Artichoke' else 0.0
         return 0.05 # General spring/autumn boost
 
+    DEFAULT_LOSS_PER_FAILURE = 200.0
+
     @staticmethod
-    def refresh_benchmarks():
-        """Recalculate and update the RegionalBenchmarks table from raw data"""
-        all_regions = db.session.query(Farmer.governorate).distinct().all()
-        all_crops = Crop.query.all()
-        
-        for (gov,) in all_regions:
-            if not gov: continue
-            for crop in all_crops:
-                stats = db.session.query(
-                    func.count(Outcome.id).label('total'),
-                    func.sum(case((Outcome.outcome == 'success', 1), else_=0)).label('successes'),
-                ).join(Decision).join(Farmer).filter(
-                    Farmer.governorate == gov,
-                    Decision.crop_id == crop.id
-                ).first()
-                
-                if stats and stats.total > 0:
-                    sr = (stats.successes / stats.total) if stats.total > 0 else 0
-                    
-                    # Calculate avg loss from failed outcomes (revenue_tnd is used as a negative proxy here if 0)
-                    loss_stats = db.session.query(func.avg(Outcome.revenue_tnd)).join(Decision).join(Farmer).filter(
-                        Farmer.governorate == gov,
-                        Decision.crop_id == crop.id,
-                        Outcome.outcome == 'failure'
-                    ).scalar()
-                    
-                    bench = RegionalBenchmarks.query.filter_by(governorate=gov, crop_id=crop.id).first()
-                    if not bench:
-                        bench = RegionalBenchmarks(governorate=gov, crop_id=crop.id)
-                        db.session.add(bench)
-                    
-                    bench.avg_success_rate = sr
-                    bench.avg_failure_rate = 1.0 - sr
-                    bench.avg_loss_per_failure = abs(loss_stats) if loss_stats and loss_stats != 0 else 200.0
-                    bench.sample_size = stats.total
-                    bench.last_updated = datetime.utcnow()
-        
+    def refresh_benchmarks(incremental=False):
+        """
+        Recalculate the RegionalBenchmarks table from raw data.
+
+        One grouped aggregation over (governorate, crop) feeds a bulk upsert.
+        With `incremental=True` only pairs with outcomes recorded or edited
+        since the last refresh are recomputed (deleted outcomes are picked up
+        by the next full refresh).
+
+        Returns: {'pairs': upserted rows, 'incremental': bool, 'duration_ms': float}
+        """
+        start = time.time()
+        refreshed_at = datetime.utcnow()
+
+        query = db.session.query(
+            Farmer.governorate,
+            Decision.crop_id,
+            func.count(Outcome.id),
+            func.coalesce(func.sum(case((Outcome.outcome == 'success', 1), else_=0)), 0),
+            # Avg revenue of failed outcomes (used as the loss proxy)
+            func.avg(case((Outcome.outcome == 'failure', Outcome.revenue_tnd), else_=None))
+        ).join(Decision, Outcome.decision_id == Decision.id)\
+         .join(Farmer, Farmer.id == Decision.farmer_id)\
+         .filter(Farmer.governorate != None, Farmer.governorate != '')
+
+        since = None
+        if incremental:
+            since = db.session.query(func.max(RegionalBenchmarks.last_updated)).scalar()
+        if since is not None:
+            changed = db.session.query(Farmer.governorate, Decision.crop_id)\
+                .join(Decision, Decision.farmer_id == Farmer.id)\
+                .join(Outcome, Outcome.decision_id == Decision.id)\
+                .filter(Outcome.updated_at >= since).distinct().all()
+            if not changed:
+                return RegionalAnalyticsService._refresh_report(0, True, start)
+            query = query.filter(tuple_(Farmer.governorate, Decision.crop_id).in_(changed))
+
+        rows = []
+        for gov, crop_id, total, successes, avg_loss in \
+                query.group_by(Farmer.governorate, Decision.crop_id).all():
+            if not total:
+                continue
+            rows.append({
+                'governorate': gov,
+                'crop_id': crop_id,
+                'avg_success_rate': int(successes) / total,
+                'avg_loss_per_failure': abs(avg_loss) if avg_loss else RegionalAnalyticsService.DEFAULT_LOSS_PER_FAILURE,
+                'sample_size': total,
+                'last_updated': refreshed_at
+            })
+
+        RegionalAnalyticsService._upsert_benchmarks(rows)
         db.session.commit()
+        return RegionalAnalyticsService._refresh_report(len(rows), since is not None, start)
+
+    @staticmethod
+    def _upsert_benchmarks(rows):
+        """INSERT ... ON CONFLICT (governorate, crop_id) DO UPDATE for the given rows"""
+        if not rows:
+            return
+        dialect = db.engine.dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            stmt = insert(RegionalBenchmarks.__table__).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['governorate', 'crop_id'],
+                set_={col: stmt.excluded[col] for col in
+                      ('avg_success_rate', 'avg_loss_per_failure', 'sample_size', 'last_updated')}
+            )
+            db.session.execute(stmt)
+            return
+
+        # Other backends: one lookup for all existing rows, then bulk writes
+        existing = {(b.governorate, b.crop_id): b.id for b in db.session.query(
+            RegionalBenchmarks.id, RegionalBenchmarks.governorate, RegionalBenchmarks.crop_id)}
+        updates = [dict(row, id=existing[(row['governorate'], row['crop_id'])])
+                   for row in rows if (row['governorate'], row['crop_id']) in existing]
+        inserts = [row for row in rows if (row['governorate'], row['crop_id']) not in existing]
+        db.session.bulk_update_mappings(RegionalBenchmarks, updates)
+        db.session.bulk_insert_mappings(RegionalBenchmarks, inserts)
+
+    @staticmethod
+    def _refresh_report(pairs, incremental, start):
+        duration_ms = round((time.time() - start) * 1000, 1)
+        mode = 'incremental' if incremental else 'full'
+        logger.info(f"Regional benchmarks {mode} refresh: {pairs} pairs in {duration_ms}ms")
+        return {'pairs': pairs, 'incremental': incremental, 'duration_ms': duration_ms}
@@ -0,0 +1,197 @@
+"""
+Governorate analytics snapshots
+Regional metrics (GSI, RCPS ranking, RRAP, OGA) are the same for every farmer of a
+governorate, so they are computed periodically, persisted, and held in memory.
+"""
+import logging
+import math
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, case, or_
+from models.base import db
+from models.decision import Decision, Outcome
+from models.user import Farmer
+from models.analytics import GovernorateSnapshot
+from services.rcps_engine import RCPSMatrix
+from services.cache_service import invalidate_on_commit
+
+logger = logging.getLogger(__name__)
+
+
+class RegionalSnapshotService:
+    """Build, persist and serve GovernorateSnapshot rows"""
+
+    TOP_CROPS_LIMIT = 5
+    OGA_CROPS_LIMIT = 10
+
+    @staticmethod
+    def _gsi_by_governorate(governorate=None):
+        """
+        Governorate Success Index for all (or one) governorates in one grouped query.
+        Same rules as RegionalAnalyticsService.calculate_gsi.
+        """
+        from services.regional_analytics import RegionalAnalyticsService
+
+        one_year_ago = datetime.utcnow() - timedelta(days=365)
+        query = db.session.query(
+            Farmer.governorate,
+            Decision.farmer_id,
+            func.count(Outcome.id),
+            func.coalesce(func.sum(case((Outcome.outcome == 'success', 1), else_=0)), 0)
+        ).join(Outcome, Outcome.decision_id == Decision.id)\
+         .join(Farmer, Farmer.id == Decision.farmer_id)\
+         .filter(Decision.timestamp >= one_year_ago)
+        if governorate is not None:
+            query = query.filter(Farmer.governorate == governorate)
+        rows = query.group_by(Farmer.governorate, Decision.farmer_id).all()
+
+        sums = {}
+        for gov, _, total, successes in rows:
+            # Minimum decision requirement
+            if total < RegionalAnalyticsService.MIN_DECISIONS_FOR_GSI:
+                continue
+            sr = (successes / total) * 100
+            # Experience weight: sqrt(min(decisions, 50))
+            weight = math.sqrt(min(total, 50))
+            weighted_sum, weight_sum, count = sums.get(gov, (0.0, 0.0, 0))
+            sums[gov] = (weighted_sum + weight * sr, weight_sum + weight, count + 1)
+
+        return {
+            gov: {'gsi': round(weighted_sum / weight_sum, 1), 'farmer_count': count}
+            for gov, (weighted_sum, weight_sum, count) in sums.items() if weight_sum > 0
+        }
+
+    @staticmethod
+    def _risk_by_governorate(governorate=None):
+        """(total_decisions, risk_events) of the last year per governorate"""
+        one_year_ago = datetime.utcnow() - timedelta(days=365)
+        risky = or_(
+            Decision.weather_risks.like('%frost_risk%'),
+            Decision.weather_risks.like('%heat_wave%'),
+            Decision.weather_risks.like('%drought%'),
+            Decision.recommendation == 'NOT_RECOMMENDED'
+        )
+        query = db.session.query(
+            Farmer.governorate,
+            func.count(Decision.id),
+            func.coalesce(func.sum(case((risky, 1), else_=0)), 0)
+        ).join(Farmer, Farmer.id == Decision.farmer_id)\
+         .filter(Decision.timestamp >= one_year_ago)
+        if governorate is not None:
+            query = query.filter(Farmer.governorate == governorate)
+        return {gov: (int(total), int(events)) for gov, total, events in query.group_by(Farmer.governorate).all()}
+
+    @staticmethod
+    def _build(governorate, gsi_data, risk_data, matrix):
+        """Snapshot values for one governorate"""
+        gsi = gsi_data.get(governorate)
+        total_decisions, risk_events = risk_data.get(governorate, (0, 0))
+
+        rrap = None
+        risk_factor = None
+        if total_decisions:
+            risk_factor = risk_events / total_decisions
+            if gsi:
+                rrap = {
+                    'rrap': round(gsi['gsi'] * (1 - risk_factor), 1),
+                    'gsi': gsi['gsi'],
+                    'risk_factor': round(risk_factor, 3),
+                    'risk_events': risk_events,
+                    'total_decisions': total_decisions
+                }
+
+        ranked = matrix.top_crops(governorate, limit=RegionalSnapshotService.OGA_CROPS_LIMIT)
+        scores = [c['rcps'] for c in ranked]
+        oga = round(max(scores) - (sum(scores) / len(scores)), 3) if scores else 0
+
+        return {
+            'gsi': gsi['gsi'] if gsi else None,
+            'farmer_count': gsi['farmer_count'] if gsi else 0,
+            'top_crops': ranked[:RegionalSnapshotService.TOP_CROPS_LIMIT],
+            'rrap': rrap,
+            'risk_factor': round(risk_factor, 3) if risk_factor is not None else None,
+            'oga': oga
+        }
+
+    @staticmethod
+    def _save(governorate, values, refreshed_at):
+        snapshot = GovernorateSnapshot.query.filter_by(governorate=governorate).first()
+        if snapshot is None:
+            snapshot = GovernorateSnapshot(governorate=governorate)
+            db.session.add(snapshot)
+        for key, value in values.items():
+            setattr(snapshot, key, value)
+        snapshot.refreshed_at = refreshed_at
+        return snapshot
+
+    @staticmethod
+    def refresh_all():
+        """Recompute and persist snapshots for every governorate with farmers or decisions"""
+        start = time.time()
+        governorates = {g for (g,) in db.session.query(Farmer.governorate).distinct()} | \
+                       {g for (g,) in db.session.query(Decision.governorate).distinct()}
+        governorates.discard(None)
+
+        gsi_data = RegionalSnapshotService._gsi_by_governorate()
+        risk_data = RegionalSnapshotService._risk_by_governorate()
+        matrix = RCPSMatrix.build()
+        current_app.extensions['rcps_matrix'] = matrix
+
+        refreshed_at = datetime.utcnow()
+        memory = {}
+        for gov in sorted(governorates):
+            snapshot = RegionalSnapshotService._save(
+                gov, RegionalSnapshotService._build(gov, gsi_data, risk_data, matrix), refreshed_at
+            )
+            memory[gov] = snapshot.to_dict()
+        invalidate_on_commit('regional')
+        db.session.commit()
+
+        RegionalSnapshotService._memory().update({gov: (time.time(), data) for gov, data in memory.items()})
+        logger.info(f"Refreshed {len(memory)} governorate snapshots in {(time.time() - start) * 1000:.0f}ms")
+        return len(memory)
+
+    @staticmethod
+    def refresh(governorate):
+        """Recompute and persist one governorate's snapshot"""
+        values = RegionalSnapshotService._build(
+            governorate,
+            RegionalSnapshotService._gsi_by_governorate(governorate),
+            RegionalSnapshotService._risk_by_governorate(governorate),
+            RCPSMatrix.build(governorate)
+        )
+        data = RegionalSnapshotService._save(governorate, values, datetime.utcnow()).to_dict()
+        invalidate_on_commit('regional')
+        db.session.commit()
+        RegionalSnapshotService._memory()[governorate] = (time.time(), data)
+        return data
+
+    @staticmethod
+    def _memory():
+        return current_app.extensions.setdefault('governorate_snapshots', {})
+
+    @staticmethod
+    def get(governorate):
+        """
+        Snapshot dict for a governorate.
+
+        Served from process memory, re-read from the table every
+        SNAPSHOT_MEMORY_TTL seconds (another worker may have refreshed it),
+        and recomputed only when missing or older than SNAPSHOT_MAX_AGE.
+        """
+        config = current_app.config
+        memory = RegionalSnapshotService._memory()
+
+        cached = memory.get(governorate)
+        if cached and time.time() - cached[0] < config.get('SNAPSHOT_MEMORY_TTL', 60):
+            return cached[1]
+
+        snapshot = GovernorateSnapshot.query.filter_by(governorate=governorate).first()
+        max_age = timedelta(seconds=config.get('SNAPSHOT_MAX_AGE', 3600))
+        if snapshot is None or datetime.utcnow() - snapshot.refreshed_at > max_age:
+            return RegionalSnapshotService.refresh(governorate)
+
+        data = snapshot.to_dict()
+        memory[governorate] = (time.time(), data)
+        return data
@@ -0,0 +1,262 @@
+"""
+Farmer Rollup Service
+Keeps the per-farmer FarmerAnalytics counters in step with decisions and outcomes.
+"""
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import func, case, inspect
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+from models.base import db
+from models.decision import Decision, Outcome
+from models.analytics import FarmerAnalytics
+from services.cache_service import invalidate_on_commit
+
+logger = logging.getLogger(__name__)
+
+
+class FarmerRollupService:
+    """
+    Counters are updated with `col = col + delta` inside the caller's transaction,
+    so they commit (or roll back) together with the write that changed them.
+    Every tracked write also bumps `data_version`, which keys cached analytics.
+    """
+
+    COUNTERS = (
+        'total_decisions', 'plant_now_count', 'wait_count',
+        'followed_count', 'ignored_count', 'wait_followed_count',
+        'total_outcomes', 'success_count', 'failure_count',
+        'followed_outcomes', 'followed_successes',
+        'ignored_outcomes', 'ignored_successes',
+        'failure_loss_tnd'
+    )
+
+    @staticmethod
+    def _failure_loss(decision, outcome):
+        """Capital lost on a failed outcome: the recorded loss, else the decision's cost basis"""
+        if outcome.outcome != 'failure':
+            return 0.0
+        if outcome.net_profit_loss is not None:
+            return max(0.0, -outcome.net_profit_loss)
+        return decision.cost_basis_tnd or 0.0
+
+    @staticmethod
+    def contribution(decision, outcomes=None):
+        """Counter values contributed by one decision and all of its outcomes"""
+        state = inspect(decision)
+        if state.transient or state.pending or state.deleted:
+            return {}
+
+        followed = decision.advice_status == 'followed'
+        ignored = decision.advice_status == 'ignored'
+        counts = {
+            'total_decisions': 1,
+            'plant_now_count': int(decision.recommendation == 'PLANT_NOW'),
+            'wait_count': int(decision.recommendation == 'WAIT'),
+            'followed_count': int(followed),
+            'ignored_count': int(ignored),
+            'wait_followed_count': int(followed and decision.recommendation == 'WAIT'),
+        }
+
+        if outcomes is None:
+            outcomes = decision.outcomes.all()
+        for o in outcomes:
+            success = o.outcome == 'success'
+            counts['total_outcomes'] = counts.get('total_outcomes', 0) + 1
+            counts['success_count'] = counts.get('success_count', 0) + int(success)
+            counts['failure_count'] = counts.get('failure_count', 0) + int(o.outcome == 'failure')
+            counts['failure_loss_tnd'] = counts.get('failure_loss_tnd', 0.0) + FarmerRollupService._failure_loss(decision, o)
+            if followed:
+                counts['followed_outcomes'] = counts.get('followed_outcomes', 0) + 1
+                counts['followed_successes'] = counts.get('followed_successes', 0) + int(success)
+            elif ignored:
+                counts['ignored_outcomes'] = counts.get('ignored_outcomes', 0) + 1
+                counts['ignored_successes'] = counts.get('ignored_successes', 0) + int(success)
+        return counts
+
+    @staticmethod
+    @contextmanager
+    def track(decision):
+        """
+        Apply the counter change caused by the block's writes to `decision`.
+
+        Usage:
+            with FarmerRollupService.track(decision):
+                decision.advice_status = 'followed'
+            db.session.commit()
+        """
+        farmer_id = decision.farmer_id
+        before = FarmerRollupService.contribution(decision)
+        yield
+        db.session.flush()
+        after = FarmerRollupService.contribution(decision)
+        FarmerRollupService.apply(farmer_id, before, after)
+
+    @staticmethod
+    def record_new_decisions(farmer_id, decisions):
+        """Count freshly flushed decisions (which have no outcomes yet) in one update"""
+        total = {}
+        for decision in decisions:
+            for key, value in FarmerRollupService.contribution(decision, outcomes=[]).items():
+                total[key] = total.get(key, 0) + value
+        FarmerRollupService.apply(farmer_id, {}, total)
+
+    @staticmethod
+    def apply(farmer_id, before, after):
+        """Add (after - before) to the farmer's counters without committing"""
+        deltas = {
+            key: after.get(key, 0) - before.get(key, 0)
+            for key in FarmerRollupService.COUNTERS
+        }
+        deltas = {key: value for key, value in deltas.items() if value}
+        invalidate_on_commit(f'farmer:{farmer_id}')
+
+        exists = db.session.query(FarmerAnalytics.id).filter_by(farmer_id=farmer_id).scalar()
+        if exists is None:
+            # Raw tables already reflect the flushed change
+            FarmerRollupService.rebuild(farmer_id)
+            return
+
+        values = {
+            getattr(FarmerAnalytics, key): getattr(FarmerAnalytics, key) + value
+            for key, value in deltas.items()
+        }
+        if deltas:
+            # SET expressions see the old row, so derive the rate from old + delta
+            outcomes = FarmerAnalytics.total_outcomes + deltas.get('total_outcomes', 0)
+            successes = FarmerAnalytics.success_count + deltas.get('success_count', 0)
+            values[FarmerAnalytics.success_rate] = case(
+                (outcomes > 0, successes * 100.0 / outcomes),
+                else_=0.0
+            )
+        # Bumped even when no counter moved (e.g. an edited yield or revenue)
+        values[FarmerAnalytics.data_version] = FarmerAnalytics.data_version + 1
+        values[FarmerAnalytics.last_updated] = datetime.utcnow()
+
+        db.session.query(FarmerAnalytics).filter_by(farmer_id=farmer_id)\
+            .update(values, synchronize_session=False)
+
+    @staticmethod
+    def get(farmer_id):
+        """
+        Return the farmer's rollup row, building it from raw tables if missing.
+        A missing row is built and committed in a session of its own, so the
+        caller's pending writes are neither committed nor rolled back.
+        """
+        with db.session.no_autoflush:
+            row = FarmerAnalytics.query.filter_by(farmer_id=farmer_id).first()
+        if row is None:
+            session = Session(bind=db.engine)
+            try:
+                FarmerRollupService.rebuild(farmer_id, session=session)
+                session.commit()
+            except IntegrityError:
+                # Another request built it first
+                session.rollback()
+            except OperationalError as e:
+                # SQLite: the caller's own flushed writes hold the lock
+                session.rollback()
+                logger.warning(f"Building rollups for farmer {farmer_id} in the caller's transaction ({e})")
+                return FarmerRollupService.rebuild(farmer_id)
+            finally:
+                session.close()
+            row = FarmerAnalytics.query.filter_by(farmer_id=farmer_id).one()
+        return row
+
+    @staticmethod
+    def data_version(farmer_id):
+        """Current data version of a farmer (changes on every tracked write)"""
+        version = db.session.query(FarmerAnalytics.data_version)\
+            .filter_by(farmer_id=farmer_id).scalar()
+        if version is None:
+            version = FarmerRollupService.get(farmer_id).data_version
+        return version
+
+    @staticmethod
+    def _insert_row(farmer_id, session):
+        """Insert an empty rollup row unless a concurrent request already has (no commit)"""
+        table = FarmerAnalytics.__table__
+        dialect = db.engine.dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            session.execute(
+                insert(table).values(farmer_id=farmer_id, data_version=0)
+                .on_conflict_do_nothing(index_elements=['farmer_id'])
+            )
+        else:
+            session.add(FarmerAnalytics(farmer_id=farmer_id, data_version=0))
+            session.flush()
+
+    @staticmethod
+    def rebuild(farmer_id, session=None):
+        """Recompute one farmer's counters from decisions and outcomes (no commit)"""
+        session = session or db.session
+        followed = Decision.advice_status == 'followed'
+        ignored = Decision.advice_status == 'ignored'
+
+        def count_if(condition):
+            return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+        d = session.query(
+            func.count(Decision.id),
+            count_if(Decision.recommendation == 'PLANT_NOW'),
+            count_if(Decision.recommendation == 'WAIT'),
+            count_if(followed),
+            count_if(ignored),
+            count_if(followed & (Decision.recommendation == 'WAIT'))
+        ).filter(Decision.farmer_id == farmer_id).one()
+
+        success = Outcome.outcome == 'success'
+        loss = case(
+            (Outcome.outcome != 'failure', 0.0),
+            (Outcome.net_profit_loss.isnot(None),
+             case((Outcome.net_profit_loss < 0, -Outcome.net_profit_loss), else_=0.0)),
+            else_=func.coalesce(Decision.cost_basis_tnd, 0.0)
+        )
+        o = session.query(
+            func.count(Outcome.id),
+            count_if(success),
+            count_if(Outcome.outcome == 'failure'),
+            count_if(followed),
+            count_if(followed & success),
+            count_if(ignored),
+            count_if(ignored & success),
+            func.coalesce(func.sum(loss), 0.0)
+        ).join(Decision, Decision.id == Outcome.decision_id)\
+         .filter(Decision.farmer_id == farmer_id).one()
+
+        row = session.query(FarmerAnalytics).filter_by(farmer_id=farmer_id).first()
+        if row is None:
+            FarmerRollupService._insert_row(farmer_id, session)
+            row = session.query(FarmerAnalytics).filter_by(farmer_id=farmer_id).one()
+        else:
+            # A repair may change what cached responses showed
+            invalidate_on_commit(f'farmer:{farmer_id}', session=session)
+
+        (row.total_decisions, row.plant_now_count, row.wait_count,
+         row.followed_count, row.ignored_count, row.wait_followed_count) = [int(v) for v in d]
+        (row.total_outcomes, row.success_count, row.failure_count,
+         row.followed_outcomes, row.followed_successes,
+         row.ignored_outcomes, row.ignored_successes) = [int(v) for v in o[:7]]
+        row.failure_loss_tnd = float(o[7])
+        row.success_rate = (row.success_count / row.total_outcomes * 100) if row.total_outcomes else 0.0
+        row.data_version = (row.data_version or 0) + 1
+        row.last_updated = datetime.utcnow()
+        session.flush()
+        return row
+
+    @staticmethod
+    def rebuild_all():
+        """Repair every farmer's counters. Returns the number of farmers rebuilt."""
+        from models.user import Farmer
+        farmer_ids = [fid for (fid,) in db.session.query(Farmer.id).all()]
+        for farmer_id in farmer_ids:
+            FarmerRollupService.rebuild(farmer_id)
+        db.session.commit()
+        logger.info(f"Rebuilt analytics rollups for {len(farmer_ids)} farmers")
+        return len(farmer_ids)
+
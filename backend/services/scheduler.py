@@ -0,0 +1,139 @@
+"""
+Lightweight in-process scheduler for periodic maintenance jobs
+Every gunicorn worker runs the scheduler, so each run first takes the job's
+lease in the JOB_LEASE_PATH shared store for one interval: only one worker
+runs a given job per interval, the others skip it.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from services.cache_service import get_shared_store
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicJob:
+    """Runs `func` inside an app context every `interval` seconds on a daemon thread"""
+
+    def __init__(self, app, name, interval, func, run_immediately=True):
+        self.app = app
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.run_immediately = run_immediately
+        self.last_run = None
+        self.last_duration = None
+        self.last_error = None
+        self.skipped = 0
+        self.lease_holder = None  # default: this host and process
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._loop, name=f"job-{self.name}", daemon=True)
+        self._thread.start()
+        logger.info(f"Started periodic job '{self.name}' every {self.interval}s")
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self):
+        """Run the job now (in this thread)"""
+        start = time.time()
+        try:
+            with self.app.app_context():
+                self.func()
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f"Periodic job '{self.name}' failed: {e}", exc_info=True)
+        finally:
+            self.last_run = time.time()
+            self.last_duration = self.last_run - start
+
+    def run_if_leased(self):
+        """Run the job unless another worker holds its lease for this interval"""
+        if not self._claim():
+            self.skipped += 1
+            logger.debug(f"Periodic job '{self.name}' is running in another worker; skipped")
+            return False
+        self.run_once()
+        return True
+
+    def _claim(self):
+        path = self.app.config.get('JOB_LEASE_PATH')
+        if not path:
+            return True
+        holder = self.lease_holder or f"{socket.gethostname()}-{os.getpid()}"  # per forked worker
+        try:
+            return get_shared_store(path).acquire_lease(f"job:{self.name}", holder, self.interval)
+        except Exception as e:
+            # Jobs are idempotent refreshes: running twice beats not running
+            logger.warning(f"Job lease store unavailable ({e}); running '{self.name}' anyway")
+            return True
+
+    def _loop(self):
+        if not self.run_immediately:
+            self._stop.wait(self.interval)
+        while not self._stop.is_set():
+            self.run_if_leased()
+            self._stop.wait(self.interval)
+
+    def status(self):
+        return {
+            'interval_seconds': self.interval,
+            'last_run': self.last_run,
+            'last_duration_ms': round(self.last_duration * 1000, 1) if self.last_duration is not None else None,
+            'last_error': self.last_error,
+            'skipped': self.skipped
+        }
+
+
+def register_job(app, name, interval, func, **kwargs):
+    """Create a job and start it when background jobs are enabled for the app"""
+    jobs = app.extensions.setdefault('periodic_jobs', {})
+    job = PeriodicJob(app, name, interval, func, **kwargs)
+    jobs[name] = job
+    if app.config.get('ENABLE_BACKGROUND_JOBS') and not app.config.get('TESTING'):
+        job.start()
+    return job
+
+
+def init_scheduler(app):
+    """Register the app's periodic jobs"""
+    from services.cache_service import get_response_cache
+    from services.regional_analytics import RegionalAnalyticsService
+    from services.regional_snapshot import RegionalSnapshotService
+    from services.weather_service import WeatherService
+
+    register_job(
+        app, 'governorate_snapshots',
+        app.config.get('SNAPSHOT_REFRESH_INTERVAL', 900),
+        RegionalSnapshotService.refresh_all
+    )
+
+    register_job(
+        app, 'regional_benchmarks',
+        app.config.get('BENCHMARK_REFRESH_INTERVAL', 3600),
+        lambda: RegionalAnalyticsService.refresh_benchmarks(incremental=True)
+    )
+
+    # Keep every governorate's forecast warm (interval below FORECAST_CACHE_TTL)
+    prefetch_days = tuple(int(d) for d in str(app.config.get('FORECAST_PREFETCH_DAYS', '1,7')).split(',') if d.strip())
+    register_job(
+        app, 'forecast_prefetch',
+        app.config.get('FORECAST_PREFETCH_INTERVAL', 3600),
+        lambda: WeatherService().prefetch_all(prefetch_days)
+    )
+
+    # Shared response-cache entries are overwritten, never deleted: drop day-old ones
+    register_job(
+        app, 'response_cache_purge',
+        app.config.get('RESPONSE_CACHE_PURGE_INTERVAL', 3600),
+        lambda: get_response_cache().purge_expired(24 * 3600),
+        run_immediately=False
+    )
@@ -0,0 +1,96 @@
+"""
+Concurrent execution of independent pipeline stages
+Each stage runs on a bounded per-app thread pool inside its own app context,
+so it gets its own scoped session (and pooled connection).
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from models.base import db
+from services.analytics_context import current_context, use_context
+
+logger = logging.getLogger(__name__)
+
+
+class StageTimings:
+    """Per-stage call count, total and max duration (ms), shown in /api/health/detailed"""
+
+    _lock = threading.Lock()
+    _stages = {}
+
+    @classmethod
+    def record(cls, name, duration_ms):
+        with cls._lock:
+            entry = cls._stages.setdefault(name, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            entry['count'] += 1
+            entry['total_ms'] += duration_ms
+            entry['max_ms'] = max(entry['max_ms'], duration_ms)
+
+    @classmethod
+    def snapshot(cls):
+        with cls._lock:
+            return {
+                name: {
+                    'count': entry['count'],
+                    'avg_ms': round(entry['total_ms'] / entry['count'], 2),
+                    'max_ms': round(entry['max_ms'], 2)
+                }
+                for name, entry in cls._stages.items()
+            }
+
+
+def _shares_one_connection():
+    """In-memory SQLite uses a single shared connection, which threads must not use at once"""
+    url = db.engine.url
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def _get_executor(workers):
+    executor = current_app.extensions.get('stage_executor')
+    if executor is None:
+        executor = current_app.extensions.setdefault(
+            'stage_executor', ThreadPoolExecutor(max_workers=workers, thread_name_prefix='stage')
+        )
+    return executor
+
+
+def _timed(name, func, prefix):
+    start = time.perf_counter()
+    try:
+        return func()
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        StageTimings.record(f"{prefix}.{name}", duration_ms)
+
+
+def run_stages(stages, prefix='stages'):
+    """
+    Run independent zero-argument callables and return {name: result}.
+
+    Stages run concurrently on up to DASHBOARD_STAGE_WORKERS threads, or one
+    after another when that is 1 or the database is in-memory SQLite. The
+    first stage exception is re-raised in the caller. Stages must only read
+    shared inputs.
+    """
+    workers = current_app.config.get('DASHBOARD_STAGE_WORKERS', 4)
+    start = time.perf_counter()
+    if workers <= 1 or len(stages) <= 1 or _shares_one_connection():
+        results = {name: _timed(name, func, prefix) for name, func in stages.items()}
+    else:
+        app = current_app._get_current_object()
+        memo = current_context()
+
+        def run_in_context(name, func):
+            # A fresh app context gives the thread its own scoped session,
+            # removed again on teardown; the request's analytics memo is shared
+            with app.app_context():
+                use_context(memo)
+                return _timed(name, func, prefix)
+
+        executor = _get_executor(workers)
+        futures = {name: executor.submit(run_in_context, name, func) for name, func in stages.items()}
+        results = {name: future.result() for name, future in futures.items()}
+    logger.debug(f"Ran {len(stages)} {prefix} stages in {(time.perf_counter() - start) * 1000:.1f}ms")
+    return results
@@ -4,8 +4,8 @@ Implements Tier-based data sufficiency logic and transparency metadata.
 """
 import logging
 from datetime import datetime, timedelta
-from models.base import db
 from models.decision import Decision, Outcome
+from services.rollup_service import FarmerRollupService
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +21,7 @@ class TruthfulAnalyticsEngine:
     @staticmethod
     def get_user_tier_status(farmer_id):
         """Calculate current tier and progress to next"""
-        outcome_count = Outcome.query.join(Decision).filter(Decision.farmer_id == farmer_id).count()
+        outcome_count = FarmerRollupService.get(farmer_id).total_outcomes
         
         current_tier = 'T1_NOVICE'
         next_tier = 'T2_LEARNER'
@@ -53,24 +53,12 @@ class TruthfulAnalyticsEngine:
     @staticmethod
     def get_milestones(farmer_id):
         """Check unlock status for various features"""
-        status = TruthfulAnalyticsEngine.get_user_tier_status(farmer_id)
-        outcomes = status['outcomes_recorded']
+        rollup = FarmerRollupService.get(farmer_id)
+        outcomes = rollup.total_outcomes
         
         # Check specific counts for AES
-        stats = db.session.query(
-            db.func.count(Decision.id)
-        ).join(Outcome).filter(
-            Decision.farmer_id == farmer_id
-        ).group_by(Decision.advice_status).all()
-        # This is a bit complex, let's just do direct counts
-        n_followed = Outcome.query.join(Decision).filter(
-            Decision.farmer_id == farmer_id, 
-            Decision.advice_status == 'followed'
-        ).count()
-        n_ignored = Outcome.query.join(Decision).filter(
-            Decision.farmer_id == farmer_id, 
-            Decision.advice_status == 'ignored'
-        ).count()
+        n_followed = rollup.followed_outcomes
+        n_ignored = rollup.ignored_outcomes
 
         return {
             'basic_success_rate': {
@@ -2,12 +2,48 @@
 Weather service for fetching and processing weather data
 """
 import logging
-import requests
+import os
+import threading
+import time
+import uuid
+import numpy as np
 from datetime import datetime, timedelta
 from typing import List, Dict
+from flask import current_app, has_app_context
+from services.cache_service import get_shared_store
+from services.http_client import get_http_client, CircuitOpenError
 
 logger = logging.getLogger(__name__)
 
+# Identifies this process when claiming a forecast refresh lease
+_LEASE_HOLDER = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+DEFAULT_FORECAST_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'forecast_cache.sqlite')
+DEFAULT_WEATHER_API_URL = "https://api.open-meteo.com/v1/forecast"
+DAILY_FIELDS = 'temperature_2m_max,temperature_2m_min,precipitation_sum,relative_humidity_2m_mean,wind_speed_10m_max,weathercode'
+
+
+class ForecastCacheStats:
+    """Per-process forecast cache counters"""
+    
+    _lock = threading.Lock()
+    counters = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'refresh_failures': 0, 'fallbacks': 0,
+                'prefetched': 0}
+    
+    @classmethod
+    def incr(cls, name):
+        with cls._lock:
+            cls.counters[name] += 1
+    
+    @classmethod
+    def snapshot(cls):
+        with cls._lock:
+            stats = dict(cls.counters)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        served = stats['hits'] + stats['stale_hits']
+        stats['hit_rate'] = round(served / lookups * 100, 1) if lookups else 0.0
+        return stats
+
 class WeatherService:
     """
     Weather Service using Open-Meteo API (Free, no key required)
@@ -44,6 +80,10 @@ class WeatherService:
         'Sfax': {'lat': 34.7406, 'lon': 10.7603}
     }
     
+    # Last forecast fetched per (governorate, days) in this process, used when
+    # the API is unavailable and the shared cache has nothing
+    _last_good = {}
+    
     # Tunisia-specific weather adjustments based on local climatology
     # These corrections account for microclimates not captured by 25km grid forecasts
     WEATHER_ADJUSTMENTS = {
@@ -82,39 +122,266 @@ class WeatherService:
     def get_forecast(self, governorate: str, days: int = 7) -> List[Dict]:
         """
         Get 7-day weather forecast from Open-Meteo with Tunisia-specific adjustments
+        
+        Forecasts are cached per (governorate, days) in a SQLite file shared by
+        all workers. Fresh entries are served directly; stale ones are served
+        while a single worker refreshes them in the background. When the API
+        fails (or its circuit is open) the last good forecast is served, even
+        past FORECAST_CACHE_MAX_STALE, before falling back to mock data.
         """
+        gov_key = self._governorate_key(governorate)
+        key = f"forecast:{gov_key}:{days}"
+        settings = self._cache_settings()
+        if not settings['path']:
+            return self._fetch_or_fallback(key, gov_key, days)
+        
+        store = get_shared_store(settings['path'])
+        
         try:
-            # Default to Tunis if governorate not found or empty
-            if not governorate:
-                governorate = 'Tunis'
-                
-            # Normalize key lookup
-            gov_key = next((k for k in self.GOVERNORATE_COORDS if k.lower() == governorate.lower()), 'Tunis')
-            coords = self.GOVERNORATE_COORDS.get(gov_key, self.GOVERNORATE_COORDS['Tunis'])
-            
-            logger.info(f"Fetching weather for {governorate} -> {gov_key} ({coords})")
-            
-            url = "https://api.open-meteo.com/v1/forecast"
-            params = {
-                'latitude': coords['lat'],
-                'longitude': coords['lon'],
-                'daily': 'temperature_2m_max,temperature_2m_min,precipitation_sum,relative_humidity_2m_mean,wind_speed_10m_max,weathercode',
-                'timezone': 'auto',
-                'forecast_days': days
-            }
-            
-            # Use requests without extensive retries for speed in this context, logic handles failures
-            response = requests.get(url, params=params, timeout=5)
-            response.raise_for_status()
-            data = response.json()
-            
-            forecast = self._process_open_meteo_data(data, days, gov_key)
-            
+            entry = store.get(key)
+        except Exception as e:
+            logger.warning(f"Forecast cache unavailable: {e}")
+            return self._fetch_or_fallback(key, gov_key, days)
+        
+        forecast = self._serve_cached(store, entry, key, gov_key, days, settings)
+        if forecast is not None:
             return forecast
+        
+        ForecastCacheStats.incr('misses')
+        try:
+            forecast = self._fetch_forecast(gov_key, days)
+        except Exception as e:
+            return self._fallback(key, days, e, entry)
+        
+        try:
+            store.set(key, forecast)
+        except Exception as e:
+            logger.warning(f"Failed to cache forecast for {gov_key}: {e}")
+        return forecast
+
+    def warm_forecast(self, governorate: str, days: int = 7):
+        """
+        The shared-cache forecast get_forecast would serve without calling the
+        API (fresh, or stale while it is refreshed in the background), else None.
+        Cheap enough to read on the request thread before budgeting a fetch.
+        """
+        gov_key = self._governorate_key(governorate)
+        key = f"forecast:{gov_key}:{days}"
+        settings = self._cache_settings()
+        if not settings['path']:
+            return None
+        store = get_shared_store(settings['path'])
+        try:
+            entry = store.get(key)
+        except Exception as e:
+            logger.warning(f"Forecast cache unavailable: {e}")
+            return None
+        return self._serve_cached(store, entry, key, gov_key, days, settings)
+
+    def _serve_cached(self, store, entry, key: str, gov_key: str, days: int, settings: Dict):
+        """The cached forecast if fresh or still servable stale, else None"""
+        if entry is None:
+            return None
+        forecast, stored_at = entry
+        age = time.time() - stored_at
+        if age < settings['ttl']:
+            ForecastCacheStats.incr('hits')
+            return forecast
+        if age < settings['max_stale']:
+            ForecastCacheStats.incr('stale_hits')
+            self._refresh_in_background(store, key, gov_key, days, settings['lease'])
+            return forecast
+        return None
+
+    def cached_forecast(self, governorate: str, days: int = 7):
+        """
+        Last good forecast without calling the API (any age), or None.
+        Used when the advice budget leaves no time to wait for get_forecast.
+        """
+        key = f"forecast:{self._governorate_key(governorate)}:{days}"
+        path = self._cache_settings()['path']
+        if path:
+            try:
+                entry = get_shared_store(path).get(key)
+                if entry is not None:
+                    return entry[0]
+            except Exception as e:
+                logger.warning(f"Forecast cache unavailable: {e}")
+        return self._last_good.get(key)
+
+    def _governorate_key(self, governorate: str) -> str:
+        """Canonical GOVERNORATE_COORDS key (Tunis when unknown or empty)"""
+        # Default to Tunis if governorate not found or empty
+        if not governorate:
+            governorate = 'Tunis'
+            
+        # Normalize key lookup
+        return next((k for k in self.GOVERNORATE_COORDS if k.lower() == governorate.lower()), 'Tunis')
+
+    def _cache_settings(self) -> Dict:
+        """Forecast cache settings from app config, or the environment outside an app"""
+        source = current_app.config if has_app_context() else os.environ
+        return {
+            'path': source.get('FORECAST_CACHE_PATH', DEFAULT_FORECAST_CACHE_PATH),
+            'ttl': float(source.get('FORECAST_CACHE_TTL', 3 * 3600)),
+            'max_stale': float(source.get('FORECAST_CACHE_MAX_STALE', 24 * 3600)),
+            'lease': float(source.get('FORECAST_REFRESH_LEASE', 30)),
+        }
 
+    def _api_url(self) -> str:
+        source = current_app.config if has_app_context() else os.environ
+        return source.get('WEATHER_API_URL', DEFAULT_WEATHER_API_URL)
+
+    def _refresh_in_background(self, store, key: str, gov_key: str, days: int, lease_seconds: float):
+        """Refresh a stale entry on a daemon thread if no other worker is already doing it"""
+        try:
+            if not store.acquire_lease(key, _LEASE_HOLDER, lease_seconds):
+                return None
         except Exception as e:
-            logger.error(f"Weather API failed: {e}. Falling back to mock data.")
-            return self._generate_mock_forecast(days)
+            logger.warning(f"Could not acquire forecast refresh lease: {e}")
+            return None
+        
+        app = current_app._get_current_object() if has_app_context() else None
+        
+        def refresh():
+            try:
+                if app is not None:
+                    # Same settings and HTTP client (circuit breaker) as the request
+                    with app.app_context():
+                        forecast = self._fetch_forecast(gov_key, days)
+                else:
+                    forecast = self._fetch_forecast(gov_key, days)
+                store.set(key, forecast)
+                ForecastCacheStats.incr('refreshes')
+            except Exception as e:
+                ForecastCacheStats.incr('refresh_failures')
+                logger.warning(f"Background forecast refresh failed for {gov_key}: {e}")
+            finally:
+                store.release_lease(key, _LEASE_HOLDER)
+        
+        thread = threading.Thread(target=refresh, name=f"forecast-refresh-{gov_key}", daemon=True)
+        thread.start()
+        return thread
+
+    def _fetch_or_fallback(self, key: str, gov_key: str, days: int) -> List[Dict]:
+        """Uncached fetch with the last-good / mock fallback"""
+        try:
+            return self._fetch_forecast(gov_key, days)
+        except Exception as e:
+            return self._fallback(key, days, e)
+
+    def _fallback(self, key: str, days: int, error: Exception, entry=None) -> List[Dict]:
+        """Forecast to serve when the API failed: the last good one, else mock data"""
+        if isinstance(error, CircuitOpenError):
+            logger.info(f"{error}: serving the last good forecast for {key}")
+        else:
+            logger.error(f"Weather API failed: {error}. Falling back to the last good forecast.")
+        last_good = entry[0] if entry is not None else self._last_good.get(key)
+        if last_good is not None:
+            ForecastCacheStats.incr('fallbacks')
+            return last_good
+        logger.warning(f"No previous forecast for {key}; using mock data")
+        return self._generate_mock_forecast(days)
+
+    def _fetch_forecast(self, gov_key: str, days: int) -> List[Dict]:
+        """Fetch and adjust a forecast from Open-Meteo (raises on failure)"""
+        coords = self.GOVERNORATE_COORDS.get(gov_key, self.GOVERNORATE_COORDS['Tunis'])
+        
+        logger.info(f"Fetching weather for {gov_key} ({coords})")
+        
+        params = {
+            'latitude': coords['lat'],
+            'longitude': coords['lon'],
+            'daily': DAILY_FIELDS,
+            'timezone': 'auto',
+            'forecast_days': days
+        }
+        
+        # Pooled session with bounded retries; raises CircuitOpenError while Open-Meteo is skipped
+        data = get_http_client('open-meteo').get_json(self._api_url(), params=params)
+        
+        forecast = self._process_open_meteo_data(data, days, gov_key)
+        WeatherService._last_good[f"forecast:{gov_key}:{days}"] = forecast
+        return forecast
+
+    def prefetch_all(self, days_options=(7,)) -> int:
+        """
+        Fetch every governorate in one multi-location Open-Meteo request and
+        publish the adjusted forecasts to the shared forecast cache, so request
+        lookups are warm reads. One fetch of the longest horizon fills an entry
+        per governorate and per entry of `days_options`. Returns the number of
+        entries published.
+        """
+        path = self._cache_settings()['path']
+        horizon = max(days_options)
+        governorates = list(self.GOVERNORATE_COORDS)
+        # Aliases share coordinates: request each location once
+        locations = list(dict.fromkeys((c['lat'], c['lon']) for c in self.GOVERNORATE_COORDS.values()))
+        params = {
+            'latitude': ','.join(str(lat) for lat, _ in locations),
+            'longitude': ','.join(str(lon) for _, lon in locations),
+            'daily': DAILY_FIELDS,
+            'timezone': 'auto',
+            'forecast_days': horizon
+        }
+        logger.info(f"Prefetching {horizon}-day forecasts for {len(governorates)} governorates")
+        data = get_http_client('open-meteo').get_json(self._api_url(), params=params)
+        if isinstance(data, dict):
+            data = [data]  # a single location comes back unwrapped
+        by_location = dict(zip(locations, data))
+        responses = [
+            by_location[(c['lat'], c['lon'])] for c in self.GOVERNORATE_COORDS.values()
+        ]
+        
+        forecasts = self._process_open_meteo_batch(responses, horizon, governorates)
+        entries = {}
+        for gov_key, forecast in zip(governorates, forecasts):
+            for days in days_options:
+                key = f"forecast:{gov_key}:{days}"
+                entries[key] = forecast[:days]
+                WeatherService._last_good[key] = entries[key]
+        if path:
+            get_shared_store(path).set_many(entries)
+        for _ in entries:
+            ForecastCacheStats.incr('prefetched')
+        return len(entries)
+
+    def _process_open_meteo_batch(self, responses: List[dict], days: int, governorates: List[str]) -> List[List[Dict]]:
+        """
+        _process_open_meteo_data for many governorates: the regional
+        adjustments are applied to (governorates x days) arrays in one pass
+        """
+        dailies = [r.get('daily', {}) for r in responses]
+        length = min(min(len(d.get('time', [])) for d in dailies), days)
+        
+        def column(name, default):
+            return np.array([d.get(name, [default] * length)[:length] for d in dailies], dtype=float)
+        
+        adjustments = [self.WEATHER_ADJUSTMENTS.get(g, {}) for g in governorates]
+        temp_adj = np.array([a.get('temp', 0) for a in adjustments], dtype=float)[:, None]
+        humidity_adj = np.array([a.get('humidity', 0) for a in adjustments], dtype=float)[:, None]
+        wind_adj = np.array([a.get('wind', 0) for a in adjustments], dtype=float)[:, None]
+        
+        t_max = (column('temperature_2m_max', 0) + temp_adj).tolist()
+        t_min = (column('temperature_2m_min', 0) + temp_adj).tolist()
+        rain = column('precipitation_sum', 0).tolist()
+        humidity = np.clip(column('relative_humidity_2m_mean', 60) + humidity_adj, 0, 100).tolist()
+        wind = (column('wind_speed_10m_max', 0) + wind_adj).tolist()
+        
+        forecasts = []
+        for g, daily in enumerate(dailies):
+            codes = daily.get('weathercode', [0] * length)
+            forecasts.append([{
+                'date': daily['time'][i],
+                'temp_max': round(t_max[g][i], 1),
+                'temp_min': round(t_min[g][i], 1),
+                'temp_avg': round((t_max[g][i] + t_min[g][i]) / 2, 1),
+                'rainfall': round(rain[g][i], 1),
+                'humidity': round(humidity[g][i], 0),
+                'wind': round(wind[g][i], 1),
+                'condition': self._map_weather_code(codes[i])
+            } for i in range(length)])
+        return forecasts
 
     def _process_open_meteo_data(self, data: dict, days: int, governorate: str) -> List[Dict]:
         """Convert Open-Meteo response to our internal format with regional adjustments"""
@@ -181,4 +448,9 @@ class WeatherService:
                 'wind': 10,
                 'condition': 'Sunny'
             })
-        return forecast
\ No newline at end of file
+        return forecast
+
+
+def warm_forecast(governorate: str, days: int = 7):
+    """WeatherService.warm_forecast: a servable shared-cache forecast, or None (never calls the API)"""
+    return WeatherService().warm_forecast(governorate, days)
@@ -1,12 +1,23 @@
 import pytest
+import json
 import os
 import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 # Add backend to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
 from app import create_app
 from models.base import db
+from models.user import Farmer
+from models.crop import Crop, AgrarianPeriod, CropPeriodRule
+from models.decision import Decision, Outcome
+from services.ai_service import AIService
 
 @pytest.fixture
 def app():
@@ -38,4 +49,160 @@ def client(app):
 @pytest.fixture
 def runner(app):
     """A test runner for the app's Click commands."""
-    return app.test_cli_runner()
\ No newline at end of file
+    return app.test_cli_runner()
+
+@pytest.fixture
+def seed_history():
+    """Create one farmer with `decision_count` decisions, every other one with an outcome."""
+    def seed(decision_count):
+        farmer = Farmer(phone_number=f"216{decision_count:08d}", password_hash="pw",
+                        governorate="Sfax", farm_type="irrigated")
+        crops = [Crop(name=f"Crop {decision_count}-{i}", category="vegetable", min_temp=5, max_temp=35)
+                 for i in range(3)]
+        db.session.add(farmer)
+        db.session.add_all(crops)
+        db.session.flush()
+
+        start = datetime(2025, 1, 1)
+        for i in range(decision_count):
+            decision = Decision(
+                farmer_id=farmer.id,
+                crop_id=crops[i % 3].id,
+                governorate="Sfax",
+                recommendation="WAIT" if i % 4 == 0 else "PLANT_NOW",
+                confidence="HIGH",
+                timestamp=start + timedelta(days=10 * i),
+                weather_temp_avg=18.0 + i,
+                advice_status="followed" if i % 3 else "ignored"
+            )
+            db.session.add(decision)
+            db.session.flush()
+            if i % 2 == 0:
+                db.session.add(Outcome(
+                    decision_id=decision.id,
+                    outcome="success" if i % 4 == 0 else "failure",
+                    recorded_at=decision.timestamp + timedelta(days=5)
+                ))
+        db.session.commit()
+        return farmer.id
+    return seed
+
+@pytest.fixture
+def count_queries():
+    """Run a callable and return the number of SQL statements it executed."""
+    def count(fn):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            fn()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+        return len(statements)
+    return count
+
+@pytest.fixture
+def forecast():
+    """A four-day forecast from today: mild, frosty and rainy, hot, warm."""
+    today = date.today()
+    temps = [(12, 24, 0), (1, 20, 25), (8, 39, 0), (15, 30, 5)]
+    return [{
+        'date': (today + timedelta(days=i)).strftime('%Y-%m-%d'),
+        'temp_min': t_min, 'temp_max': t_max, 'temp_avg': (t_min + t_max) / 2,
+        'rainfall': rain, 'humidity': 60
+    } for i, (t_min, t_max, rain) in enumerate(temps)]
+
+@pytest.fixture
+def batch_setup(app):
+    """A farmer with an optimal, an unruled and a forbidden crop in a year-round period."""
+    farmer = Farmer(phone_number="21655000000", password_hash="pw",
+                    governorate="Sfax", farm_type="irrigated")
+    crops = [
+        Crop(name="Batch Hardy", category="field", min_temp=0, max_temp=45),
+        Crop(name="Batch Tender", category="vegetable", min_temp=10, max_temp=30),
+        Crop(name="Batch Forbidden", category="vegetable", min_temp=0, max_temp=45),
+    ]
+    db.session.add(farmer)
+    db.session.add_all(crops)
+    AgrarianPeriod.query.delete()
+    db.session.add(AgrarianPeriod(id='PB', name='Batch Period', start_month=1, start_day=1,
+                                  end_month=12, end_day=31, risk_level='low'))
+    db.session.flush()
+    db.session.add_all([
+        CropPeriodRule(crop_id=crops[0].id, period_id='PB', suitability='optimal'),
+        CropPeriodRule(crop_id=crops[2].id, period_id='PB', suitability='forbidden'),
+    ])
+    db.session.commit()
+    headers = {'Authorization': f"Bearer {create_access_token(identity=str(farmer.id))}"}
+    return farmer.id, [c.id for c in crops], headers
+
+class _FakeCompletions:
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        message = SimpleNamespace(content=f"Explanation {self.calls}: wait for the rain to pass before planting.")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+@pytest.fixture
+def ai_service():
+    """An enabled AIService on a fake OpenAI client, with the fake's completions (counts calls)."""
+    service = AIService()
+    completions = _FakeCompletions()
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    service.enabled = True
+    return service, completions
+
+@pytest.fixture
+def explanation_data():
+    """Explanation inputs of a WAIT decision with two risks."""
+    return {'crop_name': 'Wheat', 'action': 'WAIT', 'wait_days': 7,
+            'period_name': 'Autumn', 'risks': ['heavy_rain', 'frost_risk']}
+
+OPEN_METEO_FORECAST = {'daily': {
+    'time': ['2026-01-01', '2026-01-02'],
+    'temperature_2m_max': [25.0, 26.0],
+    'temperature_2m_min': [10.0, 11.0],
+    'precipitation_sum': [0.0, 1.0],
+    'relative_humidity_2m_mean': [60, 60],
+    'wind_speed_10m_max': [5.0, 5.0],
+    'weathercode': [0, 61],
+}}
+
+class _StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.requests += 1
+        server.connections.add(self.client_address)
+        server.queries.append(self.path)
+        status = server.statuses.pop(0) if server.statuses else 200
+        body = json.dumps(server.payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub():
+    """Local Open-Meteo stand-in; queue statuses in `stub.statuses` (default 200), body in `stub.payload`"""
+    _StubHandler.protocol_version = 'HTTP/1.1'  # keep-alive
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+    server.requests = 0
+    server.statuses = []
+    server.payload = OPEN_METEO_FORECAST
+    server.queries = []
+    server.connections = set()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/v1/forecast"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
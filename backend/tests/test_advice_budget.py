@@ -0,0 +1,153 @@
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from models.explanation import ExplanationCache
+from services.advice_budget import AdviceBudget, StageDeadlineExceeded
+from services.ai_service import get_explanation_store
+from services.cache_service import SharedStore
+from services.http_client import Bulkhead, BulkheadFullError, get_bulkhead
+
+
+@pytest.fixture
+def release():
+    """Unblocks slow fakes at the end of the test"""
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def test_stage_deadline(app, release):
+    budget = AdviceBudget(total_ms=1000, stage_caps_ms={'weather': 20})
+
+    assert budget.run('weather', lambda: 'fast') == 'fast'
+    with pytest.raises(StageDeadlineExceeded):
+        budget.run('weather', lambda: release.wait(5))
+
+    spent = AdviceBudget(total_ms=0)
+    with pytest.raises(StageDeadlineExceeded):
+        spent.run('ai', lambda: 'never')
+
+
+def test_full_pool_degrades_without_queueing(app, release):
+    budget = AdviceBudget(total_ms=5000, stage_caps_ms={'weather': 20}, workers=1)
+    with pytest.raises(StageDeadlineExceeded):
+        budget.run('weather', lambda: release.wait(5))
+
+    calls = []
+    start = time.perf_counter()
+    with pytest.raises(StageDeadlineExceeded, match='not started'):
+        budget.run('ai', lambda: calls.append(1))
+    assert time.perf_counter() - start < 0.01
+    assert calls == []
+    assert app.extensions['bulkheads']['advice-pool'].status()['rejected'] == 1
+
+    release.set()
+    deadline = time.time() + 5
+    while app.extensions['bulkheads']['advice-pool'].status()['in_use'] and time.time() < deadline:
+        time.sleep(0.01)
+    assert budget.run('ai', lambda: 'ran') == 'ran'
+
+
+def test_warm_forecast_is_read_on_the_request_thread(app, client, batch_setup, tmp_path, forecast):
+    _, crop_ids, headers = batch_setup
+    app.config['FORECAST_CACHE_PATH'] = str(tmp_path / 'forecast.sqlite')
+    SharedStore(app.config['FORECAST_CACHE_PATH']).set('forecast:Sfax:7', forecast)
+
+    with patch('api.decisions.engine.weather_service.get_forecast') as get_forecast:
+        data = client.post('/api/decisions/get-advice', headers=headers,
+                           json={'crop_id': crop_ids[0]}).get_json()['data']
+
+    get_forecast.assert_not_called()
+    assert data['weather_forecast'] == forecast
+    assert data['degraded'] is False
+    assert 'advice-pool' not in app.extensions.get('bulkheads', {})
+
+
+def test_advice_reports_stage_timings(client, batch_setup, forecast):
+    _, crop_ids, headers = batch_setup
+
+    with patch('api.decisions.engine.weather_service.get_forecast', return_value=forecast):
+        data = client.post('/api/decisions/get-advice', headers=headers,
+                           json={'crop_id': crop_ids[0]}).get_json()['data']
+
+    assert data['degraded'] is False
+    assert set(data['budget']['stages_ms']) == {'period', 'rules', 'weather', 'decision', 'ai', 'record'}
+    assert data['budget']['degraded'] == []
+
+
+def test_slow_weather_serves_cached_forecast(app, client, batch_setup, release, forecast):
+    _, crop_ids, headers = batch_setup
+    app.config['ADVICE_WEATHER_TIMEOUT_MS'] = 50
+    cached = forecast
+
+    def slow_forecast(*args, **kwargs):
+        release.wait(5)
+        return []
+
+    start = time.perf_counter()
+    with patch('api.decisions.engine.weather_service.get_forecast', side_effect=slow_forecast), \
+            patch('api.decisions.engine.weather_service.cached_forecast', return_value=cached):
+        response = client.post('/api/decisions/get-advice', headers=headers, json={'crop_id': crop_ids[0]})
+
+    assert response.status_code == 200
+    assert time.perf_counter() - start < 2
+    data = response.get_json()['data']
+    assert data['weather_forecast'] == cached
+    assert data['degraded'] is True
+    assert data['budget']['degraded'][0]['stage'] == 'weather'
+    assert data['budget']['degraded'][0]['fallback'] == 'cached_forecast'
+    assert data['id'] is not None
+
+
+def test_slow_ai_serves_template(app, client, batch_setup, release, forecast, ai_service):
+    from api.decisions import engine
+
+    _, crop_ids, headers = batch_setup
+    app.config['ADVICE_AI_TIMEOUT_MS'] = 50
+    original = engine.ai_service
+    engine.ai_service, completions = ai_service
+    create = completions.create
+    completions.create = lambda **kwargs: release.wait(5) and create(**kwargs)
+    try:
+        with patch('api.decisions.engine.weather_service.get_forecast', return_value=forecast):
+            data = client.post('/api/decisions/get-advice', headers=headers,
+                               json={'crop_id': crop_ids[0]}).get_json()['data']
+    finally:
+        engine.ai_service = original
+
+    assert data['degraded'] is True
+    assert data['budget']['degraded'] == [
+        {'stage': 'ai', 'reason': data['budget']['degraded'][0]['reason'], 'fallback': 'template_explanation'}
+    ]
+    assert not data['explanation'].startswith('Explanation')
+
+    # The overrunning call completes in the background and fills the explanation store
+    release.set()
+    deadline = time.time() + 5
+    while not get_explanation_store().stats()['size'] and time.time() < deadline:
+        time.sleep(0.01)
+    assert ExplanationCache.query.count() == 1
+
+
+def test_bulkhead_limits_concurrent_calls():
+    bulkhead = Bulkhead('test', limit=1, wait=0.01)
+    with bulkhead.slot():
+        with pytest.raises(BulkheadFullError):
+            with bulkhead.slot():
+                pass
+    with bulkhead.slot():
+        pass
+    assert bulkhead.status() == {'limit': 1, 'in_use': 0, 'calls': 2, 'rejected': 1, 'peak': 1}
+
+
+def test_full_ai_bulkhead_falls_back_to_template(app, ai_service, explanation_data):
+    app.config.update(BULKHEAD_OPENAI=1, BULKHEAD_WAIT=0.01)
+    service, completions = ai_service
+
+    with get_bulkhead('openai').slot():
+        explanation = service.generate_explanation(explanation_data)
+
+    assert completions.calls == 0
+    assert explanation == service._generate_template_explanation(explanation_data)
+    assert get_bulkhead('openai').status()['rejected'] == 1
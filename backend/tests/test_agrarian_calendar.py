@@ -0,0 +1,121 @@
+import numpy as np
+from datetime import date, datetime, timedelta
+from models.base import db
+from models.crop import AgrarianPeriod
+from services.agrarian_calendar import (
+    AgrarianCalendar, FALLBACK_PERIODS, OTHER_PERIOD, period_matches, get_agrarian_calendar
+)
+
+
+def _scan(periods, date):
+    """Reference: first matching period by linear scan"""
+    for idx, period in enumerate(periods):
+        if period_matches(period, date.month, date.day):
+            return idx
+    return len(periods)
+
+
+def test_lookup_matches_linear_scan_for_every_day():
+    calendar = AgrarianCalendar(FALLBACK_PERIODS)
+    start = datetime(2024, 1, 1)  # leap year covers 29 Feb
+    dates = [start + timedelta(days=i) for i in range(366 * 2)]
+
+    indices = calendar.period_indices(np.array(dates, dtype='datetime64[us]'))
+    assert indices.tolist() == [_scan(FALLBACK_PERIODS, d) for d in dates]
+
+
+def test_bucket_counts():
+    calendar = AgrarianCalendar(FALLBACK_PERIODS)
+    dates = np.array([datetime(2025, 1, 1), datetime(2025, 12, 30),
+                      datetime(2025, 1, 20), datetime(2025, 10, 15)], dtype='datetime64[us]')
+    totals, successes = calendar.bucket(dates, np.array([1, 0, 1, 1]))
+
+    assert totals[0] == 2 and successes[0] == 1  # El Llayeli El Bidh wraps the year
+    assert totals[1] == 1
+    assert calendar.names[-1] == OTHER_PERIOD and totals[-1] == 1
+
+
+def test_calendar_recompiled_after_period_change(app):
+    AgrarianPeriod.query.delete()
+    db.session.commit()
+    assert get_agrarian_calendar().names[:-1] == [p['name'] for p in FALLBACK_PERIODS]
+
+    db.session.add(AgrarianPeriod(id='PX', name='Whole Year', start_month=1, start_day=1,
+                                  end_month=12, end_day=31, risk_level='low'))
+    db.session.commit()
+    calendar = get_agrarian_calendar()
+    assert calendar.names == ['Whole Year', OTHER_PERIOD]
+    assert (calendar.lookup == 0).all()
+
+
+def test_agrarian_trends_use_calendar(app, seed_history):
+    from services.analytics_service import AnalyticsService
+
+    farmer_id = seed_history(8)
+    trends = AnalyticsService().calculate_performance_trends(farmer_id, 'agrarian')
+    assert all(point['period'] in get_agrarian_calendar().names for point in trends['data'])
+
+
+def test_transitions_wrap_the_year():
+    periods = [
+        {'id': 'W', 'name': 'Winter', 'start_month': 12, 'start_day': 1, 'end_month': 2, 'end_day': 28},
+        {'id': 'S', 'name': 'Summer', 'start_month': 3, 'start_day': 1, 'end_month': 11, 'end_day': 30},
+    ]
+    calendar = AgrarianCalendar(periods)
+
+    assert calendar.period_index_on(date(2025, 1, 10)) == 0
+    # 29 Feb is a Winter slot in leap years only
+    assert calendar.next_transition(date(2025, 2, 20)) == (1, 9)
+    assert calendar.next_transition(date(2024, 2, 20)) == (1, 10)
+    # Summer -> Winter, and Winter continues across New Year
+    assert calendar.next_transition(date(2025, 11, 25)) == (0, 6)
+    assert calendar.next_transition(date(2025, 12, 31)) == (1, 60)
+    assert calendar.next_transition(date(2027, 12, 31)) == (1, 61)
+
+
+def test_regional_adjustments():
+    periods = [
+        {'id': 'A', 'name': 'A', 'start_month': 1, 'start_day': 1, 'end_month': 6, 'end_day': 30},
+        {'id': 'B', 'name': 'B', 'start_month': 7, 'start_day': 1, 'end_month': 12, 'end_day': 31},
+    ]
+    national = AgrarianCalendar(periods)
+    regional = AgrarianCalendar(periods, {0: (0, 10, 1.5)})
+
+    assert national.period_index_on(date(2025, 7, 5)) == 1
+    assert regional.period_index_on(date(2025, 7, 5)) == 0
+    assert regional.risk_multiplier_on(date(2025, 7, 5)) == 1.5
+    assert regional.risk_multiplier_on(date(2025, 8, 1)) == 1.0
+    assert regional.next_transition(date(2025, 7, 5)) == (1, 6)
+
+
+def test_upcoming_transition_endpoint(client, app):
+    from models.crop import Crop, CropPeriodRule
+    from models.regional import PeriodRegionAdjustment
+
+    today = date.today()
+    AgrarianPeriod.query.delete()
+    start = today + timedelta(days=3)
+    db.session.add_all([
+        AgrarianPeriod(id='PN', name='Next', start_month=start.month, start_day=start.day,
+                       end_month=start.month, end_day=start.day, risk_level='high',
+                       temperature_profile='hot'),
+    ])
+    crop = Crop(name="Transition Crop", category="vegetable", min_temp=5, max_temp=35)
+    db.session.add(crop)
+    db.session.flush()
+    db.session.add(CropPeriodRule(crop_id=crop.id, period_id='PN', suitability='optimal'))
+    db.session.commit()
+
+    data = client.get('/api/crops/periods/upcoming-transition').get_json()
+    assert data['currentPeriod'] is None
+    assert data['daysRemaining'] == 3
+    assert data['nextPeriod']['id'] == 'PN'
+    assert data['nextPeriod']['bestCrops'] == ['Transition Crop']
+    assert 'Temperature: hot' in data['nextPeriod']['characteristics']
+
+    # A regional delay pushes the start back for that governorate only
+    db.session.add(PeriodRegionAdjustment(period_id='PN', governorate='Kebili',
+                                          start_adjustment_days=2, end_adjustment_days=2))
+    db.session.commit()
+    data = client.get('/api/crops/periods/upcoming-transition?governorate=Kebili').get_json()
+    assert data['daysRemaining'] == 5
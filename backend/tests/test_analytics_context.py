@@ -0,0 +1,53 @@
+from flask_jwt_extended import create_access_token
+from services.analytics_context import AnalyticsContext, analytics_context, memoized, current_context
+from services.analytics_service import AnalyticsService
+
+calls = []
+
+
+@memoized('test.square')
+def _square(x, history=None):
+    calls.append(x)
+    return x * x
+
+
+def test_memoized_once_per_context(app):
+    calls.clear()
+    with analytics_context() as context:
+        assert _square(3, history=object()) == 9
+        assert _square(3) == 9
+        assert _square(4) == 16
+    assert calls == [3, 4]
+    assert context.stats() == {'computed': 2, 'reused': 1}
+
+    # No active context: computed every time
+    _square(3)
+    assert calls == [3, 4, 3]
+    assert current_context() is None
+
+
+def test_dashboard_reuses_metrics_within_a_request(app, seed_history):
+    farmer_id = seed_history(12)
+    service = AnalyticsService()
+
+    with analytics_context() as context:
+        data = service._build_dashboard_data(farmer_id)
+
+    assert 'error' not in data
+    computed = {key[0] for key in context._values}
+    assert {'farmer_profile', 'crop_accuracy', 'sweet_spot'} <= computed
+    # crop accuracy, sweet spot and the farmer lookups are each reused
+    assert context.reused >= 5
+
+
+def test_each_request_gets_a_fresh_context(app, client, seed_history):
+    farmer_id = seed_history(6)
+    headers = {'Authorization': f"Bearer {create_access_token(identity=str(farmer_id))}"}
+    before = AnalyticsContext.snapshot()
+
+    response = client.get('/api/analytics/advanced', headers=headers)
+
+    # DOI and OGA share one top-crops computation
+    assert response.status_code == 200
+    assert AnalyticsContext.snapshot()['reused'] > before['reused']
+    assert current_context() is None
@@ -0,0 +1,87 @@
+import threading
+import pytest
+from unittest.mock import patch
+from models.decision import Decision
+from services.explanation_worker import init_explanation_worker
+
+
+@pytest.fixture
+def async_engine(app, ai_service):
+    from api.decisions import engine
+
+    app.config['ASYNC_EXPLANATIONS'] = True
+    worker = init_explanation_worker(app)
+    original = engine.ai_service
+    engine.ai_service, completions = ai_service
+    yield worker, completions
+    worker.stop()
+    engine.ai_service = original
+    app.extensions.pop('explanation_worker', None)
+
+
+def test_advice_returns_template_then_ai_explanation(client, batch_setup, async_engine, forecast):
+    _, crop_ids, headers = batch_setup
+    worker, completions = async_engine
+    release = threading.Event()
+    create = completions.create
+    completions.create = lambda **kwargs: release.wait(5) and create(**kwargs)
+
+    with patch('api.decisions.engine.weather_service.get_forecast', return_value=forecast):
+        response = client.post('/api/decisions/get-advice', headers=headers, json={'crop_id': crop_ids[0]})
+
+    # Answered while the model call is still blocked
+    data = response.get_json()['data']
+    assert data['explanation_status'] == 'pending'
+    assert data['explanation']
+    polled = client.get(f"/api/decisions/{data['id']}/explanation", headers=headers).get_json()
+    assert polled['explanation_status'] == 'pending'
+    assert polled['explanation'] == data['explanation']
+
+    release.set()
+    assert worker.wait_for(data['id'], timeout=5)
+
+    polled = client.get(f"/api/decisions/{data['id']}/explanation", headers=headers).get_json()
+    assert polled['explanation_status'] == 'ready'
+    assert polled['explanation'].startswith('Explanation 1:')
+    assert worker.status()['ready'] == 1
+
+    # The same inputs are now served from the explanation store without deferring
+    with patch('api.decisions.engine.weather_service.get_forecast', return_value=forecast):
+        again = client.post('/api/decisions/get-advice', headers=headers, json={'crop_id': crop_ids[0]})
+    again = again.get_json()['data']
+    assert again['explanation_status'] == 'ready'
+    assert again['explanation'] == polled['explanation']
+    assert completions.calls == 1
+
+
+def test_failed_generation_keeps_the_template(client, batch_setup, async_engine, forecast):
+    _, crop_ids, headers = batch_setup
+    worker, completions = async_engine
+    completions.create = None  # the model call raises
+
+    with patch('api.decisions.engine.weather_service.get_forecast', return_value=forecast):
+        data = client.post('/api/decisions/get-advice', headers=headers,
+                           json={'crop_id': crop_ids[0]}).get_json()['data']
+    assert worker.wait_for(data['id'], timeout=5)
+
+    decision = Decision.query.get(data['id'])
+    assert decision.explanation_status == 'failed'
+    assert decision.explanation == data['explanation']
+
+
+def test_batch_defers_only_the_top_crop(client, batch_setup, async_engine, forecast):
+    _, crop_ids, headers = batch_setup
+    worker, _ = async_engine
+
+    with patch('api.decisions.engine.weather_service.get_forecast', return_value=forecast):
+        results = client.post('/api/decisions/get-advice/batch', headers=headers,
+                              json={'crop_ids': crop_ids}).get_json()['data']['results']
+
+    assert [r['explanation_status'] for r in results] == ['pending', None, None]
+    assert worker.flush(timeout=5)
+    assert Decision.query.get(results[0]['id']).explanation_status == 'ready'
+
+
+def test_unknown_decision_explanation(client, batch_setup):
+    _, _, headers = batch_setup
+    assert client.get('/api/decisions/999999/explanation', headers=headers).status_code == 404
@@ -0,0 +1,57 @@
+from datetime import date
+from unittest.mock import patch
+from models.crop import Crop
+from models.decision import Decision
+from models.analytics import FarmerAnalytics
+from services.decision_engine import DecisionEngine
+
+
+def _reference_risks(forecast, crop):
+    """The original per-day loop"""
+    risks = []
+    for day in forecast:
+        if day['temp_min'] < crop.min_temp:
+            risks.append(('low_temperature', 'high' if day['temp_min'] < crop.min_temp - 3 else 'medium', day['date']))
+        if day['temp_max'] > crop.max_temp:
+            risks.append(('high_temperature', 'high' if day['temp_max'] > crop.max_temp + 5 else 'medium', day['date']))
+        if day['temp_min'] < 2:
+            risks.append(('frost_risk', 'high', day['date']))
+        if day['rainfall'] > 20:
+            risks.append(('heavy_rain', 'medium', day['date']))
+    return risks
+
+
+def test_batch_analysis_matches_per_crop_loop(batch_setup, forecast):
+    _, crop_ids, _ = batch_setup
+    crops = [Crop.query.get(cid) for cid in crop_ids]
+
+    analyses = DecisionEngine()._analyze_weather_batch(forecast, crops)
+    for crop, analysis in zip(crops, analyses):
+        assert [(r['type'], r['severity'], r['date']) for r in analysis['risks']] == \
+            _reference_risks(forecast, crop)
+        assert analysis['risk_count'] == len(analysis['risks'])
+
+
+def test_batch_endpoint_ranks_and_records(client, batch_setup, forecast):
+    farmer_id, crop_ids, headers = batch_setup
+
+    with patch('api.decisions.engine.weather_service.get_forecast', return_value=forecast) as get_forecast:
+        response = client.post('/api/decisions/get-advice/batch', headers=headers,
+                               json={'crop_ids': crop_ids[::-1]})
+
+    assert response.status_code == 200
+    assert get_forecast.call_count == 1
+    results = response.get_json()['data']['results']
+    assert [r['rank'] for r in results] == [1, 2, 3]
+    assert results[-1]['decision']['action'] == 'NOT_RECOMMENDED'
+    assert all(r['id'] for r in results)
+
+    assert Decision.query.filter_by(farmer_id=farmer_id).count() == 3
+    assert FarmerAnalytics.query.filter_by(farmer_id=farmer_id).one().total_decisions == 3
+
+
+def test_batch_endpoint_unknown_crop(client, batch_setup):
+    _, _, headers = batch_setup
+    response = client.post('/api/decisions/get-advice/batch', headers=headers,
+                           json={'crop_ids': [999999]})
+    assert response.status_code == 404
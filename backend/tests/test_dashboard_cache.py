@@ -0,0 +1,75 @@
+import time
+import pytest
+from flask_jwt_extended import create_access_token
+from models.base import db
+from models.user import Farmer
+from models.crop import Crop
+from models.decision import Decision
+from services.cache_service import VersionedCache, get_dashboard_cache
+
+
+def test_versioned_cache_lru_and_versions():
+    cache = VersionedCache(max_entries=2)
+    cache.set('a', 1, 'A1')
+    assert cache.get('a', 1) == 'A1'
+    assert cache.get('a', 2) is None
+
+    cache.set('b', 1, 'B')
+    cache.set('c', 1, 'C')
+    assert cache.get('a', 1) is None  # evicted
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['hits'] == 1
+
+
+def test_versioned_cache_ttl():
+    cache = VersionedCache(ttl=0.05)
+    cache.set('a', 1, 'A1')
+    assert cache.get('a', 1) == 'A1'
+    time.sleep(0.06)
+    assert cache.get('a', 1) is None
+
+
+def test_dashboard_cached_until_data_changes(app, client):
+    farmer = Farmer(phone_number="21688000000", password_hash="pw",
+                    governorate="Sfax", farm_type="irrigated")
+    crop = Crop(name="Cache Wheat", category="field", min_temp=5, max_temp=35)
+    db.session.add_all([farmer, crop])
+    db.session.flush()
+    decision = Decision(farmer_id=farmer.id, crop_id=crop.id, governorate="Sfax",
+                        recommendation="PLANT_NOW", confidence="HIGH")
+    db.session.add(decision)
+    db.session.commit()
+    decision_id = decision.id
+    headers = {'Authorization': f"Bearer {create_access_token(identity=str(farmer.id))}"}
+
+    first = client.get('/api/decisions/advanced-analytics', headers=headers).get_json()
+    second = client.get('/api/decisions/advanced-analytics', headers=headers).get_json()
+    assert first == second
+    assert get_dashboard_cache().stats()['hits'] == 1
+
+    client.post('/api/decisions/record-outcome', headers=headers,
+                json={'decision_id': decision_id, 'outcome': 'success'})
+    third = client.get('/api/decisions/advanced-analytics', headers=headers).get_json()
+    assert third['outcome_count'] == first['outcome_count'] + 1
+
+    stats = get_dashboard_cache().stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 2
+
+
+def test_dashboard_follows_profile_changes(app, client):
+    farmer = Farmer(phone_number="21688000001", password_hash="pw",
+                    governorate="Sfax", farm_type="irrigated")
+    db.session.add(farmer)
+    db.session.commit()
+    headers = {'Authorization': f"Bearer {create_access_token(identity=str(farmer.id))}"}
+
+    client.get('/api/decisions/advanced-analytics', headers=headers)
+    response = client.put('/api/auth/update-profile', headers=headers, json={'governorate': 'Tunis'})
+    assert response.status_code == 200
+    client.get('/api/decisions/advanced-analytics', headers=headers)
+    client.get('/api/decisions/advanced-analytics', headers=headers)
+
+    stats = get_dashboard_cache().stats()
+    assert stats['misses'] == 2  # the governorate change is a new entry
+    assert stats['hits'] == 1
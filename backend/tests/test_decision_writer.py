@@ -0,0 +1,164 @@
+import json
+import time
+import pytest
+from models.base import db
+from models.user import Farmer
+from models.crop import Crop
+from models.decision import Decision, IdSequence
+from models.analytics import FarmerAnalytics
+from services.decision_engine import DecisionEngine
+from services.decision_writer import (DecisionWriter, IdBlockAllocator, init_decision_writer, get_decision_writer,
+                                     replay_dead_letters, wait_for_decision, _next_decision_id)
+
+
+def _record(engine, farmer_id, crop_id):
+    return engine._record_decision(
+        farmer_id, crop_id, "Sfax", {'action': 'PLANT_NOW', 'confidence': 'HIGH'},
+        "Queued", 'P1', {'avg_temp': 20, 'risks': []}
+    )
+
+
+@pytest.fixture
+def writer_setup(app):
+    app.config.update(DECISION_WRITE_BEHIND=True, DECISION_ID_BLOCK_SIZE=4)
+    writer = init_decision_writer(app)
+    farmer = Farmer(phone_number="21656000000", password_hash="pw",
+                    governorate="Sfax", farm_type="irrigated")
+    crop = Crop(name="Writer Crop", category="vegetable", min_temp=5, max_temp=35)
+    db.session.add_all([farmer, crop])
+    db.session.commit()
+    yield writer, farmer.id, crop.id
+    writer.stop()
+    app.extensions.pop('decision_writer', None)
+
+
+def test_disabled_by_default(app):
+    assert get_decision_writer() is None
+
+
+def test_queued_decision_is_written_with_reserved_id(app, writer_setup):
+    writer, farmer_id, crop_id = writer_setup
+    engine = DecisionEngine()
+
+    ids = [_record(engine, farmer_id, crop_id) for _ in range(6)]
+    assert len(set(ids)) == 6 and None not in ids
+
+    assert writer.flush()
+    db.session.expire_all()
+    assert sorted(d.id for d in Decision.query.filter_by(farmer_id=farmer_id)) == sorted(ids)
+    assert FarmerAnalytics.query.get(farmer_id).total_decisions == 6
+    assert writer.stats['written'] == 6
+
+
+def test_synchronous_inserts_use_reserved_blocks(app, writer_setup):
+    writer, farmer_id, crop_id = writer_setup
+    queued = _record(DecisionEngine(), farmer_id, crop_id)
+
+    decision = Decision(farmer_id=farmer_id, crop_id=crop_id, governorate="Sfax",
+                        recommendation="WAIT", confidence="LOW")
+    db.session.add(decision)
+    db.session.commit()
+
+    assert decision.id != queued
+    assert writer.flush()
+    assert Decision.query.filter_by(farmer_id=farmer_id).count() == 2
+
+
+def test_full_queue_falls_back_to_synchronous_write(app, writer_setup):
+    writer, farmer_id, crop_id = writer_setup
+    full = DecisionWriter(app, queue_size=1, enqueue_timeout=0.01)
+    full._ensure_started = lambda: None  # no consumer: the queue stays full
+    full._queue.put({'id': -1})
+    app.extensions['decision_writer'] = full
+
+    decision_id = _record(DecisionEngine(), farmer_id, crop_id)
+
+    assert full.stats['rejected'] == 1
+    assert Decision.query.get(decision_id) is not None
+    app.extensions['decision_writer'] = writer
+
+
+def test_stopped_writer_falls_back_to_synchronous_write(app, writer_setup):
+    writer, farmer_id, crop_id = writer_setup
+    _record(DecisionEngine(), farmer_id, crop_id)
+    writer.stop()
+
+    decision_id = _record(DecisionEngine(), farmer_id, crop_id)
+
+    assert not writer._thread.is_alive()
+    assert writer.stats['rejected'] == 1
+    assert Decision.query.get(decision_id) is not None
+    assert Decision.query.filter_by(farmer_id=farmer_id).count() == 2
+
+
+def test_failed_write_is_retried_then_dead_lettered(app, writer_setup, tmp_path):
+    writer, farmer_id, crop_id = writer_setup
+    writer.dead_letter_path = str(tmp_path / 'dead.jsonl')
+    commit = writer._commit
+    failures = []
+
+    def flaky(batch, rollups):
+        if len(failures) < 4:
+            failures.append(batch[0]['id'])
+            raise RuntimeError("database is locked")
+        commit(batch, rollups)
+    writer._commit = flaky
+
+    # First decision: batch + row attempt fail, the requeued copy fails once more, the last one succeeds
+    first = _record(DecisionEngine(), farmer_id, crop_id)
+    assert writer.flush()
+    assert writer.stats['retried'] == 2 and writer.stats['written'] == 1
+    assert Decision.query.get(first) is not None
+
+    # Second decision: never succeeds, so it ends up in the dead-letter file
+    writer._commit = lambda batch, rollups: (_ for _ in ()).throw(RuntimeError("disk full"))
+    second = _record(DecisionEngine(), farmer_id, crop_id)
+    assert writer.flush()
+    assert writer.stats['failed'] == 1
+    with open(writer.dead_letter_path) as f:
+        [record] = [json.loads(line) for line in f]
+    assert record['values']['id'] == second and record['error'] == 'disk full'
+
+    assert replay_dead_letters(writer.dead_letter_path) == (1, 0)
+    assert Decision.query.get(second).explanation == "Queued"
+    assert replay_dead_letters(writer.dead_letter_path) == (0, 0)
+
+
+def test_ids_come_from_the_sequence_without_a_writer(app):
+    farmer = Farmer(phone_number="21656000001", password_hash="pw", governorate="Sfax", farm_type="irrigated")
+    crop = Crop(name="Sequence Crop", category="vegetable", min_temp=5, max_temp=35)
+    db.session.add_all([farmer, crop])
+    db.session.commit()
+
+    decision = Decision(farmer_id=farmer.id, crop_id=crop.id, governorate="Sfax",
+                        recommendation="WAIT", confidence="LOW")
+    db.session.add(decision)
+    db.session.commit()
+
+    assert decision.id < IdSequence.query.get('decisions').next_value
+
+
+def test_reads_wait_for_ids_reserved_by_other_workers(app, writer_setup):
+    writer, farmer_id, crop_id = writer_setup
+    written = _record(DecisionEngine(), farmer_id, crop_id)
+    other_worker = IdBlockAllocator(db.engine, 'decisions', block_size=4, seed=_next_decision_id)
+    reserved = other_worker.next_id()
+
+    start = time.perf_counter()
+    wait_for_decision(written)
+    wait_for_decision(reserved + 100)  # never reserved: a plain 404
+    assert time.perf_counter() - start < 0.5
+
+    start = time.perf_counter()
+    wait_for_decision(reserved, timeout=0.2)  # reserved elsewhere, not written yet
+    assert time.perf_counter() - start >= 0.2
+
+
+def test_id_blocks_do_not_overlap(app):
+    first = IdBlockAllocator(db.engine, 'test_seq', block_size=3)
+    second = IdBlockAllocator(db.engine, 'test_seq', block_size=3)
+
+    ids = [first.next_id(), second.next_id(), first.next_id(), first.next_id(), first.next_id()]
+
+    assert ids == [1, 4, 2, 3, 7]
+    assert IdSequence.query.get('test_seq').next_value == 10
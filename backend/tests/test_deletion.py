@@ -0,0 +1,56 @@
+from flask_jwt_extended import create_access_token
+from models.base import db
+from models.user import Farmer
+from models.decision import Decision, Outcome
+from models.analytics import FarmerAnalytics, AnalyticsEvent
+from services.deletion_service import DeletionService
+from services.rollup_service import FarmerRollupService
+
+
+def _headers(farmer_id):
+    return {'Authorization': f"Bearer {create_access_token(identity=str(farmer_id))}"}
+
+
+def test_account_deletion_removes_all_farmer_data(app, client, seed_history):
+    farmer_id = seed_history(10)
+    other_id = seed_history(4)
+    FarmerRollupService.get(farmer_id)
+    db.session.add(AnalyticsEvent(farmer_id=farmer_id, event_type='TIER_UP'))
+    db.session.commit()
+
+    response = client.delete('/api/auth/account', headers=_headers(farmer_id))
+
+    assert response.status_code == 200
+    assert Farmer.query.get(farmer_id) is None
+    assert Decision.query.filter_by(farmer_id=farmer_id).count() == 0
+    assert FarmerAnalytics.query.filter_by(farmer_id=farmer_id).count() == 0
+    assert AnalyticsEvent.query.filter_by(farmer_id=farmer_id).count() == 0
+    assert Outcome.query.count() == 2  # only the other farmer's
+    assert Decision.query.filter_by(farmer_id=other_id).count() == 4
+
+
+def test_account_deletion_is_set_based(app, seed_history, count_queries):
+    small = seed_history(3)
+    large = seed_history(60)
+
+    small_queries = count_queries(lambda: DeletionService.delete_farmer(small))
+    large_counts = {}
+    large_queries = count_queries(lambda: large_counts.update(DeletionService.delete_farmer(large)))
+    db.session.commit()
+
+    assert large_queries == small_queries
+    assert large_counts == {'outcomes': 30, 'decisions': 60, 'farmer_analytics': 0,
+                            'analytics_events': 0, 'farmers': 1}
+
+
+def test_decision_deletion_removes_outcomes(app, client, seed_history):
+    farmer_id = seed_history(4)
+    decision = Decision.query.filter_by(farmer_id=farmer_id).order_by(Decision.id).first()
+    assert decision.outcomes.count() == 1
+
+    response = client.delete(f'/api/decisions/{decision.id}', headers=_headers(farmer_id))
+
+    assert response.status_code == 200
+    assert Outcome.query.filter_by(decision_id=decision.id).count() == 0
+    row = FarmerRollupService.get(farmer_id)
+    assert (row.total_decisions, row.total_outcomes) == (3, 1)
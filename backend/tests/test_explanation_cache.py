@@ -0,0 +1,75 @@
+import itertools
+from datetime import date, timedelta
+from types import SimpleNamespace
+from models.explanation import ExplanationCache
+from services.ai_service import (ExplanationStore, RISK_TYPES, explanation_inputs, explanation_key,
+                                 get_explanation_store)
+from services.decision_engine import DecisionEngine
+
+
+def test_key_ignores_risk_order_and_duplicates(explanation_data):
+    reordered = dict(explanation_data, risks=['frost_risk', 'heavy_rain', 'frost_risk'])
+    assert explanation_key(explanation_data) == explanation_key(reordered)
+    assert explanation_key(explanation_data) != explanation_key(dict(explanation_data, wait_days=5))
+
+
+def test_model_is_only_called_on_a_miss(app, ai_service, explanation_data):
+    service, completions = ai_service
+
+    first = service.generate_explanation(explanation_data)
+    second = service.generate_explanation(dict(explanation_data, risks=['frost_risk', 'heavy_rain']))
+
+    assert first == second
+    assert first.startswith("Explanation 1:")
+    assert completions.calls == 1
+    assert ExplanationCache.query.get(explanation_key(explanation_data)).risks == 'frost_risk,heavy_rain'
+
+    # A fresh worker (empty LRU) is served from the table
+    app.extensions['explanation_store'] = ExplanationStore()
+    assert service.generate_explanation(explanation_data) == first
+    assert completions.calls == 1
+    assert get_explanation_store().stats()['store_hits'] == 1
+
+
+def test_template_fallback_is_not_stored(app, ai_service, explanation_data):
+    service, completions = ai_service
+    completions.create = None  # calling it raises, so the template is used
+
+    explanation = service.generate_explanation(explanation_data)
+
+    assert explanation
+    assert ExplanationCache.query.count() == 0
+
+
+def test_pregenerate_covers_the_input_space_once(app, ai_service, explanation_data):
+    service, completions = ai_service
+
+    generated, skipped, failed = service.pregenerate(['Wheat'], ['Autumn'], wait_days=(5, 7), max_risks=1)
+
+    # PLANT_NOW + (NOT_RECOMMENDED + 2 WAIT) x (no risk + 4 single risks)
+    assert (generated, skipped, failed) == (16, 0, 0)
+    assert completions.calls == 16
+
+    assert service.pregenerate(['Wheat'], ['Autumn'], wait_days=(5, 7), max_risks=1) == (0, 16, 0)
+    service.generate_explanation(explanation_data | {'risks': ['heavy_rain']})
+    assert completions.calls == 16
+
+
+def test_default_pregeneration_covers_every_engine_decision():
+    engine = DecisionEngine()
+    covered = {explanation_key(data) for data in explanation_inputs(['Wheat'], ['Autumn'])}
+
+    produced = set()
+    risk_sets = [combo for size in range(len(RISK_TYPES) + 1)
+                 for combo in itertools.combinations(RISK_TYPES, size)]
+    for suitability, risks, severity, offset in itertools.product(
+            ('forbidden', 'risky', 'optimal'), risk_sets, ('medium', 'high'), range(-1, 20)):
+        day = (date.today() + timedelta(days=offset)).isoformat()
+        analysis = {'risks': [{'type': t, 'severity': severity, 'date': day} for t in risks]}
+        decision = engine._make_decision(SimpleNamespace(suitability=suitability, reason=None), analysis)
+        produced.add(explanation_key({
+            'crop_name': 'Wheat', 'action': decision['action'], 'wait_days': decision.get('wait_days', 0),
+            'period_name': 'Autumn', 'risks': [r['type'] for r in analysis['risks']]
+        }))
+
+    assert produced <= covered
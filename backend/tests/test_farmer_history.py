@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+from services.farmer_history import FarmerHistory
+from services.analytics_service import AnalyticsService
+
+
+def test_history_columns(app, seed_history):
+    farmer_id = seed_history(6)
+    history = FarmerHistory.load(farmer_id)
+
+    assert history.size == 6
+    assert history.has_outcome.sum() == 3
+    assert history.is_success.sum() == 2
+    assert history.is_failure.sum() == 1
+    assert history.followed.sum() == 4
+    assert list(history.timestamp) == sorted(history.timestamp)
+    assert history.last_decision_at() == datetime(2025, 1, 1) + timedelta(days=50)
+
+
+def test_history_empty(app):
+    history = FarmerHistory.load(12345)
+    assert history.size == 0
+    assert history.last_decision_at() is None
+
+
+def test_dashboard_query_count_does_not_grow_with_history(app, seed_history, count_queries):
+    service = AnalyticsService()
+    small = seed_history(4)
+    large = seed_history(40)
+
+    small_queries = count_queries(lambda: service.get_dashboard_data(small))
+    large_queries = count_queries(lambda: service.get_dashboard_data(large))
+
+    assert large_queries == small_queries
+    data = service.get_dashboard_data(large)
+    assert 'error' not in data
+    assert data['total_decisions'] == 40
+    assert data['outcome_count'] == 20
@@ -0,0 +1,75 @@
+from urllib.parse import urlparse, parse_qs
+import pytest
+from services.cache_service import SharedStore
+from services.weather_service import WeatherService, ForecastCacheStats
+
+
+def _daily(offset):
+    return {'daily': {
+        'time': ['2026-01-01', '2026-01-02', '2026-01-03'],
+        'temperature_2m_max': [20.0 + offset, 21.35 + offset, 19.05],
+        'temperature_2m_min': [8.0 + offset, 9.25, 7.45 - offset],
+        'precipitation_sum': [0.0, 12.25, 3.05],
+        'relative_humidity_2m_mean': [60, 97, 4],
+        'wind_speed_10m_max': [5.0, 12.35, 3.3],
+        'weathercode': [0, 63, 95],
+    }}
+
+
+def _locations():
+    return list(dict.fromkeys((c['lat'], c['lon']) for c in WeatherService.GOVERNORATE_COORDS.values()))
+
+
+@pytest.fixture
+def prefetch_app(app, stub, tmp_path):
+    app.config.update(WEATHER_API_URL=stub.url, FORECAST_CACHE_PATH=str(tmp_path / 'forecast.sqlite'))
+    stub.payload = [_daily(i * 0.5) for i in range(len(_locations()))]
+    return app
+
+
+def test_batch_matches_per_governorate_processing():
+    service = WeatherService()
+    governorates = list(service.GOVERNORATE_COORDS)
+    responses = [_daily(i * 0.5) for i in range(len(governorates))]
+
+    batch = service._process_open_meteo_batch(responses, 3, governorates)
+
+    assert batch == [service._process_open_meteo_data(r, 3, g) for r, g in zip(responses, governorates)]
+
+
+def test_prefetch_publishes_every_governorate_in_one_request(prefetch_app, stub):
+    service = WeatherService()
+    before = ForecastCacheStats.snapshot()
+
+    published = service.prefetch_all((1, 3))
+
+    governorates = list(service.GOVERNORATE_COORDS)
+    assert published == 2 * len(governorates)
+    assert stub.requests == 1
+    query = parse_qs(urlparse(stub.queries[0]).query)
+    assert len(query['latitude'][0].split(',')) == len(_locations())
+    assert query['forecast_days'] == ['3']
+
+    # Request-path lookups are now warm reads
+    store = SharedStore(prefetch_app.config['FORECAST_CACHE_PATH'])
+    for gov in governorates:
+        assert len(service.get_forecast(gov, days=3)) == 3
+        assert len(store.get(f"forecast:{gov}:1")[0]) == 1
+    assert stub.requests == 1
+    after = ForecastCacheStats.snapshot()
+    assert after['hits'] - before['hits'] == len(governorates)
+    assert after['misses'] == before['misses']
+
+    # Adjustments are applied per governorate (Tataouine: +4.0)
+    index = _locations().index((32.9297, 10.4518))
+    assert service.get_forecast('Tataouine', days=3)[0]['temp_max'] == round(20.0 + index * 0.5 + 4.0, 1)
+
+
+def test_prefetch_is_a_scheduled_job(prefetch_app, stub):
+    job = prefetch_app.extensions['periodic_jobs']['forecast_prefetch']
+
+    job.run_once()
+
+    assert job.last_error is None
+    assert stub.requests == 1
+    assert SharedStore(prefetch_app.config['FORECAST_CACHE_PATH']).get('forecast:Tunis:7') is not None
@@ -0,0 +1,77 @@
+import csv
+import io
+import json
+from datetime import date
+from flask_jwt_extended import create_access_token
+from models.base import db
+from models.decision import Decision, Outcome
+from services.history_export import HistoryExportService, FIELDS
+
+
+def _headers(farmer_id, role='farmer'):
+    token = create_access_token(identity=str(farmer_id), additional_claims={'role': role})
+    return {'Authorization': f"Bearer {token}"}
+
+
+def test_csv_export_joins_outcomes(app, client, seed_history):
+    farmer_id = seed_history(10)
+    decision = Decision.query.filter_by(farmer_id=farmer_id).order_by(Decision.id).first()
+    db.session.add(Outcome(decision_id=decision.id, outcome='success'))  # a second outcome
+    db.session.commit()
+
+    response = client.get('/api/decisions/export', headers=_headers(farmer_id))
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert 'attachment' in response.headers['Content-Disposition']
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert len(rows) == 11
+    assert [r['decision_id'] for r in rows[:2]] == [str(decision.id)] * 2
+    assert rows[0]['crop_name'] == decision.crop.name
+    assert sum(1 for r in rows if r['outcome']) == 6
+
+
+def test_ndjson_export_applies_filters(app, client, seed_history):
+    farmer_id = seed_history(12)
+    crop_id = Decision.query.filter_by(farmer_id=farmer_id).first().crop_id
+
+    response = client.get('/api/decisions/export', headers=_headers(farmer_id), query_string={
+        'format': 'ndjson', 'crop_id': crop_id, 'start': '2025-01-02', 'end': '2025-03-31'
+    })
+
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert response.mimetype == 'application/x-ndjson'
+    assert {r['crop_id'] for r in rows} == {crop_id}
+    assert all('2025-01-02' <= r['date'][:10] <= '2025-03-31' for r in rows)
+    assert [r['date'][:10] for r in rows] == ['2025-01-31', '2025-03-02']
+
+
+def test_other_farmers_require_admin(app, client, seed_history):
+    farmer_id = seed_history(3)
+    other_id = seed_history(4)
+
+    assert client.get(f'/api/decisions/export?farmer_id={other_id}',
+                      headers=_headers(farmer_id)).status_code == 403
+    response = client.get(f'/api/decisions/export?farmer_id={other_id}&format=ndjson',
+                          headers=_headers(farmer_id, role='admin'))
+    assert len(response.get_data(as_text=True).splitlines()) == 4
+    assert client.get('/api/decisions/export?format=xml', headers=_headers(farmer_id)).status_code == 422
+
+
+def test_rows_are_streamed_in_batches(app, seed_history):
+    farmer_id = seed_history(7)
+    rows = HistoryExportService.rows(farmer_id, batch_size=2)
+
+    assert next(rows)['decision_id'] is not None  # lazy generator
+    assert len(list(rows)) == 6
+    chunks = list(HistoryExportService.to_csv(HistoryExportService.rows(farmer_id, end=date(2025, 1, 1))))
+    assert len(chunks) == 1
+    assert chunks[0].startswith(','.join(FIELDS) + '\r\n') and chunks[0].count('\r\n') == 2
+
+
+def test_export_history_command(app, runner, seed_history):
+    farmer_id = seed_history(5)
+    result = runner.invoke(args=['export-history', '--farmer-id', str(farmer_id), '--format', 'ndjson'])
+
+    assert result.exit_code == 0
+    assert len(result.output.splitlines()) == 5
@@ -0,0 +1,150 @@
+from datetime import datetime
+from flask_jwt_extended import create_access_token
+from models.base import db
+from models.decision import Decision
+from services.rollup_service import FarmerRollupService
+
+
+def _headers(farmer_id):
+    return {'Authorization': f"Bearer {create_access_token(identity=str(farmer_id))}"}
+
+
+def _walk(client, headers, limit, **params):
+    ids, cursor, pages = [], None, 0
+    while True:
+        query = {'limit': limit, 'include_total': 'false', **params}
+        if cursor:
+            query['cursor'] = cursor
+        body = client.get('/api/decisions/history', query_string=query, headers=headers).get_json()
+        ids += [d['id'] for d in body['decisions']]
+        pages += 1
+        cursor = body['next_cursor']
+        if cursor is None:
+            return ids, pages
+
+
+def test_cursor_pages_cover_history_in_order(app, client, seed_history):
+    farmer_id = seed_history(23)
+    # Same timestamp as an existing row: the id breaks the tie
+    tie = Decision(farmer_id=farmer_id, crop_id=Decision.query.first().crop_id, governorate="Sfax",
+                   recommendation="WAIT", confidence="LOW", timestamp=datetime(2025, 1, 11))
+    with FarmerRollupService.track(tie):
+        db.session.add(tie)
+    db.session.commit()
+
+    ids, pages = _walk(client, _headers(farmer_id), limit=5)
+
+    expected = [d.id for d in Decision.query.filter_by(farmer_id=farmer_id)
+                .order_by(Decision.timestamp.desc(), Decision.id.desc())]
+    assert ids == expected
+    assert pages == 5
+
+
+def test_cursor_respects_filters(app, client, seed_history):
+    farmer_id = seed_history(12)
+    crop_id = Decision.query.filter_by(farmer_id=farmer_id).first().crop_id
+
+    ids, _ = _walk(client, _headers(farmer_id), limit=2, crop_id=crop_id)
+
+    assert len(ids) == 4
+    assert {Decision.query.get(i).crop_id for i in ids} == {crop_id}
+
+
+def test_page_cost_does_not_grow_with_depth(app, client, seed_history, count_queries):
+    farmer_id = seed_history(40)
+    headers = _headers(farmer_id)
+    first = client.get('/api/decisions/history?limit=5&include_total=false', headers=headers).get_json()
+    cursor = first['next_cursor']
+    for _ in range(5):
+        cursor = client.get(f'/api/decisions/history?limit=5&include_total=false&cursor={cursor}',
+                            headers=headers).get_json()['next_cursor']
+
+    shallow = count_queries(lambda: client.get(
+        f"/api/decisions/history?limit=5&include_total=false&cursor={first['next_cursor']}", headers=headers))
+    deep = count_queries(lambda: client.get(
+        f'/api/decisions/history?limit=5&include_total=false&cursor={cursor}', headers=headers))
+
+    assert deep == shallow
+
+
+def test_total_is_cached_per_data_version(app, client, seed_history, count_queries):
+    farmer_id = seed_history(8)
+    headers = _headers(farmer_id)
+
+    assert client.get('/api/decisions/history', headers=headers).get_json()['total'] == 8
+    with_total = count_queries(lambda: client.get('/api/decisions/history', headers=headers))
+    without_total = count_queries(lambda: client.get('/api/decisions/history?include_total=false',
+                                                     headers=headers))
+    assert with_total == without_total + 1  # the data version lookup, not a COUNT
+
+    decision = Decision(farmer_id=farmer_id, crop_id=Decision.query.first().crop_id, governorate="Sfax",
+                        recommendation="WAIT", confidence="LOW")
+    with FarmerRollupService.track(decision):
+        db.session.add(decision)
+    db.session.commit()
+
+    assert client.get('/api/decisions/history', headers=headers).get_json()['total'] == 9
+
+
+def test_invalid_cursor_is_rejected(app, client, seed_history):
+    farmer_id = seed_history(2)
+    response = client.get('/api/decisions/history?cursor=not-a-cursor', headers=_headers(farmer_id))
+    assert response.status_code == 422
+
+
+def test_filters_match_individual_counts(app, client, seed_history):
+    farmer_id = seed_history(30)
+    body = client.get('/api/decisions/history/filters', headers=_headers(farmer_id)).get_json()
+
+    decisions = Decision.query.filter_by(farmer_id=farmer_id).all()
+    crops = {c['id']: c['count'] for c in body['crops']}
+    months = {m['value']: m['count'] for m in body['months']}
+    seasons = {s['value']: s['count'] for s in body['seasons']}
+    for d in decisions:
+        crops[d.crop_id] -= 1
+        months[d.timestamp.month] -= 1
+    assert not any(crops.values()) and not any(months.values())
+    assert seasons['winter'] == sum(1 for d in decisions if d.timestamp.month in (12, 1, 2))
+    assert sum(seasons.values()) == 30
+    assert sum(p['count'] for p in body['periods']) == 0  # seed_history leaves period_id empty
+
+
+def test_filters_cached_until_data_changes(app, client, seed_history, count_queries):
+    farmer_id = seed_history(6)
+    headers = _headers(farmer_id)
+    first = client.get('/api/decisions/history/filters', headers=headers).get_json()
+
+    # Only the data version lookup runs while the facets are cached
+    assert count_queries(lambda: client.get('/api/decisions/history/filters', headers=headers)) == 1
+
+    crop_id = first['crops'][-1]['id']
+    decision = Decision(farmer_id=farmer_id, crop_id=crop_id, governorate="Sfax",
+                        recommendation="WAIT", confidence="LOW")
+    with FarmerRollupService.track(decision):
+        db.session.add(decision)
+    db.session.commit()
+
+    second = client.get('/api/decisions/history/filters', headers=headers).get_json()
+    assert second['crops'][-1]['count'] == first['crops'][-1]['count'] + 1
+
+
+def test_undated_rows_are_left_out(app, client, seed_history, monkeypatch):
+    # Databases whose decisions table lacks the NOT NULL constraint can hold undated rows
+    monkeypatch.setattr(Decision.__table__.c.timestamp, 'nullable', True)
+    Decision.__table__.drop(db.engine)
+    Decision.__table__.create(db.engine)
+    farmer_id = seed_history(5)
+    crop_id = Decision.query.first().crop_id
+    db.session.execute(Decision.__table__.insert().values(
+        farmer_id=farmer_id, crop_id=crop_id, governorate="Sfax",
+        recommendation="WAIT", confidence="LOW", timestamp=None
+    ))
+    db.session.commit()
+    headers = _headers(farmer_id)
+
+    ids, pages = _walk(client, headers, limit=2)
+    assert len(ids) == 5 and pages == 3
+    assert client.get('/api/decisions/history', headers=headers).get_json()['total'] == 5
+
+    body = client.get('/api/decisions/history/filters', headers=headers).get_json()
+    assert sum(m['count'] for m in body['months']) == 5
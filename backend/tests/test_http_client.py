@@ -0,0 +1,88 @@
+import pytest
+import requests
+from services.http_client import ResilientHttpClient, CircuitOpenError, CircuitBreaker
+from services.weather_service import WeatherService, ForecastCacheStats
+
+
+def _client(**kwargs):
+    options = dict(retries=2, backoff=0.001, max_backoff=0.01, failure_threshold=2, reset_timeout=60)
+    options.update(kwargs)
+    return ResilientHttpClient('stub', **options)
+
+
+def test_pooled_session_reuses_connections(stub):
+    client = _client()
+    for _ in range(5):
+        assert client.get_json(stub.url) == stub.payload
+    assert stub.requests == 5
+    assert len(stub.connections) == 1
+
+
+def test_transient_errors_are_retried(stub):
+    stub.statuses = [503, 502]
+    client = _client()
+
+    assert client.get_json(stub.url) == stub.payload
+    assert stub.requests == 3
+    assert client.status()['retries'] == 2
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_client_errors_are_not_retried(stub):
+    stub.statuses = [404]
+    client = _client()
+
+    with pytest.raises(requests.HTTPError):
+        client.get_json(stub.url)
+    assert stub.requests == 1
+    assert client.breaker.consecutive_failures == 0
+
+
+def test_breaker_opens_and_recovers(stub):
+    stub.statuses = [500] * 6
+    client = _client()
+
+    for _ in range(2):
+        with pytest.raises(requests.HTTPError):
+            client.get_json(stub.url)
+    assert client.breaker.state == CircuitBreaker.OPEN
+    assert stub.requests == 6
+
+    # Open: the upstream is not called at all
+    with pytest.raises(CircuitOpenError):
+        client.get_json(stub.url)
+    assert stub.requests == 6
+
+    # After the cool-down one trial call closes it again
+    client.breaker.opened_at -= 60
+    assert client.get_json(stub.url) == stub.payload
+    assert client.breaker.state == CircuitBreaker.CLOSED
+    assert client.status()['trips'] == 1
+
+
+def test_forecast_falls_back_to_last_good_when_open(app, stub):
+    app.config.update(WEATHER_API_URL=stub.url, HTTP_RETRIES=0, HTTP_BREAKER_THRESHOLD=1)
+    service = WeatherService()
+    good = service.get_forecast('Siliana', days=2)
+    assert good[0]['temp_max'] == 24.0  # Siliana adjustment: -1.0
+
+    stub.statuses = [500]
+    before = ForecastCacheStats.snapshot()['fallbacks']
+    assert service.get_forecast('Siliana', days=2) == good
+    assert service.get_forecast('Siliana', days=2) == good  # circuit open: no request
+    assert stub.requests == 2
+    assert ForecastCacheStats.snapshot()['fallbacks'] == before + 2
+
+    # Nothing fetched before for this governorate: mock data
+    assert service.get_forecast('Tozeur', days=2)[0]['condition'] == 'Sunny'
+
+
+def test_health_reports_breaker_state(app, client, stub):
+    app.config.update(WEATHER_API_URL=stub.url, HTTP_RETRIES=0, HTTP_BREAKER_THRESHOLD=1)
+    stub.statuses = [500]
+
+    data = client.get('/api/health/detailed').get_json()
+
+    assert data['checks']['weather_api']['circuit'] == 'open'
+    assert data['upstreams']['open-meteo']['state'] == 'open'
+    assert data['upstreams']['open-meteo']['trips'] == 1
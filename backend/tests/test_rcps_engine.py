@@ -0,0 +1,87 @@
+import math
+import numpy as np
+from datetime import datetime, timedelta
+from models.base import db
+from models.user import Farmer
+from models.crop import Crop
+from models.decision import Decision, Outcome
+from services.rcps_engine import RCPSMatrix
+from services.regional_analytics import RegionalAnalyticsService
+
+
+def _seed():
+    farmer = Farmer(phone_number="21644000000", password_hash="pw",
+                    governorate="Sfax", farm_type="irrigated")
+    crops = [Crop(name=f"RCPS Crop {i}", category="vegetable", min_temp=5, max_temp=35) for i in range(3)]
+    db.session.add(farmer)
+    db.session.add_all(crops)
+    db.session.flush()
+
+    now = datetime.utcnow()
+    pattern = {
+        ('Sfax', 0): [1, 1, 1, 0, 1, 1],
+        ('Sfax', 1): [1, 0, 1, 0, 1, 0, 1],
+        ('Sfax', 2): [1, 1],             # below the minimum
+        ('Sousse', 0): [1, 1, 1, 1],
+    }
+    for (gov, c), results in pattern.items():
+        for i, ok in enumerate(results):
+            d = Decision(farmer_id=farmer.id, crop_id=crops[c].id, governorate=gov,
+                         recommendation='PLANT_NOW', confidence='HIGH',
+                         timestamp=now - timedelta(days=35 * i + 1))
+            db.session.add(d)
+            db.session.flush()
+            db.session.add(Outcome(decision_id=d.id, outcome='success' if ok else 'failure',
+                                   yield_kg=500 + 100 * i))
+    db.session.commit()
+    return [c.id for c in crops]
+
+
+def _reference_rcps(crop_id, governorate):
+    """The original per-crop computation (filtering on Decision.governorate)"""
+    since = datetime.utcnow() - timedelta(days=730)
+    outcomes = db.session.query(Decision.timestamp, Outcome.outcome, Outcome.yield_kg)\
+        .join(Outcome).filter(Decision.crop_id == crop_id, Decision.governorate == governorate,
+                              Decision.timestamp >= since).all()
+    total = len(outcomes)
+    successes = sum(1 for o in outcomes if o.outcome == 'success')
+    if successes < 3 or total < 3:
+        return None
+    months = {}
+    for o in outcomes:
+        months.setdefault(o.timestamp.strftime('%Y-%m'), []).append(o.outcome == 'success')
+    rates = [sum(v) / len(v) for v in months.values()]
+    sr = successes / total
+    cr = max(0, 1 - np.std(rates) / sr) if len(rates) > 1 else 0.5
+    yields = [o.yield_kg for o in outcomes]
+    national_max = max(y for (y,) in db.session.query(Outcome.yield_kg).join(Decision)
+                       .filter(Decision.crop_id == crop_id).all())
+    yr = (sum(yields) / len(yields)) / national_max
+    return round(0.4 * sr + 0.2 * math.log10(successes + 1) + 0.2 * cr + 0.2 * yr, 3)
+
+
+def test_matrix_matches_per_crop_computation(app):
+    crop_ids = _seed()
+    matrix = RCPSMatrix.build()
+
+    for gov in ('Sfax', 'Sousse'):
+        for crop_id in crop_ids:
+            cell = matrix.cell(crop_id, gov)
+            expected = _reference_rcps(crop_id, gov)
+            assert (cell['rcps'] if cell else None) == expected
+
+    top = matrix.top_crops('Sfax')
+    assert [c['crop_id'] for c in top] == sorted(
+        [crop_ids[0], crop_ids[1]], key=lambda cid: -matrix.cell(cid, 'Sfax')['rcps'])
+
+
+def test_regional_callers_share_one_matrix(app, count_queries):
+    _seed()
+    RegionalAnalyticsService.get_top_crops_for_region('Sfax')  # builds the matrix
+
+    queries = count_queries(lambda: (
+        RegionalAnalyticsService.get_top_crops_for_region('Sfax'),
+        RegionalAnalyticsService.calculate_oga('Sfax'),
+        RegionalAnalyticsService.calculate_rcps(1, 'Sousse'),
+    ))
+    assert queries == 0
@@ -0,0 +1,61 @@
+from unittest.mock import patch
+from models.base import db
+from models.crop import Crop, AgrarianPeriod, CropPeriodRule
+from models.reference import ReferenceDataVersion
+from services.decision_engine import DecisionEngine
+from services.reference_catalog import get_reference_catalog, SUITABILITY_CODES, NO_RULE
+
+
+def _seed():
+    crops = [Crop(name=f"Catalog Crop {i}", category="vegetable", min_temp=0, max_temp=45) for i in range(2)]
+    db.session.add_all(crops)
+    AgrarianPeriod.query.delete()
+    db.session.add(AgrarianPeriod(id='PC', name='Catalog Period', start_month=1, start_day=1,
+                                  end_month=12, end_day=31, risk_level='low'))
+    db.session.flush()
+    db.session.add(CropPeriodRule(crop_id=crops[0].id, period_id='PC', suitability='forbidden'))
+    db.session.commit()
+    return [c.id for c in crops]
+
+
+def test_rule_matrix(app):
+    crop_ids = _seed()
+    catalog = get_reference_catalog()
+
+    i0, i1 = catalog.crop_index[crop_ids[0]], catalog.crop_index[crop_ids[1]]
+    j = catalog.period_index['PC']
+    assert catalog.rule_matrix[i0, j] == SUITABILITY_CODES['forbidden']
+    assert catalog.rule_matrix[i1, j] == NO_RULE
+    assert catalog.rule(crop_ids[0], 'PC').suitability == 'forbidden'
+    assert list(catalog.rules_for_period('PC', crop_ids)) == [crop_ids[0]]
+
+
+def test_writes_bump_version_and_reload(app):
+    crop_ids = _seed()
+    catalog = get_reference_catalog()
+    assert get_reference_catalog() is catalog
+
+    db.session.add(CropPeriodRule(crop_id=crop_ids[1], period_id='PC', suitability='optimal'))
+    db.session.commit()
+
+    reloaded = get_reference_catalog()
+    assert reloaded is not catalog
+    assert reloaded.version > catalog.version == ReferenceDataVersion.query.get(1).version - 1
+    assert reloaded.rule(crop_ids[1], 'PC').suitability == 'optimal'
+
+    # Bulk deletes also count as writes
+    CropPeriodRule.query.filter_by(crop_id=crop_ids[1]).delete()
+    db.session.commit()
+    assert get_reference_catalog().rule(crop_ids[1], 'PC') is None
+
+
+def test_advice_makes_no_reference_queries(app, count_queries, forecast):
+    crop_ids = _seed()
+    engine = DecisionEngine()
+    get_reference_catalog()
+
+    with patch.object(engine.weather_service, 'get_forecast', return_value=forecast), \
+         patch.object(engine, '_record_decision', return_value=1):
+        queries = count_queries(lambda: engine.get_advice(1, crop_ids[0], 'Sfax'))
+
+    assert queries == 0
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+from models.base import db
+from models.user import Farmer
+from models.crop import Crop
+from models.decision import Decision, Outcome
+from models.analytics import RegionalBenchmarks
+from services.regional_analytics import RegionalAnalyticsService
+
+
+def _seed():
+    crops = [Crop(name=f"Bench Crop {i}", category="vegetable", min_temp=5, max_temp=35) for i in range(2)]
+    farmers = [Farmer(phone_number=f"2167700000{i}", password_hash="pw", governorate=gov,
+                      farm_type="irrigated") for i, gov in enumerate(['Bizerte', 'Kef'])]
+    db.session.add_all(crops + farmers)
+    db.session.flush()
+
+    outcomes = {}
+    for farmer in farmers:
+        for crop in crops:
+            for i, (result, revenue) in enumerate([('success', 900), ('failure', -150), ('failure', -250)]):
+                d = Decision(farmer_id=farmer.id, crop_id=crop.id, governorate=farmer.governorate,
+                             recommendation='PLANT_NOW', confidence='HIGH')
+                db.session.add(d)
+                db.session.flush()
+                outcome = Outcome(decision_id=d.id, outcome=result, revenue_tnd=revenue)
+                db.session.add(outcome)
+                outcomes[(farmer.governorate, crop.id, i)] = outcome
+    db.session.commit()
+    return crops, outcomes
+
+
+def test_full_refresh_values(app, count_queries):
+    crops, _ = _seed()
+    report = RegionalAnalyticsService.refresh_benchmarks()
+
+    assert report['pairs'] == 4 and not report['incremental']
+    bench = RegionalBenchmarks.query.filter_by(governorate='Kef', crop_id=crops[0].id).one()
+    assert round(bench.avg_success_rate, 3) == round(1 / 3, 3)
+    assert bench.avg_loss_per_failure == 200.0
+    assert bench.sample_size == 3
+
+    # Re-running updates in place (no duplicate pairs) with a bounded number of statements
+    assert count_queries(RegionalAnalyticsService.refresh_benchmarks) <= 3
+    assert RegionalBenchmarks.query.count() == 4
+
+
+def test_incremental_refresh_only_changed_pairs(app):
+    crops, outcomes = _seed()
+    RegionalAnalyticsService.refresh_benchmarks()
+    stamps = {(b.governorate, b.crop_id): b.last_updated for b in RegionalBenchmarks.query}
+
+    assert RegionalAnalyticsService.refresh_benchmarks(incremental=True)['pairs'] == 0
+
+    changed = outcomes[('Bizerte', crops[1].id, 1)]
+    changed.outcome = 'success'
+    changed.updated_at = datetime.utcnow() + timedelta(seconds=1)
+    db.session.commit()
+
+    report = RegionalAnalyticsService.refresh_benchmarks(incremental=True)
+    assert report['pairs'] == 1 and report['incremental']
+
+    db.session.expire_all()
+    for bench in RegionalBenchmarks.query:
+        key = (bench.governorate, bench.crop_id)
+        if key == ('Bizerte', crops[1].id):
+            assert round(bench.avg_success_rate, 3) == round(2 / 3, 3)
+            assert bench.last_updated > stamps[key]
+        else:
+            assert bench.last_updated == stamps[key]
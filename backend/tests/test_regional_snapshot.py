@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+from flask_jwt_extended import create_access_token
+from models.base import db
+from models.user import Farmer
+from models.crop import Crop
+from models.decision import Decision, Outcome
+from models.analytics import GovernorateSnapshot
+from services.regional_analytics import RegionalAnalyticsService
+from services.regional_snapshot import RegionalSnapshotService
+
+
+def _seed():
+    crop = Crop(name="Snapshot Crop", category="vegetable", min_temp=5, max_temp=35)
+    db.session.add(crop)
+    farmers = []
+    for i, (gov, results) in enumerate([
+        ('Nabeul', [1, 1, 1, 0, 1, 1]),
+        ('Nabeul', [1, 0, 0, 1, 0, 1, 0, 1]),
+        ('Nabeul', [1, 1]),  # below the GSI minimum
+        ('Jendouba', [0, 1, 1, 1, 1]),
+    ]):
+        farmer = Farmer(phone_number=f"2166600000{i}", password_hash="pw",
+                        governorate=gov, farm_type="irrigated")
+        db.session.add(farmer)
+        db.session.flush()
+        farmers.append(farmer)
+        for j, ok in enumerate(results):
+            d = Decision(farmer_id=farmer.id, crop_id=crop.id, governorate=gov,
+                         recommendation='NOT_RECOMMENDED' if j == 0 else 'PLANT_NOW',
+                         confidence='HIGH', timestamp=datetime.utcnow() - timedelta(days=20 * j + 1))
+            db.session.add(d)
+            db.session.flush()
+            db.session.add(Outcome(decision_id=d.id, outcome='success' if ok else 'failure', yield_kg=400))
+    db.session.commit()
+    return farmers
+
+
+def test_snapshot_matches_live_metrics(app):
+    _seed()
+    RegionalSnapshotService.refresh_all()
+
+    for gov in ('Nabeul', 'Jendouba'):
+        snapshot = RegionalSnapshotService.get(gov)
+        gsi = RegionalAnalyticsService.calculate_gsi(gov)
+        assert snapshot['gsi'] == gsi['gsi']
+        assert snapshot['farmer_count'] == gsi['farmer_count']
+        assert snapshot['rrap'] == RegionalAnalyticsService.calculate_regional_risk_adjusted_performance(gov)
+        assert snapshot['oga'] == RegionalAnalyticsService.calculate_oga(gov)
+    assert GovernorateSnapshot.query.count() == 2
+
+
+def test_snapshot_served_from_memory(app, count_queries):
+    _seed()
+    RegionalSnapshotService.refresh_all()
+    assert count_queries(lambda: RegionalSnapshotService.get('Nabeul')) == 0
+
+
+def test_stale_snapshot_recomputed(app):
+    _seed()
+    RegionalSnapshotService.refresh_all()
+    row = GovernorateSnapshot.query.filter_by(governorate='Nabeul').one()
+    row.refreshed_at = datetime.utcnow() - timedelta(days=1)
+    db.session.commit()
+    app.extensions['governorate_snapshots'].clear()
+
+    snapshot = RegionalSnapshotService.get('Nabeul')
+    assert datetime.fromisoformat(snapshot['refreshed_at']) > datetime.utcnow() - timedelta(minutes=1)
+
+
+def test_regional_benchmark_endpoint(client, app):
+    farmers = _seed()
+    headers = {'Authorization': f"Bearer {create_access_token(identity=str(farmers[0].id))}"}
+
+    response = client.get('/api/analytics/regional-benchmark', headers=headers)
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['gsi']['governorate'] == 'Nabeul'
+    assert data['snapshot_refreshed_at']
+    assert data['personal_benchmark']['sample_size']['user'] == 6
@@ -0,0 +1,84 @@
+from datetime import datetime
+from flask_jwt_extended import create_access_token
+from models.base import db
+from models.user import Farmer
+from models.crop import Crop
+from services.cache_service import SharedStore, TieredCache
+from services.rollup_service import FarmerRollupService
+from utils.decorators import seconds_until_midnight
+
+
+def test_tiers_and_tags_shared_between_workers(tmp_path):
+    path = str(tmp_path / 'responses.sqlite')
+    worker_a = TieredCache(max_entries=2, store=SharedStore(path))
+    worker_b = TieredCache(max_entries=2, store=SharedStore(path))
+
+    worker_a.set('k', {'body': 1}, 60, worker_a.tag_versions(['crops']))
+    assert worker_a.get('k') == {'body': 1}
+    assert worker_b.get('k') == {'body': 1}
+    assert worker_b.get('k') == {'body': 1}
+
+    worker_b.invalidate('crops')
+    assert worker_a.get('k') is None
+
+    stats = worker_b.stats()
+    assert (stats['shared_hits'], stats['memory_hits'], stats['invalidations']) == (1, 1, 1)
+
+    for key in ('x', 'y', 'z'):
+        worker_a.set(key, key, 60)
+    assert worker_a.stats()['evictions'] >= 1
+    assert worker_a.get('x') == 'x'  # still served by the shared tier
+
+
+def test_expired_entries_miss():
+    cache = TieredCache()
+    cache.set('k', 'v', 0)
+    assert cache.get('k') is None
+
+
+def test_crop_endpoint_cached_and_invalidated(client, app):
+    db.session.add(Crop(name="Cached Crop", category="vegetable", min_temp=5, max_temp=35))
+    db.session.commit()
+
+    first = client.get('/api/crops/?b=2&a=1')
+    second = client.get('/api/crops/?a=1&b=2')
+    assert first.headers['X-Cache'] == 'MISS'
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.get_json() == first.get_json()
+
+    db.session.add(Crop(name="New Crop", category="vegetable", min_temp=5, max_temp=35))
+    db.session.commit()
+    third = client.get('/api/crops/?a=1&b=2')
+    assert third.headers['X-Cache'] == 'MISS'
+    assert 'New Crop' in [c['name'] for c in third.get_json()]
+
+
+def test_analytics_cached_per_user(client, app):
+    farmers = [Farmer(phone_number=f"2168800000{i}", password_hash="pw", governorate="Sfax",
+                      farm_type="irrigated") for i in range(2)]
+    db.session.add_all(farmers)
+    db.session.commit()
+    headers = [{'Authorization': f"Bearer {create_access_token(identity=str(f.id))}"} for f in farmers]
+
+    assert client.get('/api/analytics/tier-status', headers=headers[0]).headers['X-Cache'] == 'MISS'
+    assert client.get('/api/analytics/tier-status', headers=headers[1]).headers['X-Cache'] == 'MISS'
+    assert client.get('/api/analytics/tier-status', headers=headers[0]).headers['X-Cache'] == 'HIT'
+
+    # A rollup change for farmer 0 only drops farmer 0's responses
+    FarmerRollupService.rebuild(farmers[0].id)
+    db.session.commit()
+    assert client.get('/api/analytics/tier-status', headers=headers[0]).headers['X-Cache'] == 'MISS'
+    assert client.get('/api/analytics/tier-status', headers=headers[1]).headers['X-Cache'] == 'HIT'
+
+
+def test_transition_cache_expires_at_midnight(client, monkeypatch):
+    assert seconds_until_midnight(datetime(2026, 3, 1, 23, 59, 30)) == 30
+
+    first = client.get('/api/crops/periods/upcoming-transition')
+    assert first.headers['X-Cache'] == 'MISS'
+    assert client.get('/api/crops/periods/upcoming-transition').headers['X-Cache'] == 'HIT'
+
+    # Stored just before midnight: daysRemaining is stale the next day, so the entry is too
+    monkeypatch.setattr('utils.decorators.seconds_until_midnight', lambda: 0)
+    client.get('/api/crops/periods/upcoming-transition?governorate=Sfax')
+    assert client.get('/api/crops/periods/upcoming-transition?governorate=Sfax').headers['X-Cache'] == 'MISS'
@@ -0,0 +1,136 @@
+import pytest
+from flask_jwt_extended import create_access_token
+from app import create_app
+from models.base import db
+from models.user import Farmer
+from models.crop import Crop
+from models.decision import Decision
+from models.analytics import FarmerAnalytics
+from services.rollup_service import FarmerRollupService
+
+
+@pytest.fixture
+def farmer_setup(app):
+    farmer = Farmer(phone_number="21677000000", password_hash="pw",
+                    governorate="Sfax", farm_type="irrigated")
+    crop = Crop(name="Rollup Tomato", category="vegetable", min_temp=5, max_temp=35)
+    db.session.add_all([farmer, crop])
+    db.session.flush()
+
+    decision_ids = []
+    for recommendation in ['PLANT_NOW', 'WAIT', 'WAIT']:
+        decision = Decision(farmer_id=farmer.id, crop_id=crop.id, governorate="Sfax",
+                            recommendation=recommendation, confidence="HIGH",
+                            cost_basis_tnd=50.0)
+        db.session.add(decision)
+        db.session.flush()
+        decision_ids.append(decision.id)
+    db.session.commit()
+
+    headers = {'Authorization': f"Bearer {create_access_token(identity=str(farmer.id))}"}
+    return farmer.id, decision_ids, headers
+
+
+def _counters(farmer_id):
+    row = FarmerAnalytics.query.filter_by(farmer_id=farmer_id).first()
+    return {key: getattr(row, key) for key in FarmerRollupService.COUNTERS}
+
+
+def test_rollups_follow_writes(client, farmer_setup):
+    farmer_id, decision_ids, headers = farmer_setup
+
+    # First read builds the row from raw tables
+    stats = client.get('/api/decisions/stats', headers=headers).get_json()
+    assert stats['total_decisions'] == 3
+    assert stats['risk_avoided_count'] == 2
+
+    client.post(f'/api/decisions/{decision_ids[1]}/record-action', headers=headers,
+                json={'actual_action': 'waited'})
+    client.post('/api/decisions/record-outcome', headers=headers,
+                json={'decision_id': decision_ids[0], 'outcome': 'failure'})
+    client.put(f'/api/decisions/{decision_ids[1]}/outcome', headers=headers,
+               json={'outcome': 'failure'})
+    client.delete(f'/api/decisions/{decision_ids[2]}', headers=headers)
+
+    incremental = _counters(farmer_id)
+    assert incremental['total_decisions'] == 2
+    assert incremental['total_outcomes'] == 2
+    assert incremental['failure_count'] == 2
+    assert incremental['wait_followed_count'] == 1
+    assert incremental['followed_outcomes'] == 1
+    assert incremental['failure_loss_tnd'] == 100.0
+
+    # Incremental counters agree with a full rebuild
+    FarmerRollupService.rebuild(farmer_id)
+    db.session.commit()
+    assert _counters(farmer_id) == incremental
+
+
+def test_tier_status_reads_rollup(client, farmer_setup):
+    farmer_id, decision_ids, headers = farmer_setup
+    for decision_id in decision_ids:
+        client.post('/api/decisions/record-outcome', headers=headers,
+                    json={'decision_id': decision_id, 'outcome': 'success'})
+
+    status = client.get('/api/analytics/tier-status', headers=headers).get_json()
+    assert status['tier'] == 'T2_LEARNER'
+    assert status['outcomes_recorded'] == 3
+
+
+def test_rebuild_rollups_command(runner, farmer_setup):
+    farmer_id, _, _ = farmer_setup
+    result = runner.invoke(args=['rebuild-rollups'])
+    assert 'Rebuilt rollups for 1 farmers' in result.output
+    assert _counters(farmer_id)['wait_count'] == 2
+
+
+def test_stats_breakdown_is_cached_per_data_version(client, farmer_setup, count_queries):
+    farmer_id, decision_ids, headers = farmer_setup
+
+    stats = client.get('/api/decisions/stats', headers=headers).get_json()
+    assert stats['by_recommendation'] == {'PLANT_NOW': 1, 'WAIT': 2}
+    assert stats['top_crops'] == [{'name': 'Rollup Tomato', 'count': 3}]
+    assert stats['recent_activity'] == 3
+
+    # Cached: only the rollup row is read
+    assert count_queries(lambda: client.get('/api/decisions/stats', headers=headers)) == 1
+
+    client.delete(f'/api/decisions/{decision_ids[0]}', headers=headers)
+    stats = client.get('/api/decisions/stats', headers=headers).get_json()
+    assert stats['by_recommendation'] == {'WAIT': 2}
+    assert stats['total_decisions'] == 2
+
+
+def test_building_a_missing_row_leaves_the_callers_transaction_alone(tmp_path):
+    # A file database: the rollup is built on a connection of its own
+    app = create_app('testing')
+    app.config.update(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'rollups.db'}")
+    with app.app_context():
+        db.create_all()
+        farmer = Farmer(phone_number="21677000001", password_hash="pw", governorate="Sfax", farm_type="irrigated")
+        db.session.add(farmer)
+        db.session.commit()
+        farmer_id = farmer.id
+        db.session.add(Farmer(phone_number="21677000002", password_hash="pw",
+                              governorate="Sfax", farm_type="irrigated"))
+
+        assert FarmerRollupService.get(farmer_id).total_decisions == 0
+        db.session.rollback()
+
+        assert Farmer.query.filter_by(phone_number="21677000002").first() is None
+        assert FarmerAnalytics.query.filter_by(farmer_id=farmer_id).count() == 1
+        db.session.remove()
+        db.drop_all()
+
+
+def test_concurrent_row_creation_keeps_one_row(app, farmer_setup):
+    farmer_id, _, _ = farmer_setup
+    FarmerAnalytics.query.filter_by(farmer_id=farmer_id).delete()
+    db.session.commit()
+
+    # Two first-time readers both find no row and insert it
+    FarmerRollupService._insert_row(farmer_id, db.session)
+    FarmerRollupService._insert_row(farmer_id, db.session)
+    db.session.commit()
+
+    assert FarmerAnalytics.query.filter_by(farmer_id=farmer_id).count() == 1
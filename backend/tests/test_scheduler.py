@@ -0,0 +1,37 @@
+import time
+from services.scheduler import PeriodicJob
+
+
+def _worker_jobs(app, interval):
+    """The same job as registered by two gunicorn workers"""
+    runs = []
+    jobs = []
+    for holder in ('worker-1', 'worker-2'):
+        job = PeriodicJob(app, 'lease_test', interval, lambda holder=holder: runs.append(holder))
+        job.lease_holder = holder
+        jobs.append(job)
+    return jobs, runs
+
+
+def test_one_worker_runs_a_job_per_interval(app, tmp_path):
+    app.config['JOB_LEASE_PATH'] = str(tmp_path / 'leases.sqlite')
+    (first, second), runs = _worker_jobs(app, interval=0.2)
+
+    assert first.run_if_leased() is True
+    assert second.run_if_leased() is False
+    assert first.run_if_leased() is True  # the holder keeps its lease
+    assert runs == ['worker-1', 'worker-1']
+    assert second.status()['skipped'] == 1
+
+    # Once the interval is over any worker may take the next run
+    time.sleep(0.25)
+    assert second.run_if_leased() is True
+    assert runs[-1] == 'worker-2'
+
+
+def test_without_a_lease_store_every_worker_runs(app):
+    app.config['JOB_LEASE_PATH'] = ''
+    jobs, runs = _worker_jobs(app, interval=60)
+
+    assert all(job.run_if_leased() for job in jobs)
+    assert runs == ['worker-1', 'worker-2']
@@ -0,0 +1,68 @@
+import threading
+import pytest
+from app import create_app
+from models.base import db
+from models.user import Farmer
+from services.analytics_service import AnalyticsService
+from services.stage_executor import run_stages, StageTimings
+
+
+@pytest.fixture
+def file_app(tmp_path):
+    """An app on a file database, where stages may use separate connections"""
+    app = create_app('testing')
+    app.config.update(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'stages.db'}",
+                      DASHBOARD_STAGE_WORKERS=3)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+    if 'stage_executor' in app.extensions:
+        app.extensions['stage_executor'].shutdown()
+
+
+def _farmer_count():
+    return threading.current_thread().name, Farmer.query.count()
+
+
+def test_stages_run_concurrently_with_their_own_sessions(file_app, seed_history):
+    seed_history(3)
+    barrier = threading.Barrier(3, timeout=5)
+
+    def stage():
+        barrier.wait()  # only passes if all three run at the same time
+        return _farmer_count()
+
+    results = run_stages({'a': stage, 'b': stage, 'c': stage}, prefix='test')
+
+    assert {count for _, count in results.values()} == {1}
+    assert len({thread for thread, _ in results.values()}) == 3
+    assert 'MainThread' not in {thread for thread, _ in results.values()}
+    assert StageTimings.snapshot()['test.a']['count'] >= 1
+
+
+def test_parallel_dashboard_matches_serial(file_app, seed_history):
+    farmer_id = seed_history(12)
+    service = AnalyticsService()
+
+    parallel = service._build_dashboard_data(farmer_id)
+    file_app.config['DASHBOARD_STAGE_WORKERS'] = 1
+    serial = service._build_dashboard_data(farmer_id)
+
+    assert 'error' not in parallel
+    assert parallel == serial
+    assert 'dashboard.benchmarks' in StageTimings.snapshot()
+
+
+def test_in_memory_database_runs_serially(app):
+    results = run_stages({'a': _farmer_count, 'b': _farmer_count})
+    assert {thread for thread, _ in results.values()} == {threading.current_thread().name}
+
+
+def test_stage_errors_reach_the_caller(file_app):
+    def failing():
+        raise ValueError('stage failed')
+
+    with pytest.raises(ValueError, match='stage failed'):
+        run_stages({'ok': _farmer_count, 'bad': failing})
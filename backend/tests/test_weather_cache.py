@@ -0,0 +1,82 @@
+import time
+import pytest
+import requests
+from unittest.mock import patch, MagicMock
+from services.cache_service import SharedStore
+from services.weather_service import WeatherService, ForecastCacheStats
+
+
+def _open_meteo_response(t_max=25.0):
+    response = MagicMock(status_code=200)
+    response.json.return_value = {'daily': {
+        'time': ['2026-01-01', '2026-01-02'],
+        'temperature_2m_max': [t_max, t_max],
+        'temperature_2m_min': [10.0, 10.0],
+        'precipitation_sum': [0.0, 0.0],
+        'relative_humidity_2m_mean': [60, 60],
+        'wind_speed_10m_max': [5.0, 5.0],
+        'weathercode': [0, 0],
+    }}
+    return response
+
+
+@pytest.fixture
+def cached_app(app, tmp_path):
+    app.config['FORECAST_CACHE_PATH'] = str(tmp_path / 'forecast.sqlite')
+    return app
+
+
+def test_shared_store_leases(tmp_path):
+    store = SharedStore(str(tmp_path / 'store.sqlite'))
+    store.set('k', {'a': 1})
+    assert store.get('k')[0] == {'a': 1}
+
+    assert store.acquire_lease('k', 'worker-1', 30)
+    assert not store.acquire_lease('k', 'worker-2', 30)
+    store.release_lease('k', 'worker-1')
+    assert store.acquire_lease('k', 'worker-2', 30)
+
+
+def test_forecast_served_from_cache(cached_app):
+    service = WeatherService()
+    before = ForecastCacheStats.snapshot()
+
+    with patch('services.http_client.requests.Session.get', return_value=_open_meteo_response()) as get:
+        first = service.get_forecast('Kairouan', days=2)
+        second = service.get_forecast('kairouan', days=2)
+
+    assert get.call_count == 1
+    assert first == second
+    after = ForecastCacheStats.snapshot()
+    assert after['misses'] == before['misses'] + 1
+    assert after['hits'] == before['hits'] + 1
+
+
+def test_stale_forecast_served_while_refreshing(cached_app):
+    service = WeatherService()
+    with patch('services.http_client.requests.Session.get', return_value=_open_meteo_response(25.0)):
+        original = service.get_forecast('Beja', days=2)
+
+    cached_app.config['FORECAST_CACHE_TTL'] = 0
+    with patch('services.http_client.requests.Session.get', return_value=_open_meteo_response(30.0)):
+        stale = service.get_forecast('Beja', days=2)
+        assert stale == original
+
+        # The background refresh replaces the entry
+        store = SharedStore(cached_app.config['FORECAST_CACHE_PATH'])
+        deadline = time.time() + 5
+        while store.get('forecast:Beja:2')[0] == original and time.time() < deadline:
+            time.sleep(0.01)
+
+    assert store.get('forecast:Beja:2')[0][0]['temp_max'] == 30.0
+
+
+def test_api_failure_is_not_cached(cached_app):
+    service = WeatherService()
+    with patch('services.http_client.requests.Session.get', side_effect=requests.ConnectionError('down')):
+        mock = service.get_forecast('Gafsa', days=2)
+    assert mock[0]['condition'] == 'Sunny'
+
+    with patch('services.http_client.requests.Session.get', return_value=_open_meteo_response()) as get:
+        service.get_forecast('Gafsa', days=2)
+    assert get.call_count == 1
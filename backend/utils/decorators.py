@@ -1,9 +1,13 @@
 """
 Custom decorators for API endpoints
 """
+from datetime import datetime, timedelta
 from functools import wraps
-from flask import request, g
-from flask_jwt_extended import verify_jwt_in_request, get_jwt
+from flask import request, g, current_app, make_response
+from flask_jwt_extended import verify_jwt_in_request, get_jwt, get_jwt_identity
+import hashlib
+import json
+import logging
 import time
 from utils.errors import ValidationError, AuthorizationError
 
@@ -57,36 +61,73 @@ def track_performance(f):
     return decorated_function
 
 
-def cache_response(timeout=300):
-    """Cache GET request responses"""
+def _cache_key(f, user_id, view_args):
+    """Endpoint + user + view arguments + normalised (sorted) query arguments"""
+    query = sorted((key, sorted(values)) for key, values in request.args.lists())
+    raw = json.dumps([f.__module__, f.__name__, user_id, sorted(view_args.items()), query],
+                     default=str, separators=(',', ':'))
+    return f"{f.__name__}:{hashlib.sha256(raw.encode()).hexdigest()}"
+
+
+def seconds_until_midnight(now=None):
+    """Seconds left in the current (server-local) day"""
+    now = now or datetime.now()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return (midnight - now).total_seconds()
+
+
+def cache_response(timeout=300, tags=(), per_user=True, until_midnight=False):
+    """
+    Cache successful GET responses in the tiered response cache.
+    
+    Keys combine the endpoint, view arguments, the sorted query arguments and,
+    unless `per_user` is False, the JWT identity. Tags may use {user_id} and
+    view-argument placeholders (e.g. 'farmer:{user_id}'); invalidating a tag
+    drops every response stored under it in all workers. Responses computed
+    from today's date set `until_midnight` so they never outlive the day.
+    """
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
             if request.method != 'GET':
                 return f(*args, **kwargs)
             
-            from flask import current_app
+            from services.cache_service import get_response_cache
+            
+            user_id = None
+            if per_user:
+                verify_jwt_in_request(optional=True)
+                user_id = get_jwt_identity()
             
-            # Get cache from extensions, or use a simple dict-based cache
             try:
-                cache = current_app.extensions.get('cache')
-                if not cache or isinstance(cache, dict):
-                    # Skip caching if cache not properly initialized
-                    return f(*args, **kwargs)
-                
-                cache_key = f'{f.__name__}:{str(args)}:{str(kwargs)}:{str(request.args)}'
-                cached_response = cache.get(cache_key)
-                
-                if cached_response is not None:
-                    return cached_response
-                
-                response = f(*args, **kwargs)
-                cache.set(cache_key, response, timeout=timeout)
-                return response
+                cache = get_response_cache()
+                key = _cache_key(f, user_id, kwargs)
+                cached = cache.get(key)
+                if cached is not None:
+                    response = current_app.response_class(
+                        cached['body'], status=cached['status'], mimetype=cached['mimetype']
+                    )
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+                # Read before computing so a concurrent invalidation is not lost
+                versions = cache.tag_versions([tag.format(user_id=user_id, **kwargs) for tag in tags])
             except Exception as e:
                 # If caching fails, just return the response without caching
-                import logging
                 logging.warning(f"Cache operation failed: {e}")
                 return f(*args, **kwargs)
+            
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200 and not response.direct_passthrough:
+                try:
+                    ttl = min(timeout, seconds_until_midnight()) if until_midnight else timeout
+                    cache.set(key, {
+                        'body': response.get_data(as_text=True),
+                        'status': response.status_code,
+                        'mimetype': response.mimetype
+                    }, ttl, versions)
+                except Exception as e:
+                    logging.warning(f"Cache operation failed: {e}")
+            response.headers['X-Cache'] = 'MISS'
+            return response
         return decorated_function
-    return decorator
\ No newline at end of file
+    return decorator
@@ -173,6 +173,14 @@ class APIService {
     return this.request('/crops/periods', { requireAuth: false });
   }
 
+  /**
+   * Next agrarian period change (props for PeriodTransitionAlert)
+   */
+  async getUpcomingPeriodTransition(governorate = null) {
+    const query = governorate ? `?governorate=${encodeURIComponent(governorate)}` : '';
+    return this.request(`/crops/periods/upcoming-transition${query}`);
+  }
+
   // ========== DECISION ENDPOINTS ==========
 
   async getAdvice(cropId, governorate = null, seedlingCost = null, marketPrice = null, inputQuantity = null) {
@@ -222,6 +230,21 @@ class APIService {
     });
   }
 
+  /**
+   * Compare advice for several crops (one weather fetch, ranked results)
+   */
+  async getBatchAdvice(cropIds, governorate = null) {
+    const body = { crop_ids: cropIds.map((id) => parseInt(id, 10)) };
+    if (governorate) {
+      body.governorate = governorate;
+    }
+
+    return this.request('/decisions/get-advice/batch', {
+      method: 'POST',
+      body: JSON.stringify(body),
+    });
+  }
+
   /**
    * Get decision history
    */